@@ -1,52 +1,318 @@
-from fastapi import APIRouter
-from app.models.schemas import AnalyzeRequest, AnalyzeResponse
-from app.services.features import extract_features
+import json
+import time
+from typing import List, Literal, Optional, Union
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from app.models.schemas import (
+    ActorAnalyzeResponse,
+    AnalyzeActorsResponse,
+    AnalyzeColumnsRequest,
+    AnalyzeRequest,
+    AnalyzeResponse,
+    AnalyzeStreamHeader,
+    Baseline,
+    LogEvent,
+)
+from app.services.features import (
+    extract_features,
+    extract_features_by_actor,
+    extract_features_columns,
+    FeatureAccumulator,
+    LogColumns,
+    _ts_to_us,
+)
+from app.services.feature_store import get_feature_store
 from app.services.scoring import score_risk
+from app.services.rules import get_rule_registry
+from app.services.response_cache import RESPONSE_CACHE_ENABLED, analyze_cache_key, get_response_cache
+from app.services.metrics import current_timings, stage
+from app.services.pipeline import build_response, score_and_retrieve_shared
+from app.rag.config import RETRIEVAL_DEADLINE_MS
 from app.rag.queries import build_retrieval_queries
-from app.rag.retriever import PolicyRetriever
+from app.rag.runtime import get_retriever
 
 router = APIRouter(tags=["analyze"])
-_retrievers: dict[str, PolicyRetriever] = {}
 
-def get_retriever(mode: str) -> PolicyRetriever:
-    if mode not in _retrievers:
-        _retrievers[mode] = PolicyRetriever(mode=mode, enable_threshold=True)
-    return _retrievers[mode]
 
-
-@router.post("/analyze", response_model=AnalyzeResponse)
-def analyze(req: AnalyzeRequest) -> AnalyzeResponse:
-    baseline = None
+# 요청 context에서 baseline 꺼내기
+def _resolve_baseline(req: AnalyzeRequest) -> Optional[Baseline]:
     if req.context and req.context.baseline:
-        baseline = req.context.baseline
+        return req.context.baseline
+    return None
 
-    mode = "hybrid"
+# 요청 context에서 retrieval mode 결정 (기본 hybrid)
+def _resolve_mode(req: AnalyzeRequest) -> str:
     if req.context and req.context.retrieval_mode:
-        mode = req.context.retrieval_mode
+        return req.context.retrieval_mode
+    return "hybrid"
+
+# 요청 context의 검색 latency budget (없으면 config 기본값, None이면 제한 없음)
+def _resolve_deadline(req) -> Optional[float]:
+    if req.context and req.context.deadline_ms:
+        return req.context.deadline_ms
+    return RETRIEVAL_DEADLINE_MS
+
+# fallback(cached/bm25_only/empty)으로 만든 응답은 응답 캐시에 저장하지 않음
+def _is_complete(resp: AnalyzeResponse) -> bool:
+    return resp.debug.get("retrieval_path") not in ("cached", "bm25_only", "empty")
+
+# context.stateful이면 서버 feature store 사용
+def _is_stateful(req: AnalyzeRequest) -> bool:
+    return bool(req.context and req.context.stateful)
+
+# 요청의 가장 최근 이벤트 actor (같은 시각이면 나중 이벤트)
+def _latest_actor(req: AnalyzeRequest) -> Optional[str]:
+    if not req.logs:
+        return None
+    latest = max(enumerate(req.logs), key=lambda x: (_ts_to_us(x[1].ts), x[0]))[1]
+    return latest.actor.user_id
+
+# 핸들러 시작: 요청 수신 ~ 지금까지를 validation으로 기록
+def _begin_timings():
+    t = current_timings()
+    if t is not None:
+        t.begin_handler()
+
+# 핸들러 끝: metrics label 지정, 요청 시 debug["timings_ms"]에 stage별 ms (serialization은 metrics에만)
+def _end_timings(mode: str, decision: str, debugs: List[dict], include: bool):
+    t = current_timings()
+    if t is None:
+        return
+    if include:
+        ms = t.as_ms()
+        for d in debugs:
+            d["timings_ms"] = ms
+    t.end_handler(mode, decision)
+
 
-    features = extract_features(req.logs, baseline)
-    summary, signals, actions = score_risk(features)
+def _analyze_once(
+        req: Union[AnalyzeRequest, AnalyzeColumnsRequest],
+        mode: str,
+        retriever,
+        deadline_ms: Optional[float],
+) -> AnalyzeResponse:
+    baseline = _resolve_baseline(req)
+
+    fs_debug = None
+    with stage("features"):
+        if _is_stateful(req):
+            # feature store: 새 이벤트만 반영, 가장 최근 이벤트의 actor 기준으로 판단
+            store = get_feature_store()
+            by_actor = store.update(req.tenant_id, req.logs, baseline)
+            user_id = _latest_actor(req)
+            features = by_actor.get(user_id) or extract_features([], None)
+            fs_debug = {"user_id": user_id, **store.stats()}
+        elif isinstance(req, AnalyzeColumnsRequest):
+            try:
+                cols = LogColumns.from_input(req.columns)
+            except ValueError as e:
+                raise HTTPException(status_code=422, detail=str(e))
+            features = extract_features_columns(cols, baseline)
+        else:
+            features = extract_features(req.logs, baseline)
+    with stage("scoring"):
+        summary, signals, actions = score_risk(features, req.tenant_id)
 
     # 1) signals -> queries
-    queries = build_retrieval_queries(signals)
+    with stage("query_build"):
+        queries = build_retrieval_queries(signals)
 
-    retriever = get_retriever(mode)
-    
     # 2) queries -> evidence
-    evidence, debug = retriever.retrieve(queries)
-    debug = debug or {}
-    debug["mode"] = mode
-
-    # 3) guardrail : evidence 없으면 추측 기반 escalation 금지
-    if not evidence and summary.decision == "ESCALATE":
-        summary.decision = "REVIEW"
-    debug["guardrail_no_evidence"] = (not evidence)
-
-    return AnalyzeResponse(
-        request_id=req.request_id,
-        summary=summary,
-        signals=signals,
-        recommended_actions=actions,
-        evidence=evidence,
-        debug=debug,
-    )
\ No newline at end of file
+    evidence, debug = retriever.retrieve(queries, deadline_ms)
+    if fs_debug is not None:
+        debug = dict(debug or {}, feature_store=fs_debug)
+
+    # 3) guardrail
+    return build_response(req.request_id, mode, summary, signals, actions, evidence, debug)
+
+
+@router.post("/analyze", response_model=AnalyzeResponse)
+def analyze(req: Union[AnalyzeRequest, AnalyzeColumnsRequest], timings: bool = False) -> AnalyzeResponse:
+    """
+    timings=true: debug.timings_ms에 stage별 소요 시간(ms) 포함
+    같은 logs/context/tenant(+인덱스/규칙 버전) 요청은 응답 캐시에서 반환 (debug.cache.status: hit/coalesced/miss/bypass)
+    stateful 요청은 feature store를 갱신해야 하므로 캐시하지 않는다.
+    검색이 latency budget(context.deadline_ms)을 넘으면 대체 경로로 응답 (debug.retrieval_path, debug.deadline)
+    logs 대신 columns(컬럼형, dictionary 인코딩)로 보내도 된다 (AnalyzeColumnsRequest, stateful 미지원)
+    """
+    _begin_timings()
+    if isinstance(req, AnalyzeColumnsRequest) and _is_stateful(req):
+        raise HTTPException(status_code=422, detail="context.stateful is not supported with columns input")
+    mode = _resolve_mode(req)
+    retriever = get_retriever(mode, req.tenant_id)
+    cache = get_response_cache()
+    deadline_ms = _resolve_deadline(req)
+
+    if _is_stateful(req) or not RESPONSE_CACHE_ENABLED:
+        resp = _analyze_once(req, mode, retriever, deadline_ms)
+        resp.debug["cache"] = {"status": "bypass"}
+    else:
+        with stage("cache"):
+            key = analyze_cache_key(req, mode, retriever.index_version, get_rule_registry().get(req.tenant_id).version)
+        t0 = time.perf_counter()
+
+        # 같은 key를 계산 중인 요청은 이 요청의 budget까지만 기다리고,
+        # 넘으면 남은 budget으로 직접 계산 (deadline_ms는 캐시 key에 없어서 다른 budget의 요청과 합쳐질 수 있음)
+        def _compute() -> AnalyzeResponse:
+            remaining = None
+            if deadline_ms is not None:
+                remaining = max(0.0, deadline_ms - (time.perf_counter() - t0) * 1e3)
+            return _analyze_once(req, mode, retriever, remaining)
+
+        cached, status, age = cache.get_or_compute(
+            key,
+            _compute,
+            should_store=_is_complete,
+            wait_seconds=deadline_ms / 1e3 if deadline_ms is not None else None,
+        )
+        # 캐시된 응답은 공유 객체이므로 request_id/debug만 바꾼 복사본으로 응답
+        debug = dict(cached.debug)
+        debug["cache"] = {"status": status, "key": key[:16], "age_s": round(age, 3), **cache.stats()}
+        resp = cached.model_copy(update={"request_id": req.request_id, "debug": debug})
+
+    _end_timings(mode, resp.summary.decision, [resp.debug], timings)
+    return resp
+
+
+# 여러 결과를 내는 endpoint의 metrics label (mode가 섞이면 mixed, decision은 multi)
+def _multi_label(modes: List[str]) -> str:
+    return modes[0] if len(set(modes)) == 1 else "mixed"
+
+
+@router.post("/analyze/batch", response_model=List[AnalyzeResponse])
+def analyze_batch(reqs: List[AnalyzeRequest], timings: bool = False) -> List[AnalyzeResponse]:
+    """
+    여러 로그 윈도우를 한 번에 분석.
+    같은 signal 조합/검색 결과는 요청 간에 공유한다.
+    """
+    _begin_timings()
+    with stage("features"):
+        items = [
+            (_resolve_mode(req), extract_features(req.logs, _resolve_baseline(req)), req.tenant_id)
+            for req in reqs
+        ]
+    # 요청별 budget (검색 그룹은 자기 그룹에 속한 요청들 중 가장 짧은 값만 적용)
+    deadlines = [_resolve_deadline(req) for req in reqs]
+    out = [
+        build_response(req.request_id, *result)
+        for req, result in zip(reqs, score_and_retrieve_shared(items, deadlines))
+    ]
+    _end_timings(_multi_label([m for m, _, _ in items]), "multi", [r.debug for r in out], timings)
+    return out
+
+
+@router.post("/analyze/actors", response_model=AnalyzeActorsResponse)
+def analyze_actors(req: AnalyzeRequest, timings: bool = False) -> AnalyzeActorsResponse:
+    """
+    여러 사용자의 로그를 한 번에 받아 actor.user_id별로 점수/결정/근거를 반환.
+    - 피처는 컬럼형으로 모든 actor를 한 번에 계산
+    - baseline: context.baselines[user_id] -> 없으면 context.baseline
+    """
+    _begin_timings()
+    mode = _resolve_mode(req)
+    baselines = req.context.baselines if req.context else None
+    with stage("features"):
+        if _is_stateful(req):
+            by_actor = get_feature_store().update(req.tenant_id, req.logs, _resolve_baseline(req), baselines)
+        else:
+            by_actor = extract_features_by_actor(req.logs, baselines, _resolve_baseline(req))
+
+    user_ids = list(by_actor)
+    results = score_and_retrieve_shared(
+        [(mode, by_actor[u], req.tenant_id) for u in user_ids], _resolve_deadline(req)
+    )
+
+    actors = []
+    for user_id, result in zip(user_ids, results):
+        resp = build_response(req.request_id, *result)
+        actors.append(ActorAnalyzeResponse(user_id=user_id, **resp.model_dump()))
+    _end_timings(mode, "multi", [a.debug for a in actors], timings)
+    return AnalyzeActorsResponse(request_id=req.request_id, actors=actors)
+
+
+class _NDJSONConsumer:
+    """
+    NDJSON 본문을 네트워크 청크 단위로 받아 줄 단위로 파싱하고
+    FeatureAccumulator를 바로 갱신한다. (전체 본문/이벤트 리스트를 메모리에 두지 않음)
+    - 첫 줄이 event_id 없는 객체면 헤더(AnalyzeStreamHeader)로 취급
+    """
+    def __init__(self):
+        self.acc = FeatureAccumulator()
+        self.header: Optional[AnalyzeStreamHeader] = None
+        self.lines = 0
+        self._tail = b""
+
+    def feed(self, data: bytes, final: bool = False):
+        buf = self._tail + data
+        lines = buf.split(b"\n")
+        self._tail = b"" if final else lines.pop()
+        for line in lines:
+            self._consume(line)
+
+    def _consume(self, line: bytes):
+        line = line.strip()
+        if not line:
+            return
+        self.lines += 1
+        try:
+            if self.lines == 1:
+                obj = json.loads(line)
+                if isinstance(obj, dict) and "event_id" not in obj:
+                    self.header = AnalyzeStreamHeader.model_validate(obj)
+                    return
+                self.acc.add(LogEvent.model_validate(obj))
+            else:
+                self.acc.add(LogEvent.model_validate_json(line))
+        except (ValueError, ValidationError) as e:
+            raise HTTPException(status_code=422, detail=f"line {self.lines}: {e}")
+
+
+@router.post("/analyze/stream", response_model=AnalyzeResponse)
+async def analyze_stream(
+        request: Request,
+        request_id: Optional[str] = None,
+        retrieval_mode: Optional[Literal["vector", "hybrid"]] = None,
+        tenant_id: Optional[str] = None,
+        timings: bool = False,
+) -> AnalyzeResponse:
+    """
+    newline-delimited LogEvent JSON(application/x-ndjson)을 스트리밍으로 받아 분석.
+    - 이벤트가 도착하는 대로 피처 상태를 갱신하고, 끝에서 /analyze와 같은 AnalyzeResponse 반환
+    - 첫 줄에 {"request_id":..., "tenant_id":..., "context": {...}} 헤더를 두면 baseline/retrieval_mode/deadline_ms 지정 가능
+      (query parameter request_id/tenant_id/retrieval_mode보다 우선)
+    """
+    _begin_timings()
+    consumer = _NDJSONConsumer()
+    # 스트리밍 본문은 수신/줄 파싱/검증과 피처 누적이 같이 진행되므로 validation으로 기록
+    with stage("validation"):
+        async for chunk in request.stream():
+            if chunk:
+                # 파싱/검증은 CPU 작업이므로 이벤트 루프를 막지 않도록 스레드풀에서
+                await run_in_threadpool(consumer.feed, chunk)
+        await run_in_threadpool(consumer.feed, b"", True)
+
+    # 헤더가 없으면 빈 헤더 (query parameter / 기본값 사용)
+    header = consumer.header or AnalyzeStreamHeader()
+    ctx = header.context
+    baseline = ctx.baseline if ctx and ctx.baseline else None
+    mode = (ctx.retrieval_mode if ctx and ctx.retrieval_mode else None) or retrieval_mode or "hybrid"
+    rid = header.request_id or request_id
+    tenant_id = header.tenant_id or tenant_id
+    deadline_ms = _resolve_deadline(header)
+
+    def _finish() -> AnalyzeResponse:
+        with stage("features"):
+            features = consumer.acc.result(baseline)
+        with stage("scoring"):
+            summary, signals, actions = score_risk(features, tenant_id)
+        with stage("query_build"):
+            queries = build_retrieval_queries(signals)
+        evidence, debug = get_retriever(mode, tenant_id).retrieve(queries, deadline_ms)
+        debug = debug or {}
+        debug["stream"] = {"lines": consumer.lines, "events": consumer.acc.events}
+        resp = build_response(rid, mode, summary, signals, actions, evidence, debug)
+        _end_timings(mode, resp.summary.decision, [resp.debug], timings)
+        return resp
+
+    return await run_in_threadpool(_finish)
@@ -1,22 +1,97 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 from fastapi.responses import FileResponse
 from pathlib import Path
+from typing import Literal, Optional
+
+from app.rag.tenants import DEFAULT_TENANT, is_valid_tenant, tenant_paths
+from app.services.policy_pages import PageNotFound, get_policy_page_cache
 
 router = APIRouter(prefix="/api/policies", tags=["policies"])
 
-APP_DIR = Path(__file__).resolve().parents[1]         
+APP_DIR = Path(__file__).resolve().parents[1]
 POLICIES_DIR = (APP_DIR / "data" / "policies").resolve()
 
-@router.get("/{filename}")
-def get_policy_file(filename: str):
-    
+# ETag가 내용 해시라서 브라우저는 매번 재검증(304)만 하고 본문은 바뀌었을 때만 받는다
+CACHE_CONTROL = "private, no-cache"
+
+
+# tenant_id가 있으면 tenant 정책 디렉토리를 먼저, 없으면 공용(default) 정책 디렉토리
+def _resolve(filename: str, tenant_id: Optional[str] = None) -> Path:
     if "/" in filename or "\\" in filename or ".." in filename:
         raise HTTPException(status_code=400, detail="Invalid filename")
 
-    p = (POLICIES_DIR / filename).resolve()
-    if not p.exists():
-        raise HTTPException(status_code=404, detail=f"PDF not found: {filename}")
+    dirs = [POLICIES_DIR]
+    if tenant_id and tenant_id != DEFAULT_TENANT:
+        if not is_valid_tenant(tenant_id):
+            raise HTTPException(status_code=400, detail="Invalid tenant_id")
+        dirs.insert(0, tenant_paths(tenant_id).policy_dir.resolve())
+    for d in dirs:
+        p = (d / filename).resolve()
+        if p.is_file():
+            return p
+    raise HTTPException(status_code=404, detail=f"PDF not found: {filename}")
+
+# If-None-Match에 현재 ETag가 있으면 304 (비교는 weak comparison: W/ 무시)
+def _not_modified(request: Request, etag: str) -> bool:
+    inm = request.headers.get("if-none-match")
+    if not inm:
+        return False
+    tags = [t.strip() for t in inm.split(",")]
+    return "*" in tags or etag in (t[2:] if t.startswith("W/") else t for t in tags)
+
+def _304(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
 
-    headers = {"Content-Disposition": f'inline; filename="{p.name}"'}
+# 원문 전체 (Range / If-Range는 FileResponse가 처리 -> 206 부분 응답)
+@router.get("/{filename}")
+@router.head("/{filename}", include_in_schema=False)
+def get_policy_file(filename: str, request: Request, tenant_id: Optional[str] = None):
+    p = _resolve(filename, tenant_id)
+    st = p.stat()
+    etag = f'"{get_policy_page_cache().content_hash(p, st)}"'
+    if _not_modified(request, etag):
+        return _304(etag)
+
+    headers = {
+        "Content-Disposition": f'inline; filename="{p.name}"',
+        "ETag": etag,
+        "Cache-Control": CACHE_CONTROL,
+    }
     media = "application/pdf" if p.suffix.lower() == ".pdf" else "text/plain"
-    return FileResponse(str(p), media_type=media, headers=headers)
+    return FileResponse(str(p), media_type=media, headers=headers, stat_result=st)
+
+
+# 페이지 하나만 (format=pdf: 단일 페이지 PDF, format=text: 추출 텍스트). Evidence.page 값을 그대로 사용
+@router.get("/{filename}/pages/{n}")
+@router.head("/{filename}/pages/{n}", include_in_schema=False)
+def get_policy_page(
+        filename: str,
+        n: int,
+        request: Request,
+        format: Literal["pdf", "text"] = Query(default="pdf"),
+        tenant_id: Optional[str] = None,
+):
+    p = _resolve(filename, tenant_id)
+    if n < 1:
+        raise HTTPException(status_code=404, detail=f"Page not found: {n}")
+
+    cache = get_policy_page_cache()
+    sha = cache.content_hash(p)
+    etag = f'"{sha}-p{n}-{format}"'
+    if _not_modified(request, etag):
+        return _304(etag)
+
+    try:
+        data = cache.page(p, n, format, sha=sha)
+    except PageNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    ext = "pdf" if format == "pdf" else "txt"
+    headers = {
+        "Content-Disposition": f'inline; filename="{p.stem}-p{n}.{ext}"',
+        "ETag": etag,
+        "Cache-Control": CACHE_CONTROL,
+    }
+    media = "application/pdf" if format == "pdf" else "text/plain; charset=utf-8"
+    return Response(content=data, media_type=media, headers=headers)
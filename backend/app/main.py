@@ -1,9 +1,21 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
+from fastapi.responses import PlainTextResponse
 from app.api.routes_analyze import router as analyze_router
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.routes_policies import router as policies_router
+from app.rag.config import RUNTIME_WARMUP_ON_STARTUP
+from app.rag.runtime import get_runtime
+from app.services.metrics import StageTimingMiddleware, render_prometheus
 
-app = FastAPI(title="LogWatch AI", version="0.1.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 임베딩 모델/스토어/BM25를 백그라운드에서 미리 로딩 (/health는 바로 응답)
+    if RUNTIME_WARMUP_ON_STARTUP:
+        get_runtime().start_warmup()
+    yield
+
+app = FastAPI(title="LogWatch AI", version="0.1.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -13,9 +25,25 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# /api/analyze* 요청의 stage별 타이밍 -> /metrics histogram
+app.add_middleware(StageTimingMiddleware, prefix="/api/analyze")
+
 @app.get("/health")
 def health():
     return {"status":"ok"}
 
+# warmup 완료 여부 (완료 전/실패 시 503)
+@app.get("/ready")
+def ready(response: Response):
+    status = get_runtime().status()
+    if not status["ready"]:
+        response.status_code = 503
+    return status
+
+# Prometheus text format (stage/request latency histogram, label: endpoint, mode, decision)
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
 app.include_router(analyze_router, prefix="/api")
 app.include_router(policies_router)
@@ -1,5 +1,5 @@
-from typing import List, Optional, Literal
-from pydantic import BaseModel, Field
+from typing import Annotated, Dict, List, Optional, Literal, Union
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr, model_validator
 
 # --------------------------------------------------------
 # Request (입력 로그 구조)
@@ -48,10 +48,32 @@ class Baseline(BaseModel):
     known_devices: List[str] = Field(default_factory=list)
     typical_login_hours: List[int] = Field(default_factory=list)
 
+    # 조회용 set은 처음 한 번만 만든다
+    _country_set: Optional[frozenset] = PrivateAttr(default=None)
+    _device_set: Optional[frozenset] = PrivateAttr(default=None)
+
+    def country_set(self) -> frozenset:
+        if self._country_set is None:
+            self._country_set = frozenset(self.known_countries)
+        return self._country_set
+
+    def device_set(self) -> frozenset:
+        if self._device_set is None:
+            self._device_set = frozenset(self.known_devices)
+        return self._device_set
+
 # 부가 정보 묶음
 class AnalyzeContext(BaseModel):
     baseline: Optional[Baseline] = None
     retrieval_mode: Optional[Literal["vector", "hybrid"]] = None
+    # /analyze/actors 전용: user_id별 baseline (없으면 baseline 사용)
+    baselines: Optional[Dict[str, Baseline]] = None
+    # True면 서버 feature store(tenant_id, user_id)에 이벤트를 누적해서 피처 계산
+    # -> logs에는 새 이벤트만 보내면 됨, baseline은 성공 로그인에서 학습
+    stateful: Optional[bool] = None
+    # 검색 latency budget(ms), 없으면 RETRIEVAL_DEADLINE_MS
+    # 넘으면 최근 검색 결과/BM25만/evidence 없음으로 대체 (debug.retrieval_path)
+    deadline_ms: Optional[float] = Field(default=None, gt=0)
 
 # /analyze 요청 전체 포맷
 class AnalyzeRequest(BaseModel):
@@ -60,6 +82,55 @@ class AnalyzeRequest(BaseModel):
     logs: List[LogEvent]
     context: Optional[AnalyzeContext] = None
 
+# ----------------------------------------------------
+# 컬럼형 입력 (/analyze의 logs 대신 columns)
+
+# dictionary 코드 (dicts.<field>의 index)
+Code = Annotated[int, Field(ge=0)]
+
+# 코드 -> 문자열
+class LogColumnDicts(BaseModel):
+    user_id: List[str]
+    action: List[str]
+    result: List[Literal["SUCCESS", "FAIL"]]
+    country: List[str] = Field(default_factory=list)
+    device_id: List[str] = Field(default_factory=list)
+
+# 필드별 배열 하나 (행 i = 각 배열의 i번째 값), 반복 문자열은 dicts의 코드로 보낸다
+class LogColumnsInput(BaseModel):
+    ts: Union[List[int], List[str]]  # epoch milliseconds 또는 ISO-8601 문자열
+    user_id: List[Code]
+    action: List[Code]
+    result: List[Code]
+    country: Optional[List[Optional[Code]]] = None  # null = 값 없음
+    device_id: Optional[List[Optional[Code]]] = None
+    dicts: LogColumnDicts
+
+    @model_validator(mode="after")
+    def _same_length(self):
+        n = len(self.ts)
+        for name in ("user_id", "action", "result", "country", "device_id"):
+            col = getattr(self, name)
+            if col is not None and len(col) != n:
+                raise ValueError(f"columns.{name} has {len(col)} rows, expected {n} (len(ts))")
+        return self
+
+# /analyze 컬럼형 요청 (LogEvent를 만들지 않고 바로 피처 계산)
+class AnalyzeColumnsRequest(BaseModel):
+    request_id: Optional[str] = None
+    tenant_id: Optional[str] = None
+    columns: LogColumnsInput
+    context: Optional[AnalyzeContext] = None
+
+# /analyze/stream (NDJSON) 첫 줄에 올 수 있는 헤더 (event_id가 없는 객체)
+# 헤더 필드 외의 key가 있으면 거부 (event_id만 빠진 이벤트가 빈 헤더로 처리되어 버려지지 않도록)
+class AnalyzeStreamHeader(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    request_id: Optional[str] = None
+    tenant_id: Optional[str] = None
+    context: Optional[AnalyzeContext] = None
+
 # -----------------------------------------------------
 # Response (출력 형태)
 
@@ -85,6 +156,11 @@ class Evidence(BaseModel):
     chunk_id: str 
     quote: Optional[str] = None
     distance: Optional[float] = None # vector distance (smaller = more similar)
+    # hybrid 전용: 소스별 순위(1-based)/점수와 RRF 융합 점수
+    vector_rank: Optional[int] = None
+    bm25_rank: Optional[int] = None
+    bm25_score: Optional[float] = None
+    fused_score: Optional[float] = None
 
 # 점수/등급/결정 요약
 class AnalyzeSummary(BaseModel):
@@ -99,4 +175,12 @@ class AnalyzeResponse(BaseModel):
     signals: List[Signal]
     recommended_actions: List[ActionItem]
     evidence: List[Evidence] = Field(default_factory=list)
-    debug: Optional[dict] = None
\ No newline at end of file
+    debug: Optional[dict] = None
+
+# /analyze/actors: actor(user_id)별 결과
+class ActorAnalyzeResponse(AnalyzeResponse):
+    user_id: str
+
+class AnalyzeActorsResponse(BaseModel):
+    request_id: Optional[str] = None
+    actors: List[ActorAnalyzeResponse]
\ No newline at end of file
@@ -0,0 +1,242 @@
+from __future__ import annotations
+import json
+import math
+import re
+from array import array
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+# rank_bm25.BM25Okapi 기본값과 동일 (기존 BM25Retriever와 같은 점수)
+BM25_K1 = 1.5
+BM25_B = 0.75
+BM25_EPSILON = 0.25
+
+
+# 이전 BM25Retriever 기본 전처리와 동일: 공백 기준 split (이전 스냅샷 호환용)
+def whitespace_tokenize(text: str) -> List[str]:
+    return text.split()
+
+
+# 한글 음절/자모 연속 구간 | 그 외 문자/숫자 연속 구간 (문장부호는 버림)
+_HANGUL = "\uac00-\ud7a3\u3131-\u318e"
+_WORD_RE = re.compile(rf"[{_HANGUL}]+|[^\W{_HANGUL}]+")
+_HANGUL_RE = re.compile(rf"[{_HANGUL}]")
+
+
+def make_korean_tokenizer(n: int = 2) -> Callable[[str], List[str]]:
+    """
+    한국어 정책 문서용 tokenizer.
+    - 소문자화, 문장부호 제거
+    - 영문/숫자 단어는 그대로
+    - 한글 구간은 글자 n-gram ("로그인은" -> "로그", "그인", "인은")이라 조사/어미가 붙어도 매칭된다
+      (n보다 짧은 구간은 통째로)
+    """
+    def tokenize(text: str) -> List[str]:
+        out: List[str] = []
+        for w in _WORD_RE.findall(text.lower()):
+            if len(w) <= n or not _HANGUL_RE.match(w):
+                out.append(w)
+            else:
+                out.extend(w[i:i + n] for i in range(len(w) - n + 1))
+        return out
+    return tokenize
+
+
+# 스냅샷 manifest에 이름으로 기록 -> 검색 시 같은 tokenizer 사용
+TOKENIZERS: Dict[str, Callable[[str], List[str]]] = {
+    "whitespace": whitespace_tokenize,
+    "korean": make_korean_tokenizer(2),
+    "korean3": make_korean_tokenizer(3),
+}
+
+
+def get_tokenizer(name: str) -> Callable[[str], List[str]]:
+    try:
+        return TOKENIZERS[name]
+    except KeyError:
+        raise ValueError(f"unknown bm25 tokenizer: {name} (one of {sorted(TOKENIZERS)})") from None
+
+
+class BM25Index:
+    """
+    미리 계산된 BM25(Okapi) 통계.
+    - vocab: term -> term_id
+    - idf[term_id], doc_len[doc]
+    - posting list(CSR): post_ptr[t]:post_ptr[t+1] 구간의 (post_doc, post_tf)
+    배열은 np.load(mmap_mode="r")로 열 수 있어서 worker 간 페이지 공유가 된다.
+    """
+    FILES = ("idf", "doc_len", "post_ptr", "post_doc", "post_tf")
+
+    def __init__(
+            self,
+            vocab: Dict[str, int],
+            idf: np.ndarray,
+            doc_len: np.ndarray,
+            post_ptr: np.ndarray,
+            post_doc: np.ndarray,
+            post_tf: np.ndarray,
+            *,
+            avgdl: float,
+            k1: float = BM25_K1,
+            b: float = BM25_B,
+    ):
+        self.vocab = vocab
+        self.idf = idf
+        self.doc_len = doc_len
+        self.post_ptr = post_ptr
+        self.post_doc = post_doc
+        self.post_tf = post_tf
+        self.avgdl = avgdl
+        self.k1 = k1
+        self.b = b
+
+    @property
+    def n_docs(self) -> int:
+        return int(len(self.doc_len))
+
+    def score_postings(self, tokens: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        query term이 등장하는 문서(posting)만 점수 계산 -> (docs, scores), docs 오름차순.
+        점수는 BM25Okapi.get_scores와 같은 값 (중복 query term은 중복 합산).
+        """
+        vocab = self.vocab
+        terms = [t for t in (vocab.get(tok) for tok in tokens) if t is not None]
+        if not terms:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        # 모든 query term의 posting 구간을 한 번에 모아서 계산 (term별 numpy 호출 없이)
+        t = np.asarray(terms, dtype=np.int64)
+        lo = self.post_ptr[t]
+        lens = self.post_ptr[t + 1] - lo
+        starts = np.cumsum(lens) - lens
+        pos = np.repeat(lo - starts, lens) + np.arange(int(lens.sum()))
+        docs = self.post_doc[pos]
+        tf = self.post_tf[pos].astype(np.float64)
+        dl = self.doc_len[docs]
+        contrib = np.repeat(self.idf[t], lens) * (
+            tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * dl / self.avgdl))
+        )
+        if len(terms) == 1:
+            # posting 안의 doc은 이미 오름차순, 중복 없음
+            return docs.astype(np.int64), contrib
+        uniq, inv = np.unique(docs, return_inverse=True)
+        return uniq.astype(np.int64), np.bincount(inv, weights=contrib)
+
+    def get_scores(self, tokens: Sequence[str]) -> np.ndarray:
+        """모든 문서에 대한 BM25 점수 (query term이 없는 문서는 0)"""
+        scores = np.zeros(self.n_docs)
+        docs, s = self.score_postings(tokens)
+        scores[docs] = s
+        return scores
+
+    def top_k(self, tokens: Sequence[str], k: int) -> List[Tuple[int, float]]:
+        """
+        점수 상위 k개 [(doc, score)] (점수 내림차순, 같으면 doc 순서).
+        query term이 하나도 없는 문서는 후보에서 제외 (점수 0인 문서로 top-k를 채우지 않음).
+        """
+        docs, scores = self.score_postings(tokens)
+        if k <= 0 or len(docs) == 0:
+            return []
+        if len(docs) > k:
+            # 전체 정렬 없이 상위 k개만 선택 후 그 안에서만 정렬
+            part = np.argpartition(-scores, k - 1)[:k]
+            docs, scores = docs[part], scores[part]
+        order = np.lexsort((docs, -scores))
+        return [(int(docs[i]), float(scores[i])) for i in order]
+
+    # ---------------------------------
+    # 저장 / 로딩
+    # ---------------------------------
+    def save(self, out_dir: Path, prefix: str = "bm25") -> Dict:
+        terms = [""] * len(self.vocab)
+        for term, t in self.vocab.items():
+            terms[t] = term
+        (out_dir / f"{prefix}_vocab.json").write_text(
+            json.dumps(terms, ensure_ascii=False), encoding="utf-8"
+        )
+        for name in self.FILES:
+            np.save(out_dir / f"{prefix}_{name}.npy", np.asarray(getattr(self, name)))
+        return {"k1": self.k1, "b": self.b, "avgdl": self.avgdl, "n_terms": len(terms)}
+
+    @classmethod
+    def load(cls, in_dir: Path, params: Dict, prefix: str = "bm25", mmap: bool = True) -> "BM25Index":
+        terms = json.loads((in_dir / f"{prefix}_vocab.json").read_text(encoding="utf-8"))
+        mode = "r" if mmap else None
+        # np.memmap 그대로 slicing하면 조각마다 memmap 객체가 생겨 느리므로 일반 ndarray view로 (여전히 mmap 공유)
+        arrays = {
+            name: np.load(in_dir / f"{prefix}_{name}.npy", mmap_mode=mode).view(np.ndarray) for name in cls.FILES
+        }
+        return cls(
+            {term: t for t, term in enumerate(terms)},
+            avgdl=float(params["avgdl"]),
+            k1=float(params.get("k1", BM25_K1)),
+            b=float(params.get("b", BM25_B)),
+            **arrays,
+        )
+
+
+class BM25IndexBuilder:
+    """
+    문서를 하나씩 받아(add) posting을 쌓고, build()에서 CSR 배열로 변환.
+    문서 텍스트 자체는 들고 있지 않는다.
+    """
+    def __init__(self, *, k1: float = BM25_K1, b: float = BM25_B, epsilon: float = BM25_EPSILON):
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+        self.vocab: Dict[str, int] = {}
+        self._df = array("q")
+        self._doc_len = array("q")
+        self._p_term = array("q")
+        self._p_doc = array("q")
+        self._p_tf = array("q")
+
+    def add(self, tokens: Sequence[str]) -> int:
+        doc = len(self._doc_len)
+        self._doc_len.append(len(tokens))
+        for tok, tf in Counter(tokens).items():
+            t = self.vocab.get(tok)
+            if t is None:
+                t = len(self.vocab)
+                self.vocab[tok] = t
+                self._df.append(0)
+            self._df[t] += 1
+            self._p_term.append(t)
+            self._p_doc.append(doc)
+            self._p_tf.append(tf)
+        return doc
+
+    def build(self) -> BM25Index:
+        n_docs = len(self._doc_len)
+        n_terms = len(self.vocab)
+        doc_len = np.frombuffer(self._doc_len, dtype=np.int64).astype(np.int32)
+        avgdl = float(doc_len.sum()) / n_docs if n_docs else 0.0
+
+        # idf: BM25Okapi._calc_idf와 동일 (음수 idf는 epsilon * 평균 idf로 대체)
+        idf_list = [math.log(n_docs - d + 0.5) - math.log(d + 0.5) for d in self._df]
+        idf = np.array(idf_list, dtype=np.float64)
+        if n_terms:
+            eps = self.epsilon * (sum(idf_list) / n_terms)
+            idf[idf < 0] = eps
+
+        # posting -> term 기준 CSR (같은 term 안에서는 doc 순서 유지)
+        p_term = np.frombuffer(self._p_term, dtype=np.int64)
+        order = np.argsort(p_term, kind="stable")
+        post_doc = np.frombuffer(self._p_doc, dtype=np.int64)[order].astype(np.int32)
+        post_tf = np.frombuffer(self._p_tf, dtype=np.int64)[order].astype(np.int32)
+        post_ptr = np.zeros(n_terms + 1, dtype=np.int64)
+        np.cumsum(np.bincount(p_term, minlength=n_terms), out=post_ptr[1:])
+
+        return BM25Index(
+            dict(self.vocab), idf, doc_len, post_ptr, post_doc, post_tf,
+            avgdl=avgdl, k1=self.k1, b=self.b,
+        )
+
+
+def build_bm25_index(token_lists: Sequence[Sequence[str]]) -> BM25Index:
+    builder = BM25IndexBuilder()
+    for tokens in token_lists:
+        builder.add(tokens)
+    return builder.build()
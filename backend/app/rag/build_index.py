@@ -1,45 +1,293 @@
 from __future__ import annotations
-from .config import POLICY_DIR, VECTORSTORE_DIR, CHROMA_COLLECTION, EMBEDDING_MODEL_NAME
-from .loaders import load_policies
-from .chunking import make_chunks
+import argparse
+from typing import Callable, Dict, List, Optional, Tuple
+from .config import (
+    VECTORSTORE_DIR,
+    EMBEDDING_MODEL_NAME,
+    INGEST_WORKERS,
+    INGEST_EMBED_BATCH_SIZE,
+    EVIDENCE_TABLE_ENABLED,
+)
+from .loaders import iter_policy_files
+from .chunking import Chunk
 from .embedder import Embedder
 from .chroma_store import ChromaStore
+from .corpus_snapshot import CorpusSnapshot, SnapshotWriter, load_snapshot
+from .index_manifest import (
+    new_manifest,
+    load_manifest,
+    save_manifest,
+    record_file,
+)
+from .ingest import FileChunks, IngestProgress, ReuseFn, iter_file_chunks
+from .tenants import DEFAULT_TENANT, TenantPaths, invalidate_indexed_tenants, list_tenants, tenant_paths
+
+
+class _EmbedSink:
+    """
+    청크를 모아서 batch_size마다 임베딩 + upsert, 벡터는 스냅샷 행렬(writer)에도 기록.
+    임베딩 모델은 실제로 임베딩할 청크가 생길 때 처음 로딩한다.
+    - add(): 새/바뀐 청크 -> 임베딩
+    - keep(): 안 바뀐 청크 -> 이전 스냅샷 행렬, 없으면 Chroma에 저장된 벡터를 그대로 사용
+    """
+    def __init__(
+            self,
+            store: ChromaStore,
+            progress: IngestProgress,
+            writer: SnapshotWriter,
+            prev: Optional[CorpusSnapshot] = None,
+            prev_idx: Optional[Dict[str, int]] = None,
+            batch_size: int = INGEST_EMBED_BATCH_SIZE,
+    ):
+        self.store = store
+        self.progress = progress
+        self.writer = writer
+        self.prev_vectors = prev.vectors if prev is not None else None
+        self.prev_idx = prev_idx or {}
+        self.batch_size = batch_size
+        self.embedder: Optional[Embedder] = None
+        self.buf: List[Tuple[int, Chunk]] = []
+        self.fetch_buf: List[Tuple[int, str]] = []
+
+    def add(self, pos: int, chunk: Chunk):
+        self.buf.append((pos, chunk))
+        if len(self.buf) >= self.batch_size:
+            self.flush()
+
+    def keep(self, pos: int, chunk: Chunk):
+        i = self.prev_idx.get(chunk.chunk_id)
+        if self.prev_vectors is not None and i is not None:
+            self.writer.set_vector(pos, self.prev_vectors.vector(i))
+            return
+        self.fetch_buf.append((pos, chunk.chunk_id))
+        if len(self.fetch_buf) >= self.batch_size:
+            self.flush_fetch()
+
+    def flush_fetch(self):
+        if not self.fetch_buf:
+            return
+        found = self.store.get_embeddings([cid for _, cid in self.fetch_buf])
+        for pos, cid in self.fetch_buf:
+            if cid not in found:
+                raise RuntimeError(f"chunk {cid} is unchanged but missing from chroma; run a full rebuild")
+            self.writer.set_vector(pos, found[cid])
+        self.fetch_buf = []
+
+    def flush(self):
+        self.flush_fetch()
+        if not self.buf:
+            return
+        if self.embedder is None:
+            self.embedder = Embedder(EMBEDDING_MODEL_NAME)
+        chunks = [c for _, c in self.buf]
+        texts = [c.text for c in chunks]
+        vecs = self.embedder.embed_texts(texts)
+        self.store.upsert(
+            ids=[c.chunk_id for c in chunks],
+            documents=texts,
+            metadatas=[c.metadata for c in chunks],
+            embeddings=vecs,
+        )
+        for (pos, _), v in zip(self.buf, vecs):
+            self.writer.set_vector(pos, v)
+        self.progress.embedded += len(chunks)
+        self.buf = []
+
+
+def _ingest(
+        paths: TenantPaths,
+        store: ChromaStore,
+        manifest: Dict,
+        select: Callable[[Chunk], bool],
+        *,
+        reuse: Optional[ReuseFn] = None,
+        workers: Optional[int] = INGEST_WORKERS,
+        prev: Optional[CorpusSnapshot] = None,
+        prev_idx: Optional[Dict[str, int]] = None,
+) -> Dict:
+    """
+    파일 로딩(병렬) -> 청크 generator -> 스냅샷/manifest 기록 -> select된 청크만 배치 임베딩/upsert.
+    전체 청크/임베딩을 한꺼번에 메모리에 올리지 않는다.
+    """
+    progress = IngestProgress()
+    # 런타임이 PDF 파싱/청킹/BM25 계산 없이 바로 쓰도록 스냅샷 저장 (임베딩 행렬 포함)
+    writer = SnapshotWriter(paths.snapshot_dir)
+    sink = _EmbedSink(store, progress, writer, prev, prev_idx)
+
+    fc: FileChunks
+    for fc in iter_file_chunks(iter_policy_files(paths.policy_dir), reuse=reuse, workers=workers):
+        record_file(manifest, fc.path.name, fc.sha256, fc.chunks)
+        for c in fc.chunks:
+            pos = writer.add(c)
+            if select(c):
+                sink.add(pos, c)
+            else:
+                sink.keep(pos, c)
+        progress.add_file(fc)
+        progress.report()
+    sink.flush()
+    progress.report(force=True)
+
+    print("[build_index] write corpus snapshot...")
+    return writer.finish({
+        "tenant": paths.tenant,
+        "chroma_collection": paths.collection,
+        "embedding_model": EMBEDDING_MODEL_NAME,
+    })
+
+def _build_evidence_table(paths: TenantPaths, snapshot_manifest: Dict):
+    """
+    새 스냅샷 기준으로 signal 조합별 evidence 표 생성 (런타임과 같은 retriever 설정으로 실제 검색)
+    """
+    # 방금 게시한 tenant 인덱스가 resolve_tenant에 바로 보이도록 (캐시된 tenant 목록 무효화)
+    invalidate_indexed_tenants()
+    if not EVIDENCE_TABLE_ENABLED:
+        return
+    from .runtime import RetrievalRuntime
+    from .evidence_table import TABLE_MODES, write_evidence_table
+
+    print("[build_index] build evidence table...")
+    rt = RetrievalRuntime()
+    retrievers = [rt.get_retriever(mode, paths.tenant) for mode in TABLE_MODES]
+    info = write_evidence_table(paths.snapshot_dir, snapshot_manifest["index_version"], retrievers)
+    print(f"[build_index] evidence table: {info['rows']} rows in {info['seconds']}s -> {info['path']}")
+
+def _print_done(paths: TenantPaths, snapshot_manifest: Dict):
+    print(f"[build_index] done. (tenant={paths.tenant})")
+    print(f"[build_index] persist_dir = {VECTORSTORE_DIR}")
+    print(f"[build_index] collection = {paths.collection}")
+    print(f"[build_index] snapshot_dir = {paths.snapshot_dir} (index_version={snapshot_manifest['index_version']})")
 
-def main(reset: bool = True):
-    VECTORSTORE_DIR.mkdir(parents=True, exist_ok=True)
 
-    print(f"[build_index] policy_dir = {POLICY_DIR}")
-    sections = load_policies(POLICY_DIR)
-    print(f"[build_index] loaded sections = {len(sections)}")
+def main(
+        reset: bool = True,
+        incremental: bool = False,
+        workers: Optional[int] = INGEST_WORKERS,
+        tenant: Optional[str] = None,
+):
+    paths = tenant_paths(tenant)
+    if incremental:
+        return main_incremental(workers=workers, tenant=paths.tenant)
 
-    chunks = make_chunks(sections)
-    print(f"[build_index] total chunks = {len(chunks)}")
+    VECTORSTORE_DIR.mkdir(parents=True, exist_ok=True)
 
-    if not chunks:
-        print("[build_index] no chunks to index. abort.")
+    print(f"[build_index] policy_dir = {paths.policy_dir}")
+    if not iter_policy_files(paths.policy_dir):
+        print("[build_index] no policy files to index. abort.")
         return
-    
-    embedder = Embedder(EMBEDDING_MODEL_NAME)
-    store = ChromaStore(str(VECTORSTORE_DIR), CHROMA_COLLECTION)
+
+    store = ChromaStore(str(VECTORSTORE_DIR), paths.collection)
 
     if reset:
         print("[build_index] reset chroma collection")
         store.reset()
 
-    texts = [c.text for c in chunks]
-    ids = [c.chunk_id for c in chunks]
-    metas = [c.metadata for c in chunks]
+    manifest = new_manifest(paths.collection, EMBEDDING_MODEL_NAME)
+    snapshot_manifest = _ingest(paths, store, manifest, lambda c: True, workers=workers)
+    save_manifest(manifest, paths.manifest_path)
+    print(f"[build_index] total chunks = {snapshot_manifest['n_chunks']}")
+    _build_evidence_table(paths, snapshot_manifest)
+    _print_done(paths, snapshot_manifest)
 
-    print("[build_index] embedding...")
-    vecs = embedder.embed_texts(texts)
 
-    print("[build_index] upsert to chroma...")
-    store.upsert(ids=ids, documents=texts, metadatas=metas, embeddings=vecs)
+def main_incremental(workers: Optional[int] = INGEST_WORKERS, tenant: Optional[str] = None) -> Dict[str, int]:
+    """
+    manifest의 파일/청크 해시를 비교해서 바뀐 부분만 반영.
+    - 파일 해시가 같으면 파싱 없이 이전 스냅샷의 청크를 재사용
+    - 청크 해시가 같으면 재임베딩하지 않음 (기존 벡터 유지)
+    - 사라진 chunk_id는 ChromaStore에서 삭제
+    컬렉션을 비우지 않으므로 갱신 중에도 인덱스가 빈 상태가 되지 않는다.
+    """
+    paths = tenant_paths(tenant)
+    old = load_manifest(paths.manifest_path)
+    if (
+        old is None
+        or old.get("collection") != paths.collection
+        or old.get("embedding_model") != EMBEDDING_MODEL_NAME
+    ):
+        print("[build_index] no compatible manifest. fallback to full rebuild.")
+        return main(reset=True, workers=workers, tenant=paths.tenant)
 
-    print("[build_index] done.")
-    print(f"[build_index] persist_dir = {VECTORSTORE_DIR}")
-    print(f"[build_index] collection = {CHROMA_COLLECTION}")
+    VECTORSTORE_DIR.mkdir(parents=True, exist_ok=True)
+    print(f"[build_index] policy_dir = {paths.policy_dir} (incremental)")
+
+    snap = load_snapshot(paths.snapshot_dir)
+    snap_idx: Dict[str, int] = {}
+    if snap is not None:
+        for i in range(len(snap)):
+            snap_idx[snap.metadata(i)["chunk_id"]] = i
+
+    def reuse(path, sha):
+        prev = old["files"].get(path.name)
+        if not prev or prev["sha256"] != sha:
+            return None
+        if not all(cid in snap_idx for cid in prev["chunk_ids"]):
+            return None
+        return lambda: [
+            Chunk(chunk_id=cid, text=snap.text(snap_idx[cid]), metadata=snap.metadata(snap_idx[cid]))
+            for cid in prev["chunk_ids"]
+        ]
+
+    counts = {"added": 0, "updated": 0, "deleted": 0, "skipped": 0}
+    # record_file이 select보다 먼저 호출되어 새 청크 해시가 들어 있음
+    manifest = new_manifest(paths.collection, EMBEDDING_MODEL_NAME)
+
+    def select(c: Chunk) -> bool:
+        prev_hash = old["chunks"].get(c.chunk_id)
+        if prev_hash is None:
+            counts["added"] += 1
+            return True
+        if prev_hash != manifest["chunks"][c.chunk_id]:
+            counts["updated"] += 1
+            return True
+        counts["skipped"] += 1
+        return False
+
+    store = ChromaStore(str(VECTORSTORE_DIR), paths.collection)
+    snapshot_manifest = _ingest(
+        paths, store, manifest, select, reuse=reuse, workers=workers, prev=snap, prev_idx=snap_idx
+    )
+
+    deleted_ids = [cid for cid in old["chunks"] if cid not in manifest["chunks"]]
+    counts["deleted"] = len(deleted_ids)
+    if deleted_ids:
+        print(f"[build_index] delete {len(deleted_ids)} chunks from chroma")
+        store.delete(deleted_ids)
+
+    save_manifest(manifest, paths.manifest_path)
+    _build_evidence_table(paths, snapshot_manifest)
+
+    print(
+        "[build_index] added={added} updated={updated} deleted={deleted} skipped={skipped}".format(**counts)
+    )
+    _print_done(paths, snapshot_manifest)
+    return counts
 
 # 파일을 직접 실행했을 때만 실행
 if __name__ == "__main__":
-    main(reset=True)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="정책 문서 인덱스 생성/갱신")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="manifest 해시 기준으로 바뀐 청크만 재임베딩 (기본: 컬렉션 초기화 후 전체 재생성)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=INGEST_WORKERS,
+        help="문서 로딩 프로세스 수 (기본: CPU 코어 수, 1이면 단일 프로세스)",
+    )
+    parser.add_argument(
+        "--tenant",
+        action="append",
+        help=f"인덱싱할 tenant (여러 번 지정 가능, 기본: {DEFAULT_TENANT}). 문서 위치는 app/rag/tenants.py 참고",
+    )
+    parser.add_argument(
+        "--all-tenants",
+        action="store_true",
+        help="default + 정책 디렉토리가 있는 모든 tenant",
+    )
+    args = parser.parse_args()
+    tenants = [DEFAULT_TENANT] + list_tenants() if args.all_tenants else (args.tenant or [DEFAULT_TENANT])
+    for t in tenants:
+        main(reset=not args.incremental, incremental=args.incremental, workers=args.workers, tenant=t)
@@ -1,14 +1,36 @@
 from __future__ import annotations
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 import chromadb
 from chromadb.config import Settings
+from langchain_core.documents import Document
+
+# 같은 persist_dir의 client는 프로세스 안에서 설정이 같아야 하므로 빌드/런타임 모두 이 함수로 생성
+def chroma_client(persist_dir: str):
+    return chromadb.PersistentClient(
+        path=persist_dir,
+        settings=Settings(anonymized_telemetry=False),
+    )
+
+# langchain Chroma에 여러 query 벡터를 한 번에 검색 -> query별 [(Document, cosine distance)]
+# (langchain의 similarity_search_by_vector*는 벡터 1개씩만 받음)
+def chroma_search_by_vectors(vs, vectors: List[List[float]], k: int) -> List[List[Tuple[Document, float]]]:
+    res = vs._collection.query(
+        query_embeddings=vectors,
+        n_results=k,
+        include=["documents", "metadatas", "distances"],
+    )
+    return [
+        [
+            (Document(page_content=doc, metadata=meta or {}, id=_id), dist)
+            for doc, meta, _id, dist in zip(docs, metas, ids, dists)
+            if doc is not None
+        ]
+        for docs, metas, ids, dists in zip(res["documents"], res["metadatas"], res["ids"], res["distances"])
+    ]
 
 class ChromaStore:
     def __init__(self, persist_dir: str, collection_name: str):
-        self.client = chromadb.PersistentClient(
-            path=persist_dir,
-            settings=Settings(anonymized_telemetry=False),
-        )
+        self.client = chroma_client(persist_dir)
         self.collection = self.client.get_or_create_collection(
             name=collection_name,
             metadata={"hnsw:space":"cosine"},
@@ -36,9 +58,24 @@ class ChromaStore:
             embeddings=embeddings,
         )
         
+    def delete(self, ids: List[str]):
+        if ids:
+            self.collection.delete(ids=ids)
+
+    def get_embeddings(self, ids: List[str]) -> Dict[str, List[float]]:
+        # 저장된 벡터 조회 (증분 빌드에서 재임베딩 없이 스냅샷 행렬을 채울 때)
+        if not ids:
+            return {}
+        res = self.collection.get(ids=ids, include=["embeddings"])
+        return dict(zip(res["ids"], res["embeddings"]))
+
     def query(self, query_embedding: List[float], top_k: int = 5):
+        return self.query_many([query_embedding], top_k)
+
+    def query_many(self, query_embeddings: List[List[float]], top_k: int = 5):
+        # 여러 query 벡터를 한 번에 검색 (결과의 각 필드는 query별 리스트)
         return self.collection.query(
-            query_embeddings=[query_embedding],
+            query_embeddings=query_embeddings,
             n_results=top_k,
             include=["documents","metadatas","distances"]
         )
\ No newline at end of file
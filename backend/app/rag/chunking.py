@@ -57,9 +57,14 @@ def chunk_text(text: str, max_chars: int = 900, overlap: int = 150) -> List[str]
 
     return out
 
+# chunk_id의 섹션 번호는 문서(doc_id)별로 매긴다.
+# -> 다른 파일이 추가/수정되어도 나머지 파일의 chunk_id가 바뀌지 않음 (증분 인덱싱 전제)
 def make_chunks(sections: List[RawSection]) -> List[Chunk]:
     chunks: List[Chunk] = []
-    for s_idx, sec in enumerate(sections):
+    sec_counter: Dict[str, int] = {}
+    for sec in sections:
+        s_idx = sec_counter.get(sec.doc_id, 0)
+        sec_counter[sec.doc_id] = s_idx + 1
         parts = chunk_text(sec.text)
         for c_idx, part in enumerate(parts):
             chunk_id = f"{sec.doc_id}::s{s_idx}::c{c_idx}"
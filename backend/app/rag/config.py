@@ -9,14 +9,77 @@ POLICY_DIR = DATA_DIR / "policies"
 VECTORSTORE_DIR = DATA_DIR / "vectorstore" / "chroma"
 CHROMA_COLLECTION = "policies"
 
+# 청크 코퍼스 + BM25 통계 스냅샷 (build_index가 생성, 런타임은 mmap으로 로딩)
+CORPUS_SNAPSHOT_DIR = DATA_DIR / "vectorstore" / "corpus"
+
+# 증분 인덱싱 manifest (파일/청크 내용 해시)
+INDEX_MANIFEST_PATH = DATA_DIR / "vectorstore" / "index_manifest.json"
+
+# tenant별 정책 문서(<root>/<tenant_id>/*)와 인덱스(<root>/<tenant_id>/corpus, index_manifest.json)
+# default tenant는 위의 POLICY_DIR / CHROMA_COLLECTION / CORPUS_SNAPSHOT_DIR 사용 (app/rag/tenants.py)
+TENANT_POLICY_ROOT = DATA_DIR / "tenants"
+TENANT_INDEX_ROOT = DATA_DIR / "vectorstore" / "tenants"
+# 인덱스가 있는 tenant 목록을 다시 스캔하는 주기 (초). 요청의 tenant_id마다 파일시스템을 보지 않도록 목록을 캐시
+TENANT_INDEX_RESCAN_SECONDS = 2.0
+
+# 인덱스 빌드(ingestion) 병렬/배치 설정
+INGEST_WORKERS = None               # None이면 CPU 코어 수, 1 이하면 프로세스 풀 없이 실행
+INGEST_PDF_PAGES_PER_TASK = 16      # PDF 로딩 task 하나가 처리할 페이지 수
+INGEST_EMBED_BATCH_SIZE = 256       # 임베딩 + upsert 단위 청크 수
+
 # embeddings
 EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
 
+# query 임베딩 micro-batching (동시 요청을 모아서 encode 1회)
+EMBED_BATCH_ENABLED = True
+EMBED_BATCH_MAX_SIZE = 32
+EMBED_BATCH_MAX_WAIT_MS = 2.0
+
+# vector 검색 backend
+# - "chroma": langchain_chroma (HNSW)
+# - "numpy": 코퍼스 스냅샷의 임베딩 행렬(mmap)로 정확한 cosine top-k (스냅샷에 벡터가 없으면 chroma 사용)
+VECTOR_BACKEND = "chroma"
+# build_index가 스냅샷에 저장하는 임베딩 행렬 dtype: "float32" | "float16" | "int8"
+# (int8: float32의 1/4 크기, cosine 오차 ~0.003. float16은 numpy 변환이 느려서 batch query에 적합)
+VECTOR_INDEX_DTYPE = "int8"
+# float16/int8 행렬을 float32로 변환해서 곱할 때의 block 크기 (행 수, L2 cache에 들어가는 크기)
+VECTOR_SEARCH_BLOCK_ROWS = 1024
+
+# BM25 tokenizer (app/rag/bm25.py TOKENIZERS): "korean" = 영문 단어 + 한글 글자 2-gram, "whitespace" = 공백 split
+# 스냅샷 manifest에 기록되므로 바꾸면 build_index를 다시 실행
+BM25_TOKENIZER = "korean"
+
+# signal 조합별 evidence 사전 계산 표 (build_index가 코퍼스 스냅샷 디렉토리에 저장, app/rag/evidence_table.py)
+# 런타임은 표에 있는 query 조합이면 검색 없이 표에서 반환
+EVIDENCE_TABLE_ENABLED = True
+EVIDENCE_TABLE_FILE = "evidence_table.json"
+
 # Retrieval defaults
 RETRIEVAL_TOP_K = 5
 
 # Chroma cosine distance 기준 (작을수록 유사)
 RETRIEVAL_DISTANCE_THRESHOLD = 0.85
 
+# 검색 latency budget (요청당, ms). AnalyzeContext.deadline_ms로 요청별 지정 가능, None이면 제한 없음
+# - live 검색(임베딩 + vector/BM25)은 budget의 RETRIEVAL_VECTOR_BUDGET_SHARE까지만 기다림
+# - 넘으면: 같은 query의 최근 검색 결과 -> BM25만 (남은 budget 안에서) -> evidence 없음 순으로 대체
+RETRIEVAL_DEADLINE_MS = 150.0
+RETRIEVAL_VECTOR_BUDGET_SHARE = 0.7
+# fallback용으로 기억하는 최근 검색 결과 수 (retriever별, query 조합 단위)
+RETRIEVAL_FALLBACK_CACHE_SIZE = 256
+# deadline 검색을 실행하는 스레드 수 (모두 점유 중이면 대기열에서 budget을 넘겨 fallback)
+# 풀/상한 크기는 bench.loadgen on/off 측정 기준 (READEME.md '부하에서의 비용'), 키우면 과부하에서 오히려 느려짐
+RETRIEVAL_DEADLINE_WORKERS = 16
+# retriever당 동시에 올라가 있을 수 있는 live 검색 수, 넘으면 제출하지 않고 바로 fallback
+# (budget을 넘긴 검색은 시작 전이면 취소, 실행 중이면 끝날 때까지 이 수에 포함)
+RETRIEVAL_DEADLINE_MAX_INFLIGHT = 8
+
 # evidence snippet 길이 제한
-EVIDENCE_SNIPPET_MAX_CHARS = 350
\ No newline at end of file
+EVIDENCE_SNIPPET_MAX_CHARS = 350
+
+# (tenant, mode)별 PolicyRetriever pool의 메모리 예산 (tenant 인덱스 크기 추정치 합, 넘으면 LRU로 해제)
+RUNTIME_POOL_MEMORY_BYTES = 1024 * 1024 * 1024
+
+# 앱 시작 시 미리 로딩(warmup)할 retrieval mode
+RUNTIME_WARMUP_ON_STARTUP = True
+RUNTIME_WARMUP_MODES = ("vector", "hybrid")
@@ -0,0 +1,242 @@
+from __future__ import annotations
+import hashlib
+import json
+import mmap
+import shutil
+import time
+from array import array
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+
+from app.rag.bm25 import BM25Index, BM25IndexBuilder, get_tokenizer
+from app.rag.config import BM25_TOKENIZER, CORPUS_SNAPSHOT_DIR, VECTOR_INDEX_DTYPE
+from app.rag.vector_index import VectorFileWriter, VectorMatrix
+
+# 런타임에서 pypdf(loaders)를 끌어오지 않도록 타입용으로만 import
+if TYPE_CHECKING:
+    from app.rag.chunking import Chunk
+
+# 스냅샷 파일 포맷 버전 (레이아웃이 바뀌면 올린다 -> 이전 스냅샷은 무시)
+SNAPSHOT_FORMAT_VERSION = 1
+
+MANIFEST_FILE = "manifest.json"
+TEXTS_FILE = "texts.bin"
+TEXT_OFFSETS_FILE = "text_offsets.npy"
+META_FILE = "meta.jsonl"
+META_OFFSETS_FILE = "meta_offsets.npy"
+
+class SnapshotWriter:
+    """
+    청크를 하나씩 받아 스냅샷 디렉토리에 기록.
+    - texts.bin / meta.jsonl: 청크 텍스트/메타데이터를 이어 붙이고 offset 배열로 위치 기록
+    - bm25_*: BM25 term 통계 (posting list)
+    - vectors.bin: 청크 순서대로의 임베딩 행렬 (set_vector로 채운 경우, numpy vector backend용)
+    - manifest.json: 포맷 버전, index_version(내용 해시) 등
+    임시 디렉토리에 쓴 뒤 finish()에서 교체하므로 쓰는 중에도 기존 스냅샷은 그대로 읽힌다.
+    """
+    def __init__(
+            self,
+            out_dir: Path = CORPUS_SNAPSHOT_DIR,
+            *,
+            tokenizer: str = BM25_TOKENIZER,
+            vector_dtype: str = VECTOR_INDEX_DTYPE,
+    ):
+        self.out_dir = Path(out_dir)
+        self.tmp_dir = self.out_dir.with_name(self.out_dir.name + ".tmp")
+        if self.tmp_dir.exists():
+            shutil.rmtree(self.tmp_dir)
+        self.tmp_dir.mkdir(parents=True)
+
+        self.tokenizer_name = tokenizer
+        self._tokenize = get_tokenizer(tokenizer)
+        self._bm25 = BM25IndexBuilder()
+        self._hash = hashlib.sha256()
+
+        self._texts = open(self.tmp_dir / TEXTS_FILE, "wb")
+        self._metas = open(self.tmp_dir / META_FILE, "wb")
+        self._text_offsets = array("q", [0])
+        self._meta_offsets = array("q", [0])
+        self._vectors = VectorFileWriter(self.tmp_dir, vector_dtype)
+
+    def __len__(self) -> int:
+        return len(self._text_offsets) - 1
+
+    def add(self, chunk: Chunk) -> int:
+        """청크 추가 -> 스냅샷 내 위치 (set_vector에 사용)"""
+        pos = len(self)
+        text_b, meta_b, digest_b = _chunk_bytes(chunk)
+
+        self._texts.write(text_b)
+        self._metas.write(meta_b)
+        self._text_offsets.append(self._text_offsets[-1] + len(text_b))
+        self._meta_offsets.append(self._meta_offsets[-1] + len(meta_b))
+
+        self._bm25.add(self._tokenize(chunk.text))
+
+        self._hash.update(digest_b)
+        return pos
+
+    def set_vector(self, pos: int, vector) -> None:
+        self._vectors.put(pos, vector)
+
+    def finish(self, extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        self._texts.close()
+        self._metas.close()
+        np.save(self.tmp_dir / TEXT_OFFSETS_FILE, np.frombuffer(self._text_offsets, dtype=np.int64))
+        np.save(self.tmp_dir / META_OFFSETS_FILE, np.frombuffer(self._meta_offsets, dtype=np.int64))
+
+        bm25_params = self._bm25.build().save(self.tmp_dir)
+        vector_params = self._vectors.finish(len(self))
+
+        manifest = {
+            "format_version": SNAPSHOT_FORMAT_VERSION,
+            "index_version": self._hash.hexdigest()[:16],
+            "n_chunks": len(self),
+            "tokenizer": self.tokenizer_name,
+            "bm25": bm25_params,
+            "vectors": vector_params,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            **(extra or {}),
+        }
+        (self.tmp_dir / MANIFEST_FILE).write_text(
+            json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+
+        # 기존 스냅샷과 교체
+        old_dir = self.out_dir.with_name(self.out_dir.name + ".old")
+        if old_dir.exists():
+            shutil.rmtree(old_dir)
+        if self.out_dir.exists():
+            self.out_dir.rename(old_dir)
+        self.tmp_dir.rename(self.out_dir)
+        if old_dir.exists():
+            shutil.rmtree(old_dir, ignore_errors=True)
+        return manifest
+
+
+def write_snapshot(chunks, out_dir: Path = CORPUS_SNAPSHOT_DIR, **extra) -> Dict[str, Any]:
+    writer = SnapshotWriter(out_dir)
+    for c in chunks:
+        writer.add(c)
+    return writer.finish(extra)
+
+
+# index_version 해시 입력 (스냅샷/메모리 코퍼스 공통)
+def _chunk_bytes(chunk: Chunk):
+    text_b = chunk.text.encode("utf-8")
+    meta_b = (json.dumps(chunk.metadata or {}, ensure_ascii=False, sort_keys=True) + "\n").encode("utf-8")
+    return text_b, meta_b, chunk.chunk_id.encode("utf-8") + b"\0" + text_b + b"\0" + meta_b
+
+
+def _mmap_bytes(path: Path):
+    # 길이 0 파일은 mmap 불가
+    if path.stat().st_size == 0:
+        return b""
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class CorpusSnapshot:
+    """
+    build_index가 남긴 청크 코퍼스 스냅샷 (읽기 전용, memory-mapped).
+    - text(i) / metadata(i) / document(i): i번째 청크 (필요할 때만 디코딩)
+    - bm25: 미리 계산된 BM25 통계
+    - vectors: 임베딩 행렬 (build 시 저장한 경우, 없으면 None)
+    """
+    def __init__(self, root: Path, manifest: Dict[str, Any]):
+        self.root = root
+        self.manifest = manifest
+        self._texts = _mmap_bytes(root / TEXTS_FILE)
+        self._metas = _mmap_bytes(root / META_FILE)
+        self._text_offsets = np.load(root / TEXT_OFFSETS_FILE, mmap_mode="r")
+        self._meta_offsets = np.load(root / META_OFFSETS_FILE, mmap_mode="r")
+        # tokenizer 항목이 없던 스냅샷은 공백 split으로 만들어졌다
+        self.tokenize = get_tokenizer(manifest.get("tokenizer", "whitespace"))
+        self.bm25 = BM25Index.load(root, manifest["bm25"])
+        self.vectors: Optional[VectorMatrix] = (
+            VectorMatrix(root, manifest["vectors"]) if manifest.get("vectors") else None
+        )
+
+    source = "snapshot"
+
+    @property
+    def index_version(self) -> str:
+        return self.manifest["index_version"]
+
+    def __len__(self) -> int:
+        return int(self.manifest["n_chunks"])
+
+    def text(self, i: int) -> str:
+        lo, hi = int(self._text_offsets[i]), int(self._text_offsets[i + 1])
+        return self._texts[lo:hi].decode("utf-8")
+
+    def metadata(self, i: int) -> Dict[str, Any]:
+        lo, hi = int(self._meta_offsets[i]), int(self._meta_offsets[i + 1])
+        return json.loads(self._metas[lo:hi])
+
+    def document(self, i: int) -> Document:
+        return Document(page_content=self.text(i), metadata=self.metadata(i))
+
+    def bm25_search(self, query: str, k: int) -> List[tuple]:
+        """BM25 top-k -> [(Document, score)]"""
+        return [(self.document(i), s) for i, s in self.bm25.top_k(self.tokenize(query), k)]
+
+
+class InMemoryCorpus:
+    """
+    스냅샷이 없을 때 쓰는 메모리 코퍼스 (CorpusSnapshot과 같은 검색 인터페이스, 벡터 없음).
+    정책 문서를 직접 파싱해야 하므로 build_index 전 개발 환경용.
+    """
+    source = "policies"
+    vectors = None
+
+    def __init__(self, chunks: Iterable[Chunk], *, tokenizer: str = BM25_TOKENIZER):
+        self.tokenizer_name = tokenizer
+        self.tokenize = get_tokenizer(tokenizer)
+        self._docs: List[Document] = []
+        builder = BM25IndexBuilder()
+        h = hashlib.sha256()
+        for c in chunks:
+            self._docs.append(Document(page_content=c.text, metadata=c.metadata or {}))
+            builder.add(self.tokenize(c.text))
+            h.update(_chunk_bytes(c)[2])
+        self.bm25 = builder.build()
+        self.index_version = h.hexdigest()[:16]
+
+    @classmethod
+    def from_policies(cls, policy_dir: Optional[Path] = None) -> "InMemoryCorpus":
+        from app.rag.config import POLICY_DIR
+        from app.rag.loaders import load_policies
+        from app.rag.chunking import make_chunks
+
+        return cls(make_chunks(load_policies(policy_dir or POLICY_DIR)))
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def text(self, i: int) -> str:
+        return self._docs[i].page_content
+
+    def metadata(self, i: int) -> Dict[str, Any]:
+        return self._docs[i].metadata
+
+    def document(self, i: int) -> Document:
+        return self._docs[i]
+
+    def bm25_search(self, query: str, k: int) -> List[tuple]:
+        return [(self.document(i), s) for i, s in self.bm25.top_k(self.tokenize(query), k)]
+
+
+def load_snapshot(root: Path = CORPUS_SNAPSHOT_DIR) -> Optional[CorpusSnapshot]:
+    """스냅샷이 없거나 포맷 버전이 다르면 None"""
+    root = Path(root)
+    manifest_path = root / MANIFEST_FILE
+    if not manifest_path.exists():
+        return None
+    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    if manifest.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+        return None
+    return CorpusSnapshot(root, manifest)
@@ -0,0 +1,122 @@
+from __future__ import annotations
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+from langchain_core.embeddings import Embeddings
+
+from app.rag.config import EMBED_BATCH_MAX_SIZE, EMBED_BATCH_MAX_WAIT_MS
+
+
+class MicroBatchEmbeddings(Embeddings):
+    """
+    동시 요청들의 embed_query를 모아서 한 번의 encode로 처리하는 스케줄러.
+    - 첫 query가 들어오면 max_wait_ms 동안(또는 max_batch_size까지) 더 모은 뒤
+      base.embed_documents(batch) 한 번 호출 (HuggingFaceEmbeddings -> model.encode 1회)
+    - 각 호출자는 자기 query의 벡터만 돌려받는다.
+    - embed_documents는 이미 배치이므로 그대로 base에 위임.
+    """
+    def __init__(
+            self,
+            base: Embeddings,
+            *,
+            max_batch_size: int = EMBED_BATCH_MAX_SIZE,
+            max_wait_ms: float = EMBED_BATCH_MAX_WAIT_MS,
+    ):
+        self.base = base
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait_s = max(0.0, float(max_wait_ms)) / 1000.0
+
+        self._queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+        # 관측용 카운터
+        self.batches = 0
+        self.items = 0
+
+    # ---------------------------------
+    # Embeddings interface
+    # ---------------------------------
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.base.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        self._ensure_worker()
+        fut: Future = Future()
+        self._queue.put((text, fut))
+        return fut.result()
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        # 한 요청의 여러 query를 한꺼번에 넣어 같은 배치로 encode (다른 요청 query와도 합쳐짐)
+        if not texts:
+            return []
+        self._ensure_worker()
+        futs: List[Future] = []
+        for text in texts:
+            fut: Future = Future()
+            self._queue.put((text, fut))
+            futs.append(fut)
+        return [f.result() for f in futs]
+
+    def stats(self) -> Dict[str, float]:
+        avg = (self.items / self.batches) if self.batches else 0.0
+        return {"batches": self.batches, "items": self.items, "avg_batch_size": round(avg, 2)}
+
+    # ---------------------------------
+    # worker
+    # ---------------------------------
+    def _ensure_worker(self):
+        # fork된 자식 프로세스에는 스레드가 없으므로 pid가 바뀌면 새로 띄운다.
+        pid = os.getpid()
+        if self._worker is not None and self._pid == pid:
+            return
+        with self._lock:
+            if self._worker is not None and self._pid == pid:
+                return
+            if self._pid != pid:
+                self._queue = queue.Queue()
+            self._pid = pid
+            self._worker = threading.Thread(
+                target=self._run, name="embed-batcher", daemon=True
+            )
+            self._worker.start()
+
+    def _collect(self) -> List[Tuple[str, Future]]:
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait_s
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining <= 0:
+                    # 대기 시간이 끝나도 이미 쌓인 건 같이 처리
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+
+            # 같은 문자열은 한 번만 인코딩
+            uniq: Dict[str, int] = {}
+            for text, _ in batch:
+                uniq.setdefault(text, len(uniq))
+
+            try:
+                vecs = self.base.embed_documents(list(uniq))
+            except Exception as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.items += len(batch)
+            for text, fut in batch:
+                fut.set_result(vecs[uniq[text]])
@@ -0,0 +1,137 @@
+from __future__ import annotations
+import json
+import os
+import time
+from itertools import permutations
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple
+
+from app.models.schemas import Evidence
+from app.rag.config import EMBEDDING_MODEL_NAME, EVIDENCE_TABLE_FILE
+from app.rag.fusion import RRF_C
+from app.rag.queries import SIGNAL_TO_QUERY, queries_for_keys
+
+if TYPE_CHECKING:
+    from app.rag.retriever import PolicyRetriever
+
+# signal 조합별 최종 evidence를 build_index 시점에 미리 계산한 표
+# - query는 SIGNAL_TO_QUERY(고정 문자열) 조합에서만 나오므로 가능한 query 목록이 유한하다
+# - key: (mode, queries) / 값: retrieve()와 같은 dedupe/정렬이 끝난 Evidence 리스트
+# - 코퍼스 스냅샷 디렉토리에 index_version과 함께 저장 -> 인덱스나 검색 설정이 바뀌면 로딩하지 않음
+
+TABLE_MODES = ("vector", "hybrid")
+
+
+def query_sets() -> List[Tuple[str, ...]]:
+    """
+    build_retrieval_queries가 만들 수 있는 모든 query 목록.
+    signal 순서는 rule set마다 다를 수 있으므로 부분집합이 아니라 순열 단위로 만든다 (4개 -> 65가지)
+    """
+    keys = list(SIGNAL_TO_QUERY)
+    out: Dict[Tuple[str, ...], None] = {}
+    for n in range(len(keys) + 1):
+        for combo in permutations(keys, n):
+            out[tuple(queries_for_keys(list(combo)))] = None
+    return list(out)
+
+
+def table_config(retriever: "PolicyRetriever") -> Dict[str, Any]:
+    """결과에 영향을 주는 검색 설정 (저장된 값과 다르면 표를 쓰지 않음)"""
+    return {
+        "mode": retriever.mode,
+        "top_k": retriever.top_k,
+        "enable_threshold": retriever.enable_threshold,
+        "distance_threshold": retriever.distance_threshold,
+        "ensemble_weights": list(retriever.ensemble_weights),
+        "rrf_c": RRF_C,
+        "embedding_model": EMBEDDING_MODEL_NAME,
+        # 설정값(VECTOR_BACKEND)이 아니라 retriever가 실제로 쓰는 backend (벡터 없는 스냅샷이면 chroma로 fallback)
+        "vector_backend": retriever.vector_backend,
+    }
+
+
+class EvidenceTable:
+    """
+    mode별 (검색 설정, {queries: (evidence, dedupe 전 evidence 수)})
+    retriever는 matches()가 True일 때만 표를 사용 (설정이 다르면 live 검색)
+    """
+    def __init__(
+            self,
+            index_version: str,
+            modes: Dict[str, Tuple[Dict[str, Any], Dict[Tuple[str, ...], Tuple[List[Evidence], int]]]],
+    ):
+        self.index_version = index_version
+        self.modes = modes
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return sum(len(rows) for _, rows in self.modes.values())
+
+    def matches(self, retriever: "PolicyRetriever") -> bool:
+        m = self.modes.get(retriever.mode)
+        return (
+            m is not None
+            and m[0] == table_config(retriever)
+            and self.index_version == retriever.index_version
+        )
+
+    def get(self, mode: str, queries: List[str]) -> Optional[Tuple[List[Evidence], int]]:
+        hit = self.modes[mode][1].get(tuple(queries)) if mode in self.modes else None
+        if hit is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return hit
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self), "hits": self.hits, "misses": self.misses}
+
+
+def iter_table_rows(retriever: "PolicyRetriever") -> Iterator[Dict[str, Any]]:
+    for queries in query_sets():
+        evidence, debug = retriever.retrieve_live(list(queries))
+        yield {
+            "queries": list(queries),
+            "evidence": [e.model_dump(exclude_none=True) for e in evidence],
+            "evidence_count": debug.get("evidence_count", len(evidence)),
+        }
+
+
+def write_evidence_table(snapshot_dir: Path, index_version: str, retrievers: List["PolicyRetriever"]) -> Dict[str, Any]:
+    """mode별 retriever로 모든 query 조합을 검색해서 snapshot_dir/EVIDENCE_TABLE_FILE에 저장"""
+    t0 = time.perf_counter()
+    data = {
+        "index_version": index_version,
+        "modes": {r.mode: {"config": table_config(r), "rows": list(iter_table_rows(r))} for r in retrievers},
+    }
+    path = Path(snapshot_dir) / EVIDENCE_TABLE_FILE
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, path)
+    return {
+        "path": str(path),
+        "rows": sum(len(m["rows"]) for m in data["modes"].values()),
+        "seconds": round(time.perf_counter() - t0, 2),
+    }
+
+
+def load_evidence_table(snapshot_dir: Path, index_version: str) -> Optional[EvidenceTable]:
+    """표가 없거나 다른 index_version으로 만든 표면 None"""
+    try:
+        data = json.loads((Path(snapshot_dir) / EVIDENCE_TABLE_FILE).read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return None
+    if data.get("index_version") != index_version:
+        return None
+    modes = {
+        mode: (
+            m["config"],
+            {
+                tuple(row["queries"]): ([Evidence(**e) for e in row["evidence"]], row["evidence_count"])
+                for row in m["rows"]
+            },
+        )
+        for mode, m in data.get("modes", {}).items()
+    }
+    return EvidenceTable(index_version, modes)
@@ -0,0 +1,58 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import Dict, List, Sequence, Tuple
+from langchain_core.documents import Document
+
+# RRF 상수 (EnsembleRetriever 기본값과 동일)
+RRF_C = 60
+
+# 소스별 (doc, score) 랭킹 리스트
+RankedList = Sequence[Tuple[Document, float]]
+
+
+@dataclass
+class FusedHit:
+    """
+    RRF 결과 한 건.
+    - ranks/scores: 소스 이름(bm25, vector) -> 해당 소스에서의 1-based 순위 / 원점수
+    """
+    doc: Document
+    fused_score: float
+    ranks: Dict[str, int] = field(default_factory=dict)
+    scores: Dict[str, float] = field(default_factory=dict)
+
+
+def _doc_key(doc: Document) -> str:
+    cid = (doc.metadata or {}).get("chunk_id")
+    return cid or doc.page_content
+
+
+def reciprocal_rank_fusion(
+        ranked: Dict[str, RankedList],
+        weights: Dict[str, float],
+        *,
+        c: int = RRF_C,
+) -> List[FusedHit]:
+    """
+    Weighted Reciprocal Rank Fusion.
+    score(d) = sum_s weight_s / (rank_s(d) + c)
+
+    - chunk_id 기준으로 소스 간 중복을 합치고, 소스별 순위/점수를 그대로 남긴다.
+    - 동점이면 먼저 등장한 순서(소스 순서 -> 소스 내 순위)를 유지한다.
+    """
+    hits: Dict[str, FusedHit] = {}
+    for source, pairs in ranked.items():
+        w = weights.get(source, 0.0)
+        for rank, (doc, score) in enumerate(pairs, start=1):
+            key = _doc_key(doc)
+            hit = hits.get(key)
+            if hit is None:
+                hit = FusedHit(doc=doc, fused_score=0.0)
+                hits[key] = hit
+            if source in hit.ranks:
+                continue
+            hit.ranks[source] = rank
+            hit.scores[source] = float(score)
+            hit.fused_score += w / (rank + c)
+
+    return sorted(hits.values(), key=lambda h: h.fused_score, reverse=True)
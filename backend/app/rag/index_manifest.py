@@ -0,0 +1,53 @@
+from __future__ import annotations
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app.rag.config import INDEX_MANIFEST_PATH
+
+# 증분 인덱싱용 manifest
+# {
+#   "collection": ..., "embedding_model": ...,
+#   "files":  {filename: {"sha256": 파일 해시, "chunk_ids": [...]}},
+#   "chunks": {chunk_id: 청크 내용(텍스트+메타데이터) 해시}
+# }
+
+# 파일 내용 해시 (변경 안 된 파일은 파싱 자체를 건너뜀)
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+# 청크 내용 해시 (변경 안 된 청크는 재임베딩 생략)
+def chunk_hash(text: str, metadata: Dict[str, Any]) -> str:
+    h = hashlib.sha256()
+    h.update(text.encode("utf-8"))
+    h.update(b"\0")
+    h.update(json.dumps(metadata or {}, ensure_ascii=False, sort_keys=True).encode("utf-8"))
+    return h.hexdigest()
+
+
+def new_manifest(collection: str, embedding_model: str) -> Dict[str, Any]:
+    return {"collection": collection, "embedding_model": embedding_model, "files": {}, "chunks": {}}
+
+
+def load_manifest(path: Path = INDEX_MANIFEST_PATH) -> Optional[Dict[str, Any]]:
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def save_manifest(manifest: Dict[str, Any], path: Path = INDEX_MANIFEST_PATH):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=1), encoding="utf-8")
+    tmp.replace(path)
+
+
+def record_file(manifest: Dict[str, Any], filename: str, sha256: str, chunks: List) -> None:
+    manifest["files"][filename] = {"sha256": sha256, "chunk_ids": [c.chunk_id for c in chunks]}
+    for c in chunks:
+        manifest["chunks"][c.chunk_id] = chunk_hash(c.text, c.metadata)
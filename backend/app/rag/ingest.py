@@ -0,0 +1,144 @@
+from __future__ import annotations
+import os
+import time
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Deque, Iterable, Iterator, List, Optional, Tuple
+
+from .config import INGEST_WORKERS, INGEST_PDF_PAGES_PER_TASK
+from .loaders import RawSection, PDF_EXTS, load_text_file, load_pdf_pages, pdf_page_count
+from .chunking import Chunk, make_chunks
+from .index_manifest import file_sha256
+
+# (path, page_start, page_end) : 텍스트 파일은 페이지 구간 무시
+LoadTask = Tuple[str, int, int]
+
+# 재사용 가능한 파일이면 청크를 돌려주는 함수, 아니면 None
+ReuseFn = Callable[[Path, str], Optional[Callable[[], List[Chunk]]]]
+
+
+# 워커 프로세스에서 실행 (pickle 가능해야 하므로 모듈 최상위 함수)
+def _load_task(path: str, page_start: int, page_end: int) -> List[RawSection]:
+    p = Path(path)
+    if p.suffix.lower() in PDF_EXTS:
+        return load_pdf_pages(p, page_start, page_end)
+    return load_text_file(p)
+
+
+# 파일 하나를 로딩 task들로 분할 (PDF는 페이지 구간 단위)
+def _plan(path: Path, pages_per_task: int) -> Tuple[List[LoadTask], int]:
+    if path.suffix.lower() not in PDF_EXTS:
+        return [(str(path), 0, 0)], 1
+    n = pdf_page_count(path)
+    tasks = [(str(path), s, min(s + pages_per_task, n)) for s in range(0, n, pages_per_task)]
+    return tasks, n
+
+
+@dataclass
+class FileChunks:
+    path: Path
+    sha256: str
+    chunks: List[Chunk]
+    pages: int       # 이번에 파싱한 페이지 수 (재사용한 파일은 0)
+    parsed: bool
+
+
+class _InlineExecutor(Executor):
+    # workers <= 1 이면 프로세스 풀 없이 현재 프로세스에서 바로 실행
+    def submit(self, fn, *args, **kwargs) -> Future:
+        fut: Future = Future()
+        try:
+            fut.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            fut.set_exception(e)
+        return fut
+
+
+def iter_file_chunks(
+        files: Iterable[Path],
+        *,
+        reuse: Optional[ReuseFn] = None,
+        workers: Optional[int] = INGEST_WORKERS,
+        pages_per_task: int = INGEST_PDF_PAGES_PER_TASK,
+        max_in_flight: Optional[int] = None,
+) -> Iterator[FileChunks]:
+    """
+    정책 파일들을 프로세스 풀에서 병렬로 로딩(pypdf는 CPU-bound)하고
+    파일 순서대로 청크를 generator로 내보낸다.
+    - 동시에 제출된 로딩 task 수를 max_in_flight로 제한 -> 코퍼스 크기와 무관하게 메모리 일정
+    - reuse(path, sha)가 청크 로더를 돌려주면 파싱 없이 그 결과를 사용 (증분 빌드)
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or workers * 2
+    executor: Executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else _InlineExecutor()
+
+    # (path, sha, reuse_loader, futures, pages)
+    pending: Deque[Tuple[Path, str, Optional[Callable[[], List[Chunk]]], List[Future], int]] = deque()
+    in_flight = 0
+
+    def drain() -> FileChunks:
+        nonlocal in_flight
+        path, sha, loader, futs, pages = pending.popleft()
+        if loader is not None:
+            return FileChunks(path, sha, loader(), 0, False)
+        sections: List[RawSection] = []
+        for f in futs:
+            sections.extend(f.result())
+        in_flight -= len(futs)
+        return FileChunks(path, sha, make_chunks(sections), pages, True)
+
+    try:
+        for path in files:
+            sha = file_sha256(path)
+            loader = reuse(path, sha) if reuse else None
+            if loader is not None:
+                pending.append((path, sha, loader, [], 0))
+            else:
+                tasks, pages = _plan(path, pages_per_task)
+                while pending and in_flight + len(tasks) > max_in_flight:
+                    yield drain()
+                futs = [executor.submit(_load_task, *t) for t in tasks]
+                in_flight += len(tasks)
+                pending.append((path, sha, None, futs, pages))
+
+            # 앞쪽이 재사용 파일이면 바로 내보낸다
+            while pending and pending[0][2] is not None:
+                yield drain()
+
+        while pending:
+            yield drain()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+class IngestProgress:
+    """pages/s, chunks/s 진행 상황 출력"""
+    def __init__(self, label: str = "build_index", every_s: float = 2.0):
+        self.label = label
+        self.every_s = every_s
+        self.t0 = time.perf_counter()
+        self._last = self.t0
+        self.files = 0
+        self.pages = 0
+        self.chunks = 0
+        self.embedded = 0
+
+    def add_file(self, fc: FileChunks):
+        self.files += 1
+        self.pages += fc.pages
+        self.chunks += len(fc.chunks)
+
+    def report(self, force: bool = False):
+        now = time.perf_counter()
+        if not force and now - self._last < self.every_s:
+            return
+        self._last = now
+        elapsed = max(now - self.t0, 1e-9)
+        print(
+            f"[{self.label}] files={self.files} pages={self.pages} ({self.pages / elapsed:.1f} pages/s) "
+            f"chunks={self.chunks} ({self.chunks / elapsed:.1f} chunks/s) "
+            f"embedded={self.embedded} ({self.embedded / elapsed:.1f} chunks/s) "
+            f"elapsed={elapsed:.1f}s"
+        )
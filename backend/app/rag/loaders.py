@@ -54,16 +54,26 @@ def load_text_file(path: Path) -> List[RawSection]:
 
     return sections
 
+# pdf 페이지 수 (텍스트 추출 없이)
+def pdf_page_count(path: Path) -> int:
+    return len(PdfReader(str(path)).pages)
+
 # pdf 파일 읽고 섹션 리스트 생성
 ## 각 페이지의 extract_text 결과를 묶어 저장
 def load_pdf_file(path: Path) -> List[RawSection]:
+    return load_pdf_pages(path)
+
+# pdf의 [start, end) 페이지만 섹션으로 변환 (병렬 ingestion에서 페이지 구간 단위로 호출)
+def load_pdf_pages(path: Path, start: int = 0, end: Optional[int] = None) -> List[RawSection]:
     reader = PdfReader(str(path))
     title = path.name
     doc_id = _doc_id_from_path(path)
 
+    n = len(reader.pages)
+    end = n if end is None else min(end, n)
     sections: List[RawSection] = []
-    for i, page in enumerate(reader.pages):
-        page_text = (page.extract_text() or "").strip()
+    for i in range(start, end):
+        page_text = (reader.pages[i].extract_text() or "").strip()
         sections.append(
             RawSection(
                 doc_id=doc_id,
@@ -76,20 +86,30 @@ def load_pdf_file(path: Path) -> List[RawSection]:
 
     return sections
 
-# policies 폴더 전체를 스캔하여 확장자별로 관련 정보 가져오기
-def load_policies(policy_dir: Path) -> List[RawSection]:
+TEXT_EXTS = [".txt", ".md"]
+PDF_EXTS = [".pdf"]
+
+# policies 폴더에서 인덱싱 대상 파일 목록 (정렬)
+def iter_policy_files(policy_dir: Path) -> List[Path]:
     if not policy_dir.exists():
         raise FileNotFoundError(f"Policy dir not found: {policy_dir}")
-    
-    out: List[RawSection] = []
+    out: List[Path] = []
     for p in sorted(policy_dir.glob("*")):
         if p.is_dir():
             continue
-        ext = p.suffix.lower()
-        if ext in [".txt", ".md"]:
-            out.extend(load_text_file(p))
-        elif ext == ".pdf":
-            out.extend(load_pdf_file(p))
-        else:
-            continue
+        if p.suffix.lower() in TEXT_EXTS + PDF_EXTS:
+            out.append(p)
+    return out
+
+# 파일 하나를 확장자에 맞게 로딩
+def load_policy_file(path: Path) -> List[RawSection]:
+    if path.suffix.lower() == ".pdf":
+        return load_pdf_file(path)
+    return load_text_file(path)
+
+# policies 폴더 전체를 스캔하여 확장자별로 관련 정보 가져오기
+def load_policies(policy_dir: Path) -> List[RawSection]:
+    out: List[RawSection] = []
+    for p in iter_policy_files(policy_dir):
+        out.extend(load_policy_file(p))
     return out
\ No newline at end of file
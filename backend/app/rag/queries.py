@@ -8,19 +8,26 @@ SIGNAL_TO_QUERY = {
   "new_device": "new device login, device mismatch, step-up authentication, escalate conditions, security incident playbook triage",
 }
 
+# signal이 없거나 매핑된 query가 없을 때
+FALLBACK_QUERY = "access log risk assessment criteria and operator response guidance (REVIEW/ESCALATE) policy evidence"
+
 def build_retrieval_queries(signals: List[Signal]) -> List[str]:
+    return queries_for_keys([s.key for s in signals])
+
+# signal key 순서대로 query 생성 (중복 제거). evidence table도 같은 함수로 key를 만든다
+def queries_for_keys(keys: List[str]) -> List[str]:
     qs = []
-    for s in signals:
-        q = SIGNAL_TO_QUERY.get(s.key)
+    for k in keys:
+        q = SIGNAL_TO_QUERY.get(k)
         if q:
             qs.append(q)
     
     if not qs:
-        qs = ["access log risk assessment criteria and operator response guidance (REVIEW/ESCALATE) policy evidence"]
+        qs = [FALLBACK_QUERY]
     seen = set()
     out = []
     for q in qs:
         if q not in seen:
             out.append(q)
             seen.add(q)
-    return out
\ No newline at end of file
+    return out
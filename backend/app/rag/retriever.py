@@ -1,20 +1,35 @@
 from __future__ import annotations
-from typing import List, Optional, Dict, Any, Tuple
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import List, Optional, Dict, Any, Tuple, Union
 from langchain_chroma import Chroma
 from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_classic.retrievers import BM25Retriever
-from langchain_classic.retrievers import EnsembleRetriever
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 from app.models.schemas import Evidence
 from app.rag.config import (
     VECTORSTORE_DIR,
-    CHROMA_COLLECTION,
     RETRIEVAL_TOP_K,
     RETRIEVAL_DISTANCE_THRESHOLD,
     EVIDENCE_SNIPPET_MAX_CHARS,
-    EMBEDDING_MODEL_NAME
+    EMBEDDING_MODEL_NAME,
+    EMBED_BATCH_ENABLED,
+    RETRIEVAL_VECTOR_BUDGET_SHARE,
+    RETRIEVAL_FALLBACK_CACHE_SIZE,
+    RETRIEVAL_DEADLINE_WORKERS,
+    RETRIEVAL_DEADLINE_MAX_INFLIGHT,
 )
-from app.rag.lc_docs import build_policy_documents
+from app.rag.fusion import reciprocal_rank_fusion, RRF_C
+from app.rag.embed_batcher import MicroBatchEmbeddings
+from app.rag.chroma_store import chroma_search_by_vectors
+from app.rag.vector_index import NumpyVectorStore
+from app.rag.corpus_snapshot import CorpusSnapshot, InMemoryCorpus, load_snapshot
+from app.rag.evidence_table import EvidenceTable
+from app.rag.tenants import tenant_paths
+from app.services.metrics import StageTimings, current_timings, stage, use_timings
 # from app.rag.embedder import Embedder
 # from app.rag.chroma_store import ChromaStore
 
@@ -48,7 +63,55 @@ def _dedupe_by_section(items: List[Evidence]) -> List[Evidence]:
     return out
 
 
-def _doc_to_evidence(doc: Document, *, distance: Optional[float] = None) -> Evidence:
+# deadline이 있는 검색을 실행하는 스레드 풀 (fork한 워커에서는 새로 생성)
+_deadline_pool: Optional[ThreadPoolExecutor] = None
+_deadline_pool_pid: Optional[int] = None
+_deadline_pool_lock = threading.Lock()
+
+def _get_deadline_pool() -> ThreadPoolExecutor:
+    global _deadline_pool, _deadline_pool_pid
+    with _deadline_pool_lock:
+        if _deadline_pool is None or _deadline_pool_pid != os.getpid():
+            _deadline_pool = ThreadPoolExecutor(
+                max_workers=RETRIEVAL_DEADLINE_WORKERS, thread_name_prefix="retrieval"
+            )
+            _deadline_pool_pid = os.getpid()
+        return _deadline_pool
+
+
+class _PendingRetrieval:
+    """_start_retrieve ~ _finish_retrieve 사이의 검색 하나 (evidence table 결과 또는 deadline 풀에 올린 live 검색)"""
+    __slots__ = ("table_hit", "future", "timings", "parent_timings", "saturated", "submit_failed")
+
+    def __init__(self):
+        self.table_hit: Optional[Tuple[List[Evidence], Dict[str, Any]]] = None
+        self.future = None
+        self.timings: Optional[StageTimings] = None
+        self.parent_timings: Optional[StageTimings] = None
+        self.saturated = False
+        self.submit_failed = False
+
+
+def retrieve_concurrently(
+        jobs: List[Tuple["PolicyRetriever", List[str], Optional[float]]]
+) -> List[Tuple[List[Evidence], Dict[str, Any]]]:
+    """
+    여러 (retriever, queries, deadline_ms) 검색을 같은 시작 시각 기준으로 동시에 실행 (batch/actors의 검색 그룹).
+    - deadline이 있는 live 검색을 먼저 모두 deadline 풀에 올리고, 각자 시작 시각 + deadline_ms까지만 기다린 뒤
+      시간을 넘긴 검색만 각자 대체 경로(cached/bm25_only/empty)로 간다
+      (그룹 수와 상관없이 전체 검색 시간은 가장 긴 deadline_ms 안)
+    - deadline_ms가 None인 검색은 deadline 검색을 다 모은 뒤 순서대로 제한 없이 live 검색
+    """
+    t0 = time.perf_counter()
+    pendings = [r._start_retrieve(queries, deadline_ms, t0) for r, queries, deadline_ms in jobs]
+    out: List[Optional[Tuple[List[Evidence], Dict[str, Any]]]] = [None] * len(jobs)
+    for i in sorted(range(len(jobs)), key=lambda i: jobs[i][2] is None):
+        r, queries, deadline_ms = jobs[i]
+        out[i] = r._finish_retrieve(queries, deadline_ms, t0, pendings[i])
+    return out
+
+
+def _doc_to_evidence(doc: Document, *, distance: Optional[float] = None, **extra: Any) -> Evidence:
     meta = doc.metadata or {}
     return Evidence(
         title=meta.get("title") or meta.get("doc_id") or "unknown",
@@ -58,6 +121,7 @@ def _doc_to_evidence(doc: Document, *, distance: Optional[float] = None) -> Evid
         chunk_id=meta.get("chunk_id") or "unknown",
         quote=_snip(doc.page_content, EVIDENCE_SNIPPET_MAX_CHARS),
         distance=distance,
+        **extra,
     )
 
 
@@ -65,7 +129,7 @@ class PolicyRetriever:
     """
     LangChain 기반 Retriever 레이어.
     - mode="vector": Chroma(Vector)만 사용
-    - mode="hybrid": BM25 + Vector Ensemble 사용 (classic EnsembleRetriever)
+    - mode="hybrid": BM25 + Vector를 query당 한 번씩만 검색하고 RRF로 직접 융합
     """
     def __init__(self, 
                 *, mode: str = "vector",
@@ -74,107 +138,332 @@ class PolicyRetriever:
                 embed_model_name: Optional[str] = None,
                 ensemble_weights: Tuple[float, float] = (0.4, 0.6),
                 enable_threshold: bool = False,
+                embeddings: Optional[Embeddings] = None,
+                vectorstore: Optional[Chroma] = None,
+                corpus: Optional[Union[CorpusSnapshot, InMemoryCorpus]] = None,
+                tenant: Optional[str] = None,
+                evidence_table: Optional[EvidenceTable] = None,
+                vector_backend: Optional[str] = None,
                 ):
+        """
+        embeddings/vectorstore/corpus를 넘기면 그대로 공유해서 사용
+        (app.rag.runtime에서 모든 mode가 모델/스토어 1개를 공유할 때).
+        없으면 기존처럼 직접 생성.
+        hybrid의 BM25는 build_index 스냅샷(corpus)이 있으면 그것을 쓰고,
+        없을 때만 정책 문서를 다시 파싱해서 메모리 코퍼스(InMemoryCorpus)를 만든다.
+        tenant: 직접 생성할 때 쓸 tenant 컬렉션/스냅샷/정책 디렉토리 (None이면 default)
+        evidence_table: build_index가 만든 signal 조합별 evidence 표 (인덱스 버전/검색 설정이 같을 때만 사용)
+        vector_backend: 실제 vectorstore backend ("numpy"/"chroma", runtime의 tenant별 값). 없으면 vectorstore 타입으로 판단
+        """
+        paths = tenant_paths(tenant)
+        self.tenant = paths.tenant
         self.mode = mode
         self.top_k = top_k
         self.distance_threshold = distance_threshold
         self.enable_threshold = enable_threshold
         self.ensemble_weights = ensemble_weights
 
-        model_name = embed_model_name or EMBEDDING_MODEL_NAME
-        self.embeddings = HuggingFaceEmbeddings(model_name=model_name)
-        
+        if embeddings is None:
+            model_name = embed_model_name or EMBEDDING_MODEL_NAME
+            base_embeddings = HuggingFaceEmbeddings(model_name=model_name)
+            # 동시 요청의 query 임베딩을 모아서 한 번에 encode
+            embeddings = (
+                MicroBatchEmbeddings(base_embeddings) if EMBED_BATCH_ENABLED else base_embeddings
+            )
+        self.embeddings = embeddings
+
         # Vectorstore
-        self.vs = Chroma(
-            collection_name=CHROMA_COLLECTION,
-            persist_directory=str(VECTORSTORE_DIR),
-            embedding_function=self.embeddings,
-        )
+        if vectorstore is None:
+            vectorstore = Chroma(
+                collection_name=paths.collection,
+                persist_directory=str(VECTORSTORE_DIR),
+                embedding_function=self.embeddings,
+            )
+        self.vs = vectorstore
+        self.vector_backend = vector_backend or ("numpy" if isinstance(vectorstore, NumpyVectorStore) else "chroma")
 
         # Vector retriever
         self.vector_retriever = self.vs.as_retriever(search_kwargs={"k":self.top_k})
 
-        # Hybrid : BM25 + Ensemble
-        self.bm25_retriever: Optional[BM25Retriever] = None
-        self.ensemble: Optional[EnsembleRetriever] = None
+        # Hybrid : BM25 (융합은 retrieve에서 직접 RRF)
+        self.corpus: Optional[Union[CorpusSnapshot, InMemoryCorpus]] = None
 
         if self.mode == "hybrid":
-            policy_docs = build_policy_documents()
-
-            bm25 = BM25Retriever.from_documents(policy_docs)
-            bm25.k = self.top_k
-            self.bm25_retriever = bm25
-
-            w_bm25, w_vec = self.ensemble_weights
-            self.ensemble = EnsembleRetriever(
-                retrievers=[bm25, self.vector_retriever],
-                weights=[w_bm25, w_vec]
-            )
+            if corpus is None:
+                corpus = load_snapshot(paths.snapshot_dir)
+            if corpus is None:
+                # 스냅샷이 없을 때만 정책 문서(PDF 포함)를 다시 파싱
+                corpus = InMemoryCorpus.from_policies(paths.policy_dir)
+            self.corpus = corpus
+
+        # 응답 캐시 key용 인덱스 버전 (코퍼스 내용 해시, vector mode는 전달받은 스냅샷 기준)
+        self.index_version: Optional[str] = corpus.index_version if corpus is not None else None
+
+        self.evidence_table: Optional[EvidenceTable] = (
+            evidence_table if evidence_table is not None and evidence_table.matches(self) else None
+        )
 
-    def _vector_score_map(self, query: str, k: int) -> Dict[str, float]:
+        # deadline 초과 시 BM25-only fallback용 코퍼스 (vector mode도 스냅샷을 받았으면 사용)
+        self.fallback_corpus = self.corpus if self.corpus is not None else corpus
+        # query 조합별 최근 live 검색 결과 (deadline 초과 시 cached fallback)
+        self._recent: "OrderedDict[Tuple[str, ...], Tuple[List[Evidence], Dict[str, Any]]]" = OrderedDict()
+        self._recent_lock = threading.Lock()
+        # deadline 검색 스레드 풀에 올라가 있는(대기 + 실행 중) live 검색 수
+        self._inflight = 0
+
+    def _bm25_hits_with_score(
+            self, query: str, corpus: Optional[Union[CorpusSnapshot, InMemoryCorpus]] = None
+    ) -> List[Tuple[Document, float]]:
         """
-        Chroma에서 query에 대한 결과를 score(distance) 포함으로 가져와
-        {chunk_id: distance} 맵으로 만든다.
-        - distance: 작을수록 유사
+        BM25 한 번 계산으로 top_k 문서와 점수를 함께 가져온다.
+        - query term이 있는 문서(posting)만 점수 계산, 점수 내림차순
+        - corpus: 없으면 self.corpus (fallback은 vector mode에서도 스냅샷 코퍼스를 넘김)
         """
-        pairs = self.vs.similarity_search_with_score(query, k=k)
-        out: Dict[str, float] = {}
-        for doc, dist in pairs:
-            cid = (doc.metadata or {}).get("chunk_id")
-            if cid:
-                # 더 작은 dist가 더 좋은 결과이므로, 최소값 유지
-                out[cid] = min(out.get(cid, float("inf")), float(dist))
-        return out
-
-
-    def _vector_hits_with_optional_score(
-            self, query: str
-    ) -> Tuple[List[Document], Optional[List[float]]]:
+        if corpus is None:
+            corpus = self.corpus
+        with stage("bm25"):
+            return corpus.bm25_search(query, self.top_k)
+
+    def _embed_queries(self, queries: List[str]) -> List[List[float]]:
         """
-        score(거리/유사도)를 함께 받는 기능.
-        enable_threshold=False면 안정적으로 docs만 가져온다.
+        vectorstore와 같은 임베딩 함수로 모든 query를 한 번에 임베딩 (encode 1회).
+        batcher면 동시 요청의 query와 같은 배치로 묶이도록 한꺼번에 넣는다.
         """
-        if not self.enable_threshold:
-            docs = self.vs.similarity_search(query, k=self.top_k)
-            return docs, None
-        
-        # score 포함 검색
-        pairs = self.vs.similarity_search_with_score(query, k=self.top_k)
-        docs = [d for d, _ in pairs]
-        scores = [float(s) for _, s in pairs]
-        return docs, scores
-
-
-    def retrieve(self, queries: List[str]) -> Tuple[List[Evidence], Dict[str, Any]]:
+        emb = self.vs.embeddings or self.embeddings
+        with stage("embedding"):
+            if isinstance(emb, MicroBatchEmbeddings):
+                return emb.embed_queries(queries)
+            return emb.embed_documents(queries)
+
+    def _vector_hits_many(self, queries: List[str]) -> List[List[Tuple[Document, float]]]:
         """
-        Returns:
-          - evidence list
-          - debug meta (for logging / future UI)
+        query 전체를 임베딩 1회 + 벡터 검색 1회로 처리 -> query별 [(Document, cosine distance)]
+        (NumpyVectorStore는 행렬곱 한 번, Chroma는 query_embeddings 여러 개로 collection.query 한 번)
         """
-        all_hits: List[Evidence] = []
-        debug: Dict[str, Any] = {
+        if not queries:
+            return []
+        vectors = self._embed_queries(queries)
+        with stage("vector_search"):
+            if isinstance(self.vs, NumpyVectorStore):
+                return self.vs.search_by_vectors(vectors, k=self.top_k)
+            if isinstance(self.vs, Chroma):
+                return chroma_search_by_vectors(self.vs, vectors, self.top_k)
+            return [
+                self.vs.similarity_search_by_vector_with_relevance_scores(v, k=self.top_k) for v in vectors
+            ]
+
+    def _base_debug(self, queries: List[str]) -> Dict[str, Any]:
+        return {
             "mode": self.mode,
+            "tenant": self.tenant,
             "queries": queries, 
             "top_k": self.top_k,
             "enable_threshold": self.enable_threshold,
             "threshold":self.distance_threshold,
             }
 
+    def retrieve(
+            self, queries: List[str], deadline_ms: Optional[float] = None
+    ) -> Tuple[List[Evidence], Dict[str, Any]]:
+        """
+        Returns:
+          - evidence list
+          - debug meta (for logging / future UI)
+        evidence table에 있는 query 조합이면 검색 없이 표의 결과를 반환 (debug.evidence_table: hit/miss)
+        deadline_ms: 검색 latency budget (None이면 제한 없이 live 검색)
+        debug.retrieval_path: evidence_table / live / cached / bm25_only / empty
+        """
+        t0 = time.perf_counter()
+        pending = self._start_retrieve(queries, deadline_ms, t0)
+        return self._finish_retrieve(queries, deadline_ms, t0, pending)
+
+    def _start_retrieve(self, queries: List[str], deadline_ms: Optional[float], t0: float) -> "_PendingRetrieval":
+        """evidence table 조회 + (deadline이 있으면) live 검색을 deadline 풀에 올리기만 하고 바로 반환"""
+        pending = _PendingRetrieval()
+        if self.evidence_table is not None:
+            with stage("evidence_table"):
+                hit = self.evidence_table.get(self.mode, queries)
+            if hit is not None:
+                evidence, count = hit
+                debug = self._base_debug(queries)
+                debug["evidence_table"] = "hit"
+                debug["evidence_count"] = count
+                debug["retrieval_path"] = "evidence_table"
+                # Evidence 객체는 표와 공유 (응답에서 수정하지 않음)
+                pending.table_hit = (list(evidence), debug)
+                return pending
+        if deadline_ms is not None:
+            self._submit_live(queries, deadline_ms, t0, pending)
+        return pending
+
+    def _finish_retrieve(
+            self, queries: List[str], deadline_ms: Optional[float], t0: float, pending: "_PendingRetrieval"
+    ) -> Tuple[List[Evidence], Dict[str, Any]]:
+        if pending.table_hit is not None:
+            return pending.table_hit
+        if deadline_ms is None:
+            evidence, debug = self._retrieve_live_recent(queries)
+            debug["retrieval_path"] = "live"
+        else:
+            evidence, debug = self._collect_within(queries, deadline_ms, t0, pending)
+        if self.evidence_table is not None:
+            debug["evidence_table"] = "miss"
+        return evidence, debug
+
+    def _retrieve_live_recent(self, queries: List[str]) -> Tuple[List[Evidence], Dict[str, Any]]:
+        # live 검색 후 결과를 최근 결과 LRU에 저장 (deadline을 넘긴 뒤 끝난 검색도 다음 요청의 fallback이 됨)
+        evidence, debug = self.retrieve_live(queries)
+        key = tuple(queries)
+        with self._recent_lock:
+            self._recent[key] = (list(evidence), dict(debug))
+            self._recent.move_to_end(key)
+            while len(self._recent) > RETRIEVAL_FALLBACK_CACHE_SIZE:
+                self._recent.popitem(last=False)
+        return evidence, debug
+
+    def _submit_live(self, queries: List[str], deadline_ms: float, t0: float, pending: "_PendingRetrieval"):
+        """
+        live 검색을 deadline 풀에 올린다 (pending.future). 이미 live 대기 시간이 지났으면 올리지 않음.
+        이 retriever의 live 검색이 이미 RETRIEVAL_DEADLINE_MAX_INFLIGHT개 떠 있으면 (검색이 밀리는 중)
+        풀에 더 쌓지 않고 pending.saturated만 표시한다.
+        """
+        live_deadline = t0 + deadline_ms * RETRIEVAL_VECTOR_BUDGET_SHARE / 1e3
+        if live_deadline - time.perf_counter() <= 0:
+            return
+        with self._recent_lock:
+            pending.saturated = self._inflight >= RETRIEVAL_DEADLINE_MAX_INFLIGHT
+            if pending.saturated:
+                return
+            self._inflight += 1
+
+        # 다른 스레드에서 검색하므로 stage 시간은 따로 재서 합산 (기다린 만큼만)
+        pending.parent_timings = current_timings()
+        bg = StageTimings(pending.parent_timings.endpoint) if pending.parent_timings is not None else None
+
+        def _run():
+            with use_timings(bg):
+                return self._retrieve_live_recent(queries)
+
+        try:
+            future = _get_deadline_pool().submit(_run)
+        except Exception:
+            # 제출 실패(종료된 풀 등)면 자리를 돌려주고 live 없이 대체 경로로
+            self._release_inflight(None)
+            pending.submit_failed = True
+            return
+        # 완료/취소 모두에서 호출됨
+        future.add_done_callback(self._release_inflight)
+        pending.future = future
+        pending.timings = bg
+
+    def _collect_within(
+            self, queries: List[str], deadline_ms: float, t0: float, pending: "_PendingRetrieval"
+    ) -> Tuple[List[Evidence], Dict[str, Any]]:
+        """
+        live 검색은 t0부터 budget의 RETRIEVAL_VECTOR_BUDGET_SHARE까지만 기다리고,
+        넘으면 최근 결과(cached) -> BM25-only(남은 budget 안에서) -> empty 순으로 대체.
+        기다리지 않은 live 검색은 아직 시작 전이면 취소하고, 실행 중이면 끝까지 실행되어 최근 결과에 저장된다.
+        """
+        deadline = t0 + deadline_ms / 1e3
+        live_deadline = t0 + deadline_ms * RETRIEVAL_VECTOR_BUDGET_SHARE / 1e3
+        timed_out = not pending.submit_failed
+        result: Optional[Tuple[List[Evidence], Dict[str, Any]]] = None
+
+        future = pending.future
+        if future is not None:
+            try:
+                # 이미 끝났으면 대기 시간이 지났어도 결과를 사용
+                result = future.result(timeout=max(0.0, live_deadline - time.perf_counter()))
+                timed_out = False
+            except FutureTimeout:
+                # 아직 풀 대기열에 있으면 버림 (과부하 때 시간 지난 검색이 쌓이지 않도록)
+                future.cancel()
+            finally:
+                # 시간 초과면 버려진 검색이 아직 bg에 기록 중이므로 지금까지의 snapshot만 합산
+                if pending.timings is not None:
+                    pending.parent_timings.merge(pending.timings)
+
+        if result is not None:
+            evidence, debug = result
+            path = "live"
+        else:
+            evidence, debug, path = self._fallback(queries, deadline)
+        debug["retrieval_path"] = path
+        debug["deadline"] = {
+            "budget_ms": deadline_ms,
+            "elapsed_ms": round((time.perf_counter() - t0) * 1e3, 3),
+            "timed_out": timed_out,
+            "saturated": pending.saturated,
+            "submit_failed": pending.submit_failed,
+        }
+        return evidence, debug
+
+    def _release_inflight(self, _future):
+        with self._recent_lock:
+            self._inflight -= 1
+
+    def _fallback(self, queries: List[str], deadline: float) -> Tuple[List[Evidence], Dict[str, Any], str]:
+        key = tuple(queries)
+        with self._recent_lock:
+            recent = self._recent.get(key)
+            if recent is not None:
+                self._recent.move_to_end(key)
+        if recent is not None:
+            evidence, debug = recent
+            return list(evidence), dict(debug), "cached"
+
+        if self.fallback_corpus is not None:
+            found = self._retrieve_bm25_only(queries, deadline)
+            if found is not None:
+                return found[0], found[1], "bm25_only"
+
+        debug = self._base_debug(queries)
+        debug["evidence_count"] = 0
+        return [], debug, "empty"
+
+    def _retrieve_bm25_only(
+            self, queries: List[str], deadline: float
+    ) -> Optional[Tuple[List[Evidence], Dict[str, Any]]]:
+        """임베딩/벡터 검색 없이 BM25만, deadline을 넘기면 None"""
+        all_hits: List[Evidence] = []
+        per_query = []
+        for q in queries:
+            if time.perf_counter() >= deadline:
+                return None
+            pairs = self._bm25_hits_with_score(q, self.fallback_corpus)
+            per_query.append({"q": q, "hits": len(pairs)})
+            for rank, (d, score) in enumerate(pairs, start=1):
+                all_hits.append(_doc_to_evidence(d, bm25_rank=rank, bm25_score=float(score)))
+
+        debug = self._base_debug(queries)
+        debug["bm25_only"] = {"bm25_source": self.fallback_corpus.source, "per_query": per_query}
+        with stage("dedupe"):
+            all_hits = _dedupe_evidence(all_hits)
+            all_hits.sort(key=lambda e: -(e.bm25_score or 0.0))
+
+            debug["evidence_count"] = len(all_hits)
+            all_hits = _dedupe_by_section(all_hits)
+        return all_hits, debug
+
+    def retrieve_live(self, queries: List[str]) -> Tuple[List[Evidence], Dict[str, Any]]:
+        """evidence table 없이 실제로 검색 (build_index가 표를 만들 때도 사용)"""
+        all_hits: List[Evidence] = []
+        debug = self._base_debug(queries)
+
 
         # --------------------------
         # VECTOR ONLY
         # --------------------------
         if self.mode == "vector":
             per_query = []
-            for q in queries:
-                docs, scores = self._vector_hits_with_optional_score(q)
-
+            for q, pairs in zip(queries, self._vector_hits_many(queries)):
                 evs: List[Evidence] = []
-                if scores is None:
-                    for d in docs:
+                if not self.enable_threshold:
+                    # threshold를 안 쓰면 기존처럼 distance 없이 docs만
+                    for d, _ in pairs:
                         evs.append(_doc_to_evidence(d, distance=None))
                 else:
-                    for d, s in zip(docs, scores):
+                    for d, s in pairs:
                         if s is None:
                             continue
                         if s > self.distance_threshold:
@@ -190,42 +479,46 @@ class PolicyRetriever:
         # HYBRID (BM25 + VECTOR)
         # -------------------------
         else:
-            if self.ensemble is None or self.bm25_retriever is None:
-                raise RuntimeError("Hybrid mode requires bm25_retriever and ensemble to be initialized.")
-            
+            if self.corpus is None:
+                raise RuntimeError("Hybrid mode requires a corpus snapshot.")
+
+            w_bm25, w_vec = self.ensemble_weights
             bm25_counts = []
             vec_counts = []
-
-            for q in queries:
-                # bm25_docs = self.bm25_retriever.invoke(q)
-                # bm25_counts.append({"q":q, "hits": len(bm25_docs)})
-
-                # vec_docs, _ = self._vector_hits_with_optional_score(q)
-                # vec_counts.append({"q":q, "hits":len(vec_docs)})
-
-                # ens_docs = self.ensemble.invoke(q)
-                # for d in ens_docs:
-                #     all_hits.append(_doc_to_evidence(d, distance=None))
-                bm25_docs = self.bm25_retriever.invoke(q)
-                bm25_counts.append({"q": q, "hits": len(bm25_docs)})
-
-                # 벡터 검색 결과/카운트(기존 유지)
-                vec_docs, _ = self._vector_hits_with_optional_score(q)
-                vec_counts.append({"q": q, "hits": len(vec_docs)})
-
-                score_map = self._vector_score_map(q, k=self.top_k)
-
-                ens_docs = self.ensemble.invoke(q)
-                for d in ens_docs:
-                    cid = (d.metadata or {}).get("chunk_id")
-                    dist = score_map.get(cid) if cid else None
-                    all_hits.append(_doc_to_evidence(d, distance=dist))
-
+            fused_counts = []
+
+            # vector는 모든 query를 임베딩 1회 + 검색 1회로, BM25는 query당 1회
+            for q, vec_pairs in zip(queries, self._vector_hits_many(queries)):
+                bm25_pairs = self._bm25_hits_with_score(q)
+                bm25_counts.append({"q": q, "hits": len(bm25_pairs)})
+                vec_counts.append({"q": q, "hits": len(vec_pairs)})
+
+                with stage("fusion"):
+                    fused = reciprocal_rank_fusion(
+                        {"bm25": bm25_pairs, "vector": vec_pairs},
+                        {"bm25": w_bm25, "vector": w_vec},
+                    )
+                    fused_counts.append({"q": q, "hits": len(fused)})
+
+                    for h in fused:
+                        all_hits.append(
+                            _doc_to_evidence(
+                                h.doc,
+                                distance=h.scores.get("vector"),
+                                vector_rank=h.ranks.get("vector"),
+                                bm25_rank=h.ranks.get("bm25"),
+                                bm25_score=h.scores.get("bm25"),
+                                fused_score=h.fused_score,
+                            )
+                        )
 
             debug["hybrid"] = {
                 "weights": list(self.ensemble_weights),
+                "fusion": {"method": "rrf", "c": RRF_C},
+                "bm25_source": self.corpus.source,
                 "bm25_per_query": bm25_counts,
                 "vector_per_query": vec_counts,
+                "fused_per_query": fused_counts,
             }
 
             with_dist = sum(1 for e in all_hits if e.distance is not None)
@@ -234,9 +527,10 @@ class PolicyRetriever:
 
 
         # 공통 후처리       
-        all_hits = _dedupe_evidence(all_hits)
-        all_hits.sort(key=lambda e: (e.distance if e.distance is not None else 9999.0))
+        with stage("dedupe"):
+            all_hits = _dedupe_evidence(all_hits)
+            all_hits.sort(key=lambda e: (e.distance if e.distance is not None else 9999.0))
 
-        debug["evidence_count"] = len(all_hits)
-        all_hits = _dedupe_by_section(all_hits)
+            debug["evidence_count"] = len(all_hits)
+            all_hits = _dedupe_by_section(all_hits)
         return all_hits, debug
@@ -0,0 +1,346 @@
+from __future__ import annotations
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+
+from app.rag.config import (
+    VECTORSTORE_DIR,
+    EMBEDDING_MODEL_NAME,
+    EMBED_BATCH_ENABLED,
+    EVIDENCE_TABLE_ENABLED,
+    RUNTIME_POOL_MEMORY_BYTES,
+    RUNTIME_WARMUP_MODES,
+    VECTOR_BACKEND,
+)
+from app.rag.tenants import DEFAULT_TENANT, TenantPaths, resolve_tenant, tenant_paths
+
+# langchain / chromadb / torch는 무겁기 때문에 실제로 필요할 때만 import
+if TYPE_CHECKING:
+    from app.rag.retriever import PolicyRetriever
+
+_WARMUP_QUERY = "access log risk assessment warmup"
+
+# 메모리 추정용 임베딩 차원 (스냅샷에 벡터가 없을 때, all-MiniLM-L6-v2 기준)
+_DEFAULT_EMBED_DIM = 384
+
+
+class _TenantIndex:
+    """tenant 하나의 코퍼스(BM25) + vectorstore. 같은 tenant의 mode별 retriever가 공유"""
+    def __init__(self, paths: TenantPaths):
+        self.paths = paths
+        self.corpus = None          # build_index 스냅샷 (없으면 None)
+        self.corpus_loaded = False
+        self.bm25 = None            # 스냅샷이 없을 때 hybrid용 메모리 코퍼스
+        self.evidence_table = None  # 스냅샷과 같이 저장된 signal 조합별 evidence 표 (없으면 None)
+        self.vectorstore = None
+        self.vector_backend: Optional[str] = None
+        self.est_bytes = 0
+        # 이 tenant의 로딩(스냅샷/evidence 표/vectorstore/BM25)만 직렬화 (다른 tenant 요청은 기다리지 않음)
+        self.lock = threading.RLock()
+
+    def estimate_bytes(self) -> int:
+        """
+        상주 메모리 추정치 (pool 예산 계산용, 정확한 값이 아님)
+        - 스냅샷: 파일 크기 합 (mmap이라 접근한 만큼 page cache에 올라옴)
+        - 메모리 코퍼스: 텍스트 + posting 배열
+        - chroma: 벡터 float32 x 2 (HNSW graph 포함 대략치)
+        """
+        total = 0
+        n_chunks = 0
+        dim = _DEFAULT_EMBED_DIM
+        if self.corpus is not None:
+            total += sum(p.stat().st_size for p in self.paths.snapshot_dir.iterdir() if p.is_file())
+            n_chunks = len(self.corpus)
+            if self.corpus.vectors is not None:
+                dim = self.corpus.vectors.dim
+        if self.bm25 is not None:
+            total += sum(len(self.bm25.text(i)) * 2 for i in range(len(self.bm25)))
+            total += sum(getattr(self.bm25.bm25, name).nbytes for name in self.bm25.bm25.FILES)
+            n_chunks = max(n_chunks, len(self.bm25))
+        if self.vector_backend == "chroma":
+            try:
+                n_chunks = self.vectorstore._collection.count()
+            except Exception:
+                pass
+            total += n_chunks * dim * 4 * 2
+        return total
+
+
+class RetrievalRuntime:
+    """
+    모든 tenant / retrieval mode가 공유하는 런타임.
+    - 임베딩 모델 1개, Chroma client 1개를 모든 tenant가 공유
+    - tenant별로 vectorstore 1개, BM25 코퍼스 1개를 만들어 재사용
+      (vectorstore는 VECTOR_BACKEND에 따라 Chroma 컬렉션 또는 스냅샷 임베딩 행렬 기반 NumpyVectorStore)
+      (BM25 코퍼스는 build_index 스냅샷을 mmap으로 로딩, 없으면 hybrid에서만 정책 문서 파싱)
+    - (tenant, mode)별 PolicyRetriever를 LRU pool로 캐시:
+      tenant 인덱스 추정 크기 합이 RUNTIME_POOL_MEMORY_BYTES를 넘으면 가장 오래 안 쓴 항목부터 해제
+      (tenant의 마지막 항목이 빠지면 그 tenant의 코퍼스/vectorstore도 해제)
+    - warmup(): 앱 시작 시 default tenant를 미리 로딩해서 첫 요청의 cold start 제거
+    - 전역 lock은 pool/tenant 목록 조회와 추가에만 사용. 처음 쓰는 tenant의 로딩은
+      (tenant, mode)별 lock + tenant별 lock 안에서 하므로 이미 로딩된 tenant의 요청을 막지 않음
+    """
+    def __init__(self, memory_budget: int = RUNTIME_POOL_MEMORY_BYTES):
+        self._lock = threading.RLock()
+        # 공유 임베딩 모델 / chroma client 로딩용
+        self._shared_lock = threading.Lock()
+        # (tenant, mode)별 retriever 로딩 lock (resolve된 tenant만 key가 되므로 인덱스가 있는 tenant 수로 제한)
+        self._loading: Dict[Tuple[str, str], threading.Lock] = {}
+        self._embeddings = None
+        self._chroma = None
+        self._tenants: Dict[str, _TenantIndex] = {}
+        self._pool: "OrderedDict[Tuple[str, str], PolicyRetriever]" = OrderedDict()
+        self.memory_budget = memory_budget
+        self.evictions = 0
+
+        self.state = "cold"  # cold -> warming -> ready | failed
+        self.error: Optional[str] = None
+        self.warmup_seconds: Optional[float] = None
+        self._warm_thread: Optional[threading.Thread] = None
+
+    # ---------------------------------
+    # 공유 컴포넌트 (lazy)
+    # ---------------------------------
+    def embeddings(self):
+        with self._shared_lock:
+            if self._embeddings is None:
+                from langchain_community.embeddings import HuggingFaceEmbeddings
+                from app.rag.embed_batcher import MicroBatchEmbeddings
+
+                base = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)
+                self._embeddings = MicroBatchEmbeddings(base) if EMBED_BATCH_ENABLED else base
+            return self._embeddings
+
+    def chroma_client(self):
+        with self._shared_lock:
+            if self._chroma is None:
+                from app.rag.chroma_store import chroma_client
+
+                self._chroma = chroma_client(str(VECTORSTORE_DIR))
+            return self._chroma
+
+    def _tenant(self, tenant: Optional[str]) -> _TenantIndex:
+        paths = tenant_paths(tenant)
+        with self._lock:
+            idx = self._tenants.get(paths.tenant)
+            if idx is None:
+                idx = self._tenants[paths.tenant] = _TenantIndex(paths)
+            return idx
+
+    def vectorstore(self, tenant: Optional[str] = None):
+        return self._load_vectorstore(self._tenant(tenant))
+
+    def _load_vectorstore(self, t: _TenantIndex):
+        with t.lock:
+            if t.vectorstore is None:
+                corpus = self._load_corpus(t) if VECTOR_BACKEND == "numpy" else None
+                if corpus is not None and corpus.vectors is not None:
+                    from app.rag.vector_index import NumpyVectorStore
+
+                    t.vectorstore = NumpyVectorStore(corpus, self.embeddings())
+                    t.vector_backend = "numpy"
+                else:
+                    if VECTOR_BACKEND == "numpy":
+                        print(f"[runtime] corpus snapshot has no vectors (tenant={t.paths.tenant}). "
+                              "fallback to chroma (run build_index)")
+                    from langchain_chroma import Chroma
+
+                    t.vectorstore = Chroma(
+                        client=self.chroma_client(),
+                        collection_name=t.paths.collection,
+                        embedding_function=self.embeddings(),
+                    )
+                    t.vector_backend = "chroma"
+            return t.vectorstore
+
+    @property
+    def vector_backend(self) -> Optional[str]:
+        # default tenant 기준 (bench / status 표시용)
+        t = self._tenants.get(DEFAULT_TENANT)
+        return t.vector_backend if t is not None else None
+
+    def corpus(self, tenant: Optional[str] = None):
+        return self._load_corpus(self._tenant(tenant))
+
+    def _load_corpus(self, t: _TenantIndex):
+        with t.lock:
+            if not t.corpus_loaded:
+                from app.rag.corpus_snapshot import load_snapshot
+
+                t.corpus = load_snapshot(t.paths.snapshot_dir)
+                t.corpus_loaded = True
+                if t.corpus is not None and EVIDENCE_TABLE_ENABLED:
+                    from app.rag.evidence_table import load_evidence_table
+
+                    t.evidence_table = load_evidence_table(t.paths.snapshot_dir, t.corpus.index_version)
+            return t.corpus
+
+    def bm25(self, tenant: Optional[str] = None):
+        return self._load_bm25(self._tenant(tenant))
+
+    def _load_bm25(self, t: _TenantIndex):
+        # 스냅샷이 없을 때만 쓰는 fallback (정책 문서를 파싱한 메모리 코퍼스)
+        with t.lock:
+            if t.bm25 is None:
+                from app.rag.corpus_snapshot import InMemoryCorpus
+
+                t.bm25 = InMemoryCorpus.from_policies(t.paths.policy_dir)
+            return t.bm25
+
+    def _pooled(self, key: Tuple[str, str]) -> Optional["PolicyRetriever"]:
+        with self._lock:
+            retriever = self._pool.get(key)
+            if retriever is not None:
+                self._pool.move_to_end(key)
+            return retriever
+
+    def get_retriever(self, mode: str, tenant_id: Optional[str] = None) -> "PolicyRetriever":
+        """
+        (tenant, mode) retriever. 인덱스가 없는 tenant는 default로 검색 (resolve_tenant, 캐시된 tenant 목록 기준)
+        pool에 없으면 (tenant, mode)별 lock 안에서 전역 lock 없이 로딩 (같은 key의 동시 요청은 한 번만 로딩)
+        """
+        key = (resolve_tenant(tenant_id), mode)
+        retriever = self._pooled(key)
+        if retriever is not None:
+            return retriever
+
+        with self._lock:
+            load_lock = self._loading.setdefault(key, threading.Lock())
+        with load_lock:
+            # 기다리는 동안 먼저 로딩한 요청이 pool에 넣었으면 그대로 사용
+            retriever = self._pooled(key)
+            if retriever is not None:
+                return retriever
+
+            from app.rag.retriever import PolicyRetriever
+
+            tenant = key[0]
+            t = self._tenant(tenant)
+            corpus = self._load_corpus(t)
+            if corpus is None and mode == "hybrid":
+                corpus = self._load_bm25(t)
+            # vectorstore 로딩이 tenant의 실제 backend를 정함 (numpy 스냅샷에 벡터가 없으면 chroma)
+            vectorstore = self._load_vectorstore(t)
+            retriever = PolicyRetriever(
+                mode=mode,
+                enable_threshold=True,
+                embeddings=self.embeddings(),
+                vectorstore=vectorstore,
+                corpus=corpus,
+                tenant=tenant,
+                evidence_table=t.evidence_table,
+                vector_backend=t.vector_backend,
+            )
+            est_bytes = t.estimate_bytes()
+
+            with self._lock:
+                t.est_bytes = est_bytes
+                # 로딩하는 동안 다른 항목의 eviction으로 tenant가 빠졌으면 다시 등록
+                self._tenants.setdefault(tenant, t)
+                self._pool[key] = retriever
+                self._evict()
+            return retriever
+
+    def _pool_bytes(self) -> int:
+        return sum(t.est_bytes for t in self._tenants.values())
+
+    def _evict(self):
+        # 방금 쓴 항목(맨 뒤)은 남긴다
+        while len(self._pool) > 1 and self._pool_bytes() > self.memory_budget:
+            (tenant, _), _ = self._pool.popitem(last=False)
+            self.evictions += 1
+            if not any(k[0] == tenant for k in self._pool):
+                self._tenants.pop(tenant, None)
+
+    def pool_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": [f"{t}:{m}" for t, m in self._pool],
+                "tenants": sorted(self._tenants),
+                "est_bytes": self._pool_bytes(),
+                "budget_bytes": self.memory_budget,
+                "evictions": self.evictions,
+            }
+
+    # ---------------------------------
+    # warmup / readiness
+    # ---------------------------------
+    def warmup(self, modes: Tuple[str, ...] = RUNTIME_WARMUP_MODES):
+        """
+        모델/스토어/BM25를 로딩하고 mode별로 검색을 한 번 돌려서
+        lazy 초기화(모델 weight, HNSW 로딩 등)를 미리 끝낸다.
+        """
+        with self._lock:
+            if self.state in ("warming", "ready"):
+                return
+            self.state = "warming"
+            self.error = None
+
+        t0 = time.perf_counter()
+        try:
+            for mode in modes:
+                self.get_retriever(mode).retrieve([_WARMUP_QUERY])
+        except Exception as e:
+            self.state = "failed"
+            self.error = f"{type(e).__name__}: {e}"
+            return
+        self.warmup_seconds = round(time.perf_counter() - t0, 3)
+        self.state = "ready"
+
+    def start_warmup(self, modes: Tuple[str, ...] = RUNTIME_WARMUP_MODES):
+        # 백그라운드로 warmup -> /health는 바로 응답, /ready는 warm 완료 후 ready
+        with self._lock:
+            if self._warm_thread is not None and self._warm_thread.is_alive():
+                return
+            self._warm_thread = threading.Thread(
+                target=self.warmup, args=(modes,), name="retrieval-warmup", daemon=True
+            )
+            self._warm_thread.start()
+
+    def preload(self, modes: Tuple[str, ...] = RUNTIME_WARMUP_MODES, tenant: Optional[str] = None):
+        """
+        pre-fork 서버용: fork 전에 부모에서 로딩해도 안전한 것만 미리 로딩 -> 워커들이 copy-on-write로 공유
+        - 임베딩 모델 (encode 1회로 lazy 초기화까지)
+        - 코퍼스 스냅샷(mmap) / 스냅샷이 없으면 메모리 BM25 코퍼스
+        - numpy backend면 vectorstore + mode별 retriever까지
+        chroma client는 sqlite 연결/백그라운드 스레드를 fork 너머로 가져가면 안 되므로 워커에서 lazy 로딩.
+        state는 바꾸지 않는다 (워커의 warmup이 나머지를 로딩하고 ready로 전환).
+        """
+        self.embeddings().embed_documents([_WARMUP_QUERY])
+        corpus = self.corpus(tenant)
+        if corpus is None and "hybrid" in modes:
+            self.bm25(tenant)
+        if VECTOR_BACKEND == "numpy" and corpus is not None and corpus.vectors is not None:
+            for mode in modes:
+                self.get_retriever(mode, tenant)
+
+    def _default_index_version(self) -> Optional[str]:
+        t = self._tenants.get(DEFAULT_TENANT)
+        return t.corpus.index_version if t is not None and t.corpus is not None else None
+
+    def _default_evidence_table(self) -> Optional[Dict[str, int]]:
+        t = self._tenants.get(DEFAULT_TENANT)
+        return t.evidence_table.stats() if t is not None and t.evidence_table is not None else None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "ready": self.state == "ready",
+            "modes": sorted({m for t, m in self._pool if t == DEFAULT_TENANT}),
+            "warmup_seconds": self.warmup_seconds,
+            "index_version": self._default_index_version(),
+            "vector_backend": self.vector_backend,
+            "evidence_table": self._default_evidence_table(),
+            "pool": self.pool_stats(),
+            "error": self.error,
+        }
+
+
+_runtime = RetrievalRuntime()
+
+def get_runtime() -> RetrievalRuntime:
+    return _runtime
+
+def get_retriever(mode: str, tenant_id: Optional[str] = None) -> "PolicyRetriever":
+    return _runtime.get_retriever(mode, tenant_id)
@@ -0,0 +1,109 @@
+from __future__ import annotations
+import re
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import FrozenSet, List, Optional
+
+from app.rag.config import (
+    POLICY_DIR,
+    CHROMA_COLLECTION,
+    CORPUS_SNAPSHOT_DIR,
+    INDEX_MANIFEST_PATH,
+    TENANT_POLICY_ROOT,
+    TENANT_INDEX_ROOT,
+    TENANT_INDEX_RESCAN_SECONDS,
+)
+
+# tenant별 정책 문서/인덱스 위치
+# - default: 기존 경로 그대로 (POLICY_DIR, CHROMA_COLLECTION, CORPUS_SNAPSHOT_DIR)
+# - 그 외: TENANT_POLICY_ROOT/<tenant>/*  ->  Chroma 컬렉션 policies__<tenant>
+#          + TENANT_INDEX_ROOT/<tenant>/{corpus, index_manifest.json}
+DEFAULT_TENANT = "default"
+
+# chroma 컬렉션 이름 규칙([a-zA-Z0-9._-], 3~512자)에 맞고 경로로 써도 안전한 id만 허용
+_TENANT_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+@dataclass(frozen=True)
+class TenantPaths:
+    tenant: str
+    policy_dir: Path
+    collection: str
+    snapshot_dir: Path
+    manifest_path: Path
+
+
+def is_valid_tenant(tenant_id: Optional[str]) -> bool:
+    return bool(tenant_id) and bool(_TENANT_RE.match(tenant_id))
+
+
+def tenant_paths(tenant_id: Optional[str] = None) -> TenantPaths:
+    if not tenant_id or tenant_id == DEFAULT_TENANT:
+        return TenantPaths(DEFAULT_TENANT, POLICY_DIR, CHROMA_COLLECTION, CORPUS_SNAPSHOT_DIR, INDEX_MANIFEST_PATH)
+    if not is_valid_tenant(tenant_id):
+        raise ValueError(f"invalid tenant id: {tenant_id!r}")
+    index_dir = TENANT_INDEX_ROOT / tenant_id
+    return TenantPaths(
+        tenant=tenant_id,
+        policy_dir=TENANT_POLICY_ROOT / tenant_id,
+        collection=f"{CHROMA_COLLECTION}__{tenant_id}",
+        snapshot_dir=index_dir / "corpus",
+        manifest_path=index_dir / "index_manifest.json",
+    )
+
+
+def list_tenants() -> List[str]:
+    """정책 디렉토리가 있는 tenant 목록 (default 제외)"""
+    if not TENANT_POLICY_ROOT.exists():
+        return []
+    return sorted(p.name for p in TENANT_POLICY_ROOT.iterdir() if p.is_dir() and is_valid_tenant(p.name))
+
+
+# 인덱스가 있는 tenant 집합 캐시 (tenant_id는 클라이언트가 정하므로 요청마다 stat하지 않도록)
+# TENANT_INDEX_RESCAN_SECONDS마다 다시 스캔, 같은 프로세스의 build_index는 게시 직후 invalidate_indexed_tenants()
+_indexed: Optional[FrozenSet[str]] = None
+_indexed_at = 0.0
+_indexed_lock = threading.Lock()
+
+
+def _scan_indexed_tenants() -> FrozenSet[str]:
+    if not TENANT_INDEX_ROOT.exists():
+        return frozenset()
+    out = set()
+    for p in TENANT_INDEX_ROOT.iterdir():
+        if not p.is_dir() or not is_valid_tenant(p.name) or p.name == DEFAULT_TENANT:
+            continue
+        paths = tenant_paths(p.name)
+        if paths.manifest_path.exists() or paths.snapshot_dir.exists():
+            out.add(p.name)
+    return frozenset(out)
+
+
+def indexed_tenants() -> FrozenSet[str]:
+    """인덱스(build_index 결과)가 있는 tenant 목록 (default 제외, 최대 TENANT_INDEX_RESCAN_SECONDS 전 기준)"""
+    global _indexed, _indexed_at
+    with _indexed_lock:
+        now = time.monotonic()
+        if _indexed is None or now - _indexed_at >= TENANT_INDEX_RESCAN_SECONDS:
+            _indexed = _scan_indexed_tenants()
+            _indexed_at = now
+        return _indexed
+
+
+def invalidate_indexed_tenants():
+    # build_index가 새 인덱스를 게시한 뒤 호출 -> 다음 resolve_tenant에서 다시 스캔
+    global _indexed
+    with _indexed_lock:
+        _indexed = None
+
+
+def resolve_tenant(tenant_id: Optional[str]) -> str:
+    """
+    요청의 tenant_id -> 실제로 검색할 tenant.
+    인덱스(build_index 결과)가 없거나 잘못된 id면 default (rule set의 tenant fallback과 같은 방식)
+    """
+    if not is_valid_tenant(tenant_id) or tenant_id == DEFAULT_TENANT:
+        return DEFAULT_TENANT
+    return tenant_id if tenant_id in indexed_tenants() else DEFAULT_TENANT
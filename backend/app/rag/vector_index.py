@@ -0,0 +1,204 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from app.rag.config import VECTOR_SEARCH_BLOCK_ROWS
+
+if TYPE_CHECKING:
+    from app.rag.corpus_snapshot import CorpusSnapshot
+
+# 코퍼스 스냅샷 안에 청크 순서 그대로 저장되는 임베딩 행렬
+VECTORS_FILE = "vectors.bin"
+VECTOR_SCALES_FILE = "vector_scales.npy"
+
+VECTOR_DTYPES = ("float32", "float16", "int8")
+
+
+def _normalize(v: np.ndarray) -> np.ndarray:
+    v = np.asarray(v, dtype=np.float32)
+    norm = np.linalg.norm(v, axis=-1, keepdims=True)
+    return v / np.maximum(norm, 1e-12)
+
+
+# 정규화된 벡터 -> 저장용 행 (int8은 행별 scale: q * scale이 단위 벡터가 되도록)
+def _quantize(v: np.ndarray, dtype: str) -> Tuple[np.ndarray, float]:
+    if dtype != "int8":
+        return v.astype(dtype), 1.0
+    step = float(np.abs(v).max()) / 127.0 or 1.0
+    q = np.clip(np.rint(v / step), -127, 127).astype(np.int8)
+    norm = float(np.linalg.norm(q.astype(np.float32)))
+    return q, (1.0 / norm if norm else 0.0)
+
+
+class VectorFileWriter:
+    """
+    청크 위치(pos)별 벡터를 받아 vectors.bin에 순서대로 기록.
+    임베딩은 배치로 늦게 도착하므로, 앞에서부터 연속으로 채워진 행만 바로 쓰고
+    나머지는 잠깐 들고 있는다 (배치 크기만큼만 메모리 사용).
+    """
+    def __init__(self, out_dir: Path, dtype: str):
+        if dtype not in VECTOR_DTYPES:
+            raise ValueError(f"unknown vector dtype: {dtype}")
+        self.dtype = dtype
+        self.out_dir = Path(out_dir)
+        self.dim: Optional[int] = None
+        self.n_written = 0
+        self._pending: Dict[int, np.ndarray] = {}
+        self._scales: List[float] = []
+        self._f = open(self.out_dir / VECTORS_FILE, "wb")
+
+    def put(self, pos: int, vec) -> None:
+        v = _normalize(vec).reshape(-1)
+        if self.dim is None:
+            self.dim = int(v.shape[0])
+        elif v.shape[0] != self.dim:
+            raise ValueError(f"vector dim mismatch: {v.shape[0]} != {self.dim}")
+        self._pending[pos] = v
+        while self.n_written in self._pending:
+            row, scale = _quantize(self._pending.pop(self.n_written), self.dtype)
+            self._f.write(row.tobytes())
+            self._scales.append(scale)
+            self.n_written += 1
+
+    def finish(self, n_chunks: int) -> Optional[Dict[str, Any]]:
+        """모든 청크의 벡터가 채워졌으면 manifest용 params, 하나도 없으면 None"""
+        self._f.close()
+        if self.n_written == 0 and not self._pending:
+            (self.out_dir / VECTORS_FILE).unlink()
+            return None
+        if self.n_written != n_chunks:
+            raise ValueError(f"missing vectors: {self.n_written}/{n_chunks} written")
+        if self.dtype == "int8":
+            np.save(self.out_dir / VECTOR_SCALES_FILE, np.asarray(self._scales, dtype=np.float32))
+        return {"dtype": self.dtype, "dim": self.dim, "n": self.n_written}
+
+
+class VectorMatrix:
+    """
+    스냅샷의 임베딩 행렬 (memory-mapped, 워커 간 page cache 공유).
+    search(): 정규화된 query 행렬 [m, dim]에 대해 정확한 cosine top-k (행렬곱 한 번, block 단위 변환)
+    """
+    def __init__(self, root: Path, params: Dict[str, Any]):
+        self.dtype = params["dtype"]
+        self.dim = int(params["dim"])
+        self.n = int(params["n"])
+        self.matrix = np.memmap(root / VECTORS_FILE, dtype=self.dtype, mode="r", shape=(self.n, self.dim))
+        self.scales = (
+            np.load(root / VECTOR_SCALES_FILE, mmap_mode="r") if self.dtype == "int8" else None
+        )
+
+    def __len__(self) -> int:
+        return self.n
+
+    def vector(self, i: int) -> np.ndarray:
+        v = np.asarray(self.matrix[i], dtype=np.float32)
+        return v * self.scales[i] if self.scales is not None else v
+
+    def similarities(self, queries: np.ndarray, block_rows: int = VECTOR_SEARCH_BLOCK_ROWS) -> np.ndarray:
+        q = _normalize(np.atleast_2d(queries))
+        if self.dtype == "float32":
+            return q @ self.matrix.T
+        # float16/int8는 BLAS가 없으므로 block 단위로 float32 변환 후 곱함
+        sims = np.empty((q.shape[0], self.n), dtype=np.float32)
+        for lo in range(0, self.n, block_rows):
+            hi = min(lo + block_rows, self.n)
+            block = self.matrix[lo:hi].astype(np.float32)
+            sims[:, lo:hi] = q @ block.T
+        if self.scales is not None:
+            sims *= self.scales
+        return sims
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """-> (idx [m, k], cosine similarity [m, k]), 유사도 내림차순"""
+        sims = self.similarities(queries)
+        k = min(k, self.n)
+        if k <= 0:
+            empty = np.empty((sims.shape[0], 0))
+            return empty.astype(np.int64), empty.astype(np.float32)
+        part = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        part_sims = np.take_along_axis(sims, part, axis=1)
+        order = np.argsort(-part_sims, axis=1, kind="stable")
+        return np.take_along_axis(part, order, axis=1), np.take_along_axis(part_sims, order, axis=1)
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    코퍼스 스냅샷의 임베딩 행렬로 검색하는 읽기 전용 vectorstore (Chroma 대체용).
+    score는 Chroma(hnsw:space=cosine)와 같은 cosine distance = 1 - cos 이라서 기존 threshold 그대로 사용.
+    - 스냅샷은 mmap으로 여러 워커가 공유하므로 add_texts로 문서를 추가할 수 없다 (RuntimeError, build_index로 다시 생성)
+    - from_texts는 build_index와 같은 SnapshotWriter로 snapshot_dir에 새 스냅샷을 쓰고 그 위에 생성
+    """
+    def __init__(self, corpus: "CorpusSnapshot", embedding: Embeddings):
+        if corpus.vectors is None:
+            raise ValueError("corpus snapshot has no vectors (run build_index)")
+        self.corpus = corpus
+        self.index = corpus.vectors
+        self._embedding = embedding
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def search_by_vectors(self, vectors, k: int = 4) -> List[List[Tuple[Document, float]]]:
+        """여러 query 벡터를 한 번에 검색 -> query별 [(Document, cosine distance)]"""
+        idx, sims = self.index.search(np.asarray(vectors, dtype=np.float32), k)
+        return [
+            [(self.corpus.document(int(i)), float(1.0 - s)) for i, s in zip(row_i, row_s)]
+            for row_i, row_s in zip(idx.tolist(), sims.tolist())
+        ]
+
+    def similarity_search_by_vector_with_relevance_scores(
+            self, embedding: List[float], k: int = 4, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return self.search_by_vectors([embedding], k)[0]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [d for d, _ in self.similarity_search_by_vector_with_relevance_scores(embedding, k)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_relevance_scores(self._embedding.embed_query(query), k)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [d for d, _ in self.similarity_search_with_score(query, k)]
+
+    # 읽기 전용: 스냅샷에 행을 추가하지 않음 (build_index로 다시 생성)
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, **kwargs: Any) -> List[str]:
+        raise RuntimeError("NumpyVectorStore is read-only; rebuild with build_index")
+
+    @classmethod
+    def from_texts(
+            cls,
+            texts: List[str],
+            embedding: Embeddings,
+            metadatas: Optional[List[dict]] = None,
+            *,
+            snapshot_dir: Path,
+            ids: Optional[List[str]] = None,
+            **kwargs: Any,
+    ) -> "NumpyVectorStore":
+        """
+        texts를 임베딩해서 snapshot_dir에 코퍼스 스냅샷(BM25 통계 + 임베딩 행렬)을 쓰고 그 위에 store 생성.
+        build_index의 SnapshotWriter를 그대로 쓰므로 런타임이 읽는 스냅샷과 같은 포맷.
+        ids: chunk_id (없으면 metadata의 chunk_id, 그것도 없으면 순번)
+        """
+        from app.rag.chunking import Chunk
+        from app.rag.corpus_snapshot import SnapshotWriter, load_snapshot
+
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        writer = SnapshotWriter(Path(snapshot_dir))
+        for i, (text, vec) in enumerate(zip(texts, embedding.embed_documents(texts))):
+            meta = dict(metadatas[i] or {})
+            cid = ids[i] if ids else meta.get("chunk_id") or f"text::{i}"
+            meta.setdefault("chunk_id", cid)
+            writer.set_vector(writer.add(Chunk(chunk_id=cid, text=text, metadata=meta)), vec)
+        writer.finish()
+        return cls(load_snapshot(snapshot_dir), embedding)
@@ -0,0 +1,238 @@
+from __future__ import annotations
+import argparse
+import gc
+import os
+import signal
+import sys
+import time
+import traceback
+from typing import Dict, List, Optional
+
+# 부모에서 tokenizer를 한 번 쓰고 fork하면 HF tokenizers가 경고 후 병렬화를 끄므로 처음부터 끈다
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+# pre-fork 서버: 부모가 임베딩 모델/인덱스를 로딩한 뒤 워커를 fork -> 읽기 전용 페이지를 copy-on-write로 공유
+# python -m app.serve --workers 4 --port 8000
+
+SERVE_HOST = "127.0.0.1"
+SERVE_PORT = 8000
+SERVE_WORKERS = 2
+
+# 워커별 메모리(USS/PSS/RSS) 보고 주기 (0이면 끔)
+SERVE_MEMORY_REPORT_SECONDS = 60.0
+
+# 워커가 죽으면 이만큼 기다렸다가 다시 fork (시작하자마자 죽는 경우 fork가 폭주하지 않도록)
+_RESPAWN_BACKOFF_SECONDS = 1.0
+
+_MB = 1024 * 1024
+
+
+def read_smaps_rollup(pid: int) -> Optional[Dict[str, int]]:
+    """
+    /proc/<pid>/smaps_rollup -> {"rss", "pss", "uss", "shared"} (bytes). linux 전용, 없으면 None
+    - uss: 그 프로세스만 가진 페이지 (Private_Clean + Private_Dirty) = 워커를 하나 더 띄울 때 늘어나는 메모리
+    - pss: 공유 페이지를 공유 프로세스 수로 나눠 더한 값
+    """
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+            lines = f.readlines()
+    except OSError:
+        return None
+    kb: Dict[str, int] = {}
+    for line in lines:
+        parts = line.split()
+        if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+            kb[parts[0][:-1]] = int(parts[1])
+    return {
+        "rss": kb.get("Rss", 0) * 1024,
+        "pss": kb.get("Pss", 0) * 1024,
+        "uss": (kb.get("Private_Clean", 0) + kb.get("Private_Dirty", 0)) * 1024,
+        "shared": (kb.get("Shared_Clean", 0) + kb.get("Shared_Dirty", 0)) * 1024,
+    }
+
+
+def memory_report(parent: int, workers: Dict[int, int]) -> List[str]:
+    rows = [("parent", parent)] + [(f"worker {i}", pid) for pid, i in sorted(workers.items(), key=lambda x: x[1])]
+    out = []
+    uss_total = 0
+    for name, pid in rows:
+        m = read_smaps_rollup(pid)
+        if m is None:
+            out.append(f"[serve] {name} pid={pid} smaps_rollup unavailable")
+            continue
+        if pid != parent:
+            uss_total += m["uss"]
+        out.append(
+            f"[serve] {name} pid={pid} uss={m['uss'] / _MB:.1f}MB pss={m['pss'] / _MB:.1f}MB "
+            f"rss={m['rss'] / _MB:.1f}MB shared={m['shared'] / _MB:.1f}MB"
+        )
+    if workers:
+        out.append(f"[serve] workers uss total={uss_total / _MB:.1f}MB avg={uss_total / len(workers) / _MB:.1f}MB")
+    return out
+
+
+def _set_torch_threads(n: int):
+    # torch를 쓰지 않는 환경이면 무시
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(max(1, n))
+
+
+def preload(tenant: Optional[str] = None):
+    """
+    fork 전에 부모에서 한 번 로딩 (app import, 규칙, 임베딩 모델, 인덱스)
+    - torch intra-op 스레드 풀은 fork 너머로 안전하지 않으므로 부모에서는 1개로 제한 (워커에서 다시 설정)
+    - 로딩 후 gc.freeze(): 이미 만든 객체를 GC 추적 대상에서 빼서 워커의 GC가 공유 페이지를 건드리지 않게
+    """
+    t0 = time.perf_counter()
+    gc.disable()
+    from app.main import app
+    from app.rag.runtime import get_runtime
+    from app.services.rules import get_rule_registry
+
+    try:
+        import torch
+        torch.set_num_threads(1)
+    except ImportError:
+        pass
+    get_rule_registry().get(tenant)
+    get_runtime().preload(tenant=tenant)
+    gc.collect()
+    gc.freeze()
+    print(f"[serve] preloaded in {time.perf_counter() - t0:.2f}s (frozen objects={gc.get_freeze_count()})", flush=True)
+    return app
+
+
+class PreforkServer:
+    """
+    - 부모: preload -> listen socket 생성 -> 워커 N개 fork, 죽은 워커는 다시 fork, SIGTERM/SIGINT면 워커에 전달 후 종료 대기
+    - 워커: 같은 socket으로 uvicorn 실행 (lifespan warmup은 부모에서 로딩한 것을 그대로 쓰고 나머지만 로딩)
+    """
+    def __init__(
+            self,
+            app,
+            *,
+            host: str = SERVE_HOST,
+            port: int = SERVE_PORT,
+            workers: int = SERVE_WORKERS,
+            torch_threads: Optional[int] = None,
+            log_level: str = "info",
+    ):
+        import uvicorn
+
+        self.config = uvicorn.Config(app, host=host, port=port, log_level=log_level)
+        self.n_workers = max(1, workers)
+        self.torch_threads = torch_threads or max(1, (os.cpu_count() or 1) // self.n_workers)
+        self.sock = None
+        self.workers: Dict[int, int] = {}  # pid -> worker 번호
+        self._stopping = False
+
+    def _run_worker(self, i: int):
+        import uvicorn
+
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        gc.enable()
+        _set_torch_threads(self.torch_threads)
+        code = 0
+        try:
+            uvicorn.Server(self.config).run(sockets=[self.sock])
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+        # 부모의 정리 코드(finally 등)가 자식에서 실행되지 않도록 바로 종료
+        os._exit(code)
+
+    def _spawn(self, i: int):
+        pid = os.fork()
+        if pid == 0:
+            self._run_worker(i)
+        self.workers[pid] = i
+
+    def _stop(self, *_):
+        self._stopping = True
+
+    def _reap(self) -> List[int]:
+        dead = []
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            i = self.workers.pop(pid, None)
+            if i is not None:
+                dead.append(i)
+                if not self._stopping:
+                    print(f"[serve] worker {i} pid={pid} exited (status={status}), respawning", flush=True)
+        return dead
+
+    def run(self, memory_report_seconds: float = SERVE_MEMORY_REPORT_SECONDS, check_after: Optional[float] = None):
+        """check_after: 워커를 띄우고 이 시간(초) 뒤 메모리 보고 후 종료 (공유가 잘 되는지 확인용)"""
+        self.sock = self.config.bind_socket()
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        for i in range(self.n_workers):
+            self._spawn(i)
+        print(f"[serve] {self.n_workers} workers on {self.config.host}:{self.config.port} "
+              f"(torch threads/worker={self.torch_threads})", flush=True)
+
+        started = time.monotonic()
+        next_report = started + (memory_report_seconds or float("inf"))
+        try:
+            while not self._stopping:
+                for i in self._reap():
+                    if not self._stopping:
+                        time.sleep(_RESPAWN_BACKOFF_SECONDS)
+                        self._spawn(i)
+                now = time.monotonic()
+                if check_after is not None and now - started >= check_after:
+                    print("\n".join(memory_report(os.getpid(), self.workers)), flush=True)
+                    break
+                if now >= next_report:
+                    print("\n".join(memory_report(os.getpid(), self.workers)), flush=True)
+                    next_report = now + memory_report_seconds
+                time.sleep(0.2)
+        finally:
+            self._stopping = True
+            for pid in list(self.workers):
+                try:
+                    os.kill(pid, signal.SIGTERM)
+                except ProcessLookupError:
+                    pass
+            for pid in list(self.workers):
+                try:
+                    os.waitpid(pid, 0)
+                except ChildProcessError:
+                    pass
+            self.workers.clear()
+            self.sock.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="pre-fork 서버 (모델/인덱스를 워커 간 copy-on-write로 공유)")
+    parser.add_argument("--host", default=SERVE_HOST)
+    parser.add_argument("--port", type=int, default=SERVE_PORT)
+    parser.add_argument("--workers", type=int, default=SERVE_WORKERS)
+    parser.add_argument("--torch-threads", type=int, default=None, help="워커당 torch 스레드 수 (기본: CPU 수 / 워커 수)")
+    parser.add_argument("--tenant", default=None, help="미리 로딩할 tenant 인덱스 (기본: default)")
+    parser.add_argument("--memory-report", type=float, default=SERVE_MEMORY_REPORT_SECONDS,
+                        help="워커별 USS/PSS 보고 주기(초), 0이면 끔")
+    parser.add_argument("--check", type=float, default=None, metavar="SECONDS",
+                        help="워커를 띄우고 SECONDS초 뒤 워커별 메모리를 보고하고 종료")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    if not hasattr(os, "fork"):
+        sys.exit("[serve] os.fork is not available on this platform; use uvicorn directly")
+
+    server = PreforkServer(
+        preload(args.tenant),
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        torch_threads=args.torch_threads,
+        log_level=args.log_level,
+    )
+    server.run(memory_report_seconds=args.memory_report, check_after=args.check)
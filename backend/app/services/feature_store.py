@@ -0,0 +1,245 @@
+from __future__ import annotations
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.models.schemas import LogEvent, Baseline
+from app.services.features import ComputedFeatures, _ts_to_us, _HOUR_US
+
+# 실패 카운터 ring buffer 설정 (window를 bucket 단위로 나눠서 카운트)
+FEATURE_STORE_WINDOW_SECONDS = 5 * 60
+FEATURE_STORE_BUCKET_SECONDS = 5
+
+# 사용자별로 기억하는 국가/기기 수 (오래 안 보인 것부터 버림)
+FEATURE_STORE_MAX_KNOWN = 32
+
+# 메모리 예산 (추정치 기준) / 이 시간 동안 갱신 없는 사용자는 제거
+FEATURE_STORE_MAX_BYTES = 64 * 1024 * 1024
+FEATURE_STORE_IDLE_TTL_SECONDS = 24 * 3600
+
+DEFAULT_TENANT = "default"
+
+# 메모리 추정용 대략적인 크기 (state 객체 + dict/array 오버헤드)
+_STATE_BASE_BYTES = 600
+_KNOWN_ENTRY_BYTES = 120
+
+
+class UserState:
+    """
+    (tenant_id, user_id) 하나의 상태.
+    - latest_*: 지금까지 본 가장 최근 이벤트 (night/new_country/new_device 판정용)
+    - slot_ids / counts: LOGIN FAIL ring buffer (bucket 번호, 해당 bucket 실패 수)
+    - countries / devices: SUCCESS 로그인에서 본 값 -> 마지막으로 본 시각(us)
+    - login_hours: SUCCESS 로그인 UTC hour bitmask
+    """
+    __slots__ = (
+        "latest_us", "latest_country", "latest_device",
+        "slot_ids", "counts", "countries", "devices",
+        "success_logins", "login_hours", "touched",
+    )
+
+    def __init__(self):
+        self.latest_us: Optional[int] = None
+        self.latest_country: Optional[str] = None
+        self.latest_device: Optional[str] = None
+        self.slot_ids: Optional[array] = None  # 실패가 처음 생길 때 할당
+        self.counts: Optional[array] = None
+        self.countries: Dict[str, int] = {}
+        self.devices: Dict[str, int] = {}
+        self.success_logins = 0
+        self.login_hours = 0
+        self.touched = time.monotonic()
+
+    def nbytes(self) -> int:
+        ring = 0 if self.slot_ids is None else len(self.slot_ids) * 16
+        return _STATE_BASE_BYTES + ring + _KNOWN_ENTRY_BYTES * (len(self.countries) + len(self.devices))
+
+    def learned_baseline(self) -> Optional[Baseline]:
+        # 성공 로그인을 한 번도 못 봤으면 기준 없음 (첫 로그인부터 new_* 로 잡지 않음)
+        if not self.success_logins:
+            return None
+        return Baseline(
+            known_countries=list(self.countries),
+            known_devices=list(self.devices),
+            typical_login_hours=[h for h in range(24) if self.login_hours >> h & 1],
+        )
+
+
+def _remember(seen: Dict[str, int], value: Optional[str], ts_us: int, limit: int):
+    if not value:
+        return
+    seen[value] = max(seen.get(value, ts_us), ts_us)
+    if len(seen) > limit:
+        del seen[min(seen, key=seen.get)]
+
+
+def _merge_baselines(client: Optional[Baseline], learned: Optional[Baseline]) -> Optional[Baseline]:
+    if client is None or learned is None:
+        return client or learned
+    return Baseline(
+        known_countries=list(dict.fromkeys(client.known_countries + learned.known_countries)),
+        known_devices=list(dict.fromkeys(client.known_devices + learned.known_devices)),
+        typical_login_hours=sorted(set(client.typical_login_hours) | set(learned.typical_login_hours)),
+    )
+
+
+class FeatureStore:
+    """
+    서버 쪽 사용자별 슬라이딩 윈도우 피처 저장소.
+    클라이언트는 새로 생긴 이벤트만 보내면 되고, 과거 실패 횟수/최근 이벤트/baseline은 여기서 유지한다.
+    - 실패 burst는 bucket 단위 ring buffer라서 window 경계가 bucket 크기만큼 근사됨
+    - baseline은 SUCCESS 로그인에서 학습, 요청에 baseline이 있으면 합쳐서 사용
+    - LRU 순서로 idle 사용자 제거 + 메모리 예산 초과 시 오래된 사용자부터 제거
+    """
+    def __init__(
+            self,
+            *,
+            window_seconds: int = FEATURE_STORE_WINDOW_SECONDS,
+            bucket_seconds: int = FEATURE_STORE_BUCKET_SECONDS,
+            max_known: int = FEATURE_STORE_MAX_KNOWN,
+            max_bytes: int = FEATURE_STORE_MAX_BYTES,
+            idle_ttl_seconds: float = FEATURE_STORE_IDLE_TTL_SECONDS,
+    ):
+        self.window_us = window_seconds * 1_000_000
+        self.bucket_us = bucket_seconds * 1_000_000
+        # 최신 bucket 포함 window를 덮는 bucket 수
+        self.n_buckets = -(-window_seconds // bucket_seconds) + 1
+        self.max_known = max_known
+        self.max_bytes = max_bytes
+        self.idle_ttl_seconds = idle_ttl_seconds
+
+        self._lock = threading.Lock()
+        self._states: "OrderedDict[Tuple[str, str], UserState]" = OrderedDict()
+        self._bytes = 0
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    # ---------------------------------
+    # 이벤트 반영
+    # ---------------------------------
+    def _add_fail(self, st: UserState, ts_us: int):
+        if st.slot_ids is None:
+            st.slot_ids = array("q", [-1]) * self.n_buckets
+            st.counts = array("q", [0]) * self.n_buckets
+        b = ts_us // self.bucket_us
+        latest_b = st.latest_us // self.bucket_us
+        if latest_b - b >= self.n_buckets:
+            return  # 이미 window 밖
+        i = b % self.n_buckets
+        if st.slot_ids[i] != b:
+            if st.slot_ids[i] > b:
+                return  # 더 최근 bucket이 자리를 쓰는 중 = 이 이벤트는 window 밖
+            st.slot_ids[i] = b
+            st.counts[i] = 0
+        st.counts[i] += 1
+
+    def _apply(self, st: UserState, e: LogEvent, ts_us: int):
+        # 같은 시각이면 나중에 들어온 이벤트가 최신 (extract_features와 동일)
+        if st.latest_us is None or ts_us >= st.latest_us:
+            st.latest_us = ts_us
+            st.latest_country = e.source.country
+            st.latest_device = e.source.device_id
+
+        if e.action.upper() == "LOGIN":
+            if e.result == "FAIL":
+                self._add_fail(st, ts_us)
+            else:
+                st.success_logins += 1
+                st.login_hours |= 1 << (ts_us // _HOUR_US) % 24
+                _remember(st.countries, e.source.country, ts_us, self.max_known)
+                _remember(st.devices, e.source.device_id, ts_us, self.max_known)
+
+    def _burst(self, st: UserState) -> int:
+        if st.slot_ids is None or st.latest_us is None:
+            return 0
+        latest_b = st.latest_us // self.bucket_us
+        return sum(
+            c for b, c in zip(st.slot_ids, st.counts)
+            if 0 <= latest_b - b < self.n_buckets
+        )
+
+    def _features(self, st: UserState, baseline: Optional[Baseline]) -> ComputedFeatures:
+        if st.latest_us is None:
+            return ComputedFeatures(0, False, False, False)
+        country, device = st.latest_country, st.latest_device
+        return ComputedFeatures(
+            failed_login_burst_count=self._burst(st),
+            night_access=(st.latest_us // _HOUR_US) % 24 <= 5,
+            new_country=bool(baseline and country and country not in baseline.country_set()),
+            new_device=bool(baseline and device and device not in baseline.device_set()),
+        )
+
+    def update(
+            self,
+            tenant_id: Optional[str],
+            logs: Sequence[LogEvent],
+            baseline: Optional[Baseline] = None,
+            baselines: Optional[Dict[str, Baseline]] = None,
+    ) -> Dict[str, ComputedFeatures]:
+        """
+        새 이벤트를 사용자별 상태에 반영하고 {user_id: ComputedFeatures} 반환.
+        new_country/new_device는 이번 요청 이전까지 학습한 baseline(+요청 baseline) 기준.
+        """
+        tenant = tenant_id or DEFAULT_TENANT
+        by_user: Dict[str, List[Tuple[int, LogEvent]]] = {}
+        for e in logs:
+            by_user.setdefault(e.actor.user_id, []).append((_ts_to_us(e.ts), e))
+
+        out: Dict[str, ComputedFeatures] = {}
+        with self._lock:
+            self._evict_idle()
+            for user_id, events in by_user.items():
+                key = (tenant, user_id)
+                st = self._states.pop(key, None)
+                if st is None:
+                    st = UserState()
+                else:
+                    self._bytes -= st.nbytes()
+
+                user_baseline = (baselines or {}).get(user_id, baseline)
+                effective = _merge_baselines(user_baseline, st.learned_baseline())
+
+                events.sort(key=lambda x: x[0])
+                for ts_us, e in events:
+                    self._apply(st, e, ts_us)
+                out[user_id] = self._features(st, effective)
+
+                st.touched = time.monotonic()
+                self._states[key] = st
+                self._bytes += st.nbytes()
+            self._evict_over_budget()
+        return out
+
+    # ---------------------------------
+    # 제거
+    # ---------------------------------
+    def _drop_oldest(self):
+        _, st = self._states.popitem(last=False)
+        self._bytes -= st.nbytes()
+        self.evicted += 1
+
+    def _evict_idle(self):
+        # OrderedDict 앞쪽이 가장 오래 갱신 안 된 사용자
+        cutoff = time.monotonic() - self.idle_ttl_seconds
+        while self._states and next(iter(self._states.values())).touched < cutoff:
+            self._drop_oldest()
+
+    def _evict_over_budget(self):
+        while self._states and self._bytes > self.max_bytes:
+            self._drop_oldest()
+
+    def get(self, tenant_id: Optional[str], user_id: str) -> Optional[UserState]:
+        return self._states.get((tenant_id or DEFAULT_TENANT, user_id))
+
+    def stats(self) -> Dict[str, int]:
+        return {"users": len(self._states), "bytes": self._bytes, "evicted": self.evicted}
+
+
+_store = FeatureStore()
+
+def get_feature_store() -> FeatureStore:
+    return _store
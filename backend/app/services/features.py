@@ -1,8 +1,10 @@
 from __future__ import annotations
+import heapq
 from dataclasses import dataclass
-from datetime import datetime, timezone
-from typing import List, Optional
-from app.models.schemas import LogEvent, Baseline
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence, Union
+import numpy as np
+from app.models.schemas import LogEvent, LogColumnsInput, Baseline
 
 # 로그 ts 문자열을 datetime(UTC)로 변환
 def _parse_ts(ts: str) -> datetime:
@@ -10,6 +12,14 @@ def _parse_ts(ts: str) -> datetime:
         ts = ts.replace("Z", "+00:00")
     return datetime.fromisoformat(ts).astimezone(timezone.utc)
 
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_US = timedelta(microseconds=1)
+_HOUR_US = 3600 * 1_000_000
+
+# ts 문자열 -> epoch microseconds (정수라서 윈도우 경계 비교가 datetime과 동일)
+def _ts_to_us(ts: str) -> int:
+    return (_parse_ts(ts) - _EPOCH) // _US
+
 # 로그에서 추출한 피처 결과를 담는 컨테이너
 @dataclass
 class ComputedFeatures:
@@ -18,38 +28,210 @@ class ComputedFeatures:
     new_country: bool
     new_device: bool
 
-# LogEvent에 대해 위험 신호 피처 계산
+
+@dataclass
+class LogColumns:
+    """
+    피처 계산에 필요한 필드만 뽑은 컬럼형 로그.
+    - ts_us: epoch microseconds (ts는 한 번만 파싱)
+    - user: actor.user_id 코드, users[code] = user_id
+    - login_fail: action == LOGIN and result == FAIL
+    - country / device_id: 행별 값 (최신 행만 조회하므로 list 그대로)
+    """
+    ts_us: np.ndarray
+    user: np.ndarray
+    users: List[str]
+    login_fail: np.ndarray
+    country: List[Optional[str]]
+    device_id: List[Optional[str]]
+
+    def __len__(self) -> int:
+        return int(len(self.ts_us))
+
+    @classmethod
+    def from_events(cls, logs: Sequence[LogEvent]) -> "LogColumns":
+        codes: Dict[str, int] = {}
+        user = [codes.setdefault(e.actor.user_id, len(codes)) for e in logs]
+        return cls(
+            ts_us=np.array([_ts_to_us(e.ts) for e in logs], dtype=np.int64),
+            user=np.array(user, dtype=np.int64),
+            users=list(codes),
+            login_fail=np.array(
+                [e.action.upper() == "LOGIN" and e.result == "FAIL" for e in logs], dtype=bool
+            ),
+            country=[e.source.country for e in logs],
+            device_id=[e.source.device_id for e in logs],
+        )
+
+    @classmethod
+    def from_input(cls, c: LogColumnsInput) -> "LogColumns":
+        """
+        컬럼형 요청 -> LogColumns (행마다 객체를 만들지 않고 dictionary 코드를 배열 연산으로 변환)
+        코드가 dicts 범위를 벗어나면 ValueError
+        """
+        d = c.dicts
+        for name in ("user_id", "action", "result"):
+            codes = getattr(c, name)
+            if codes and max(codes) >= len(getattr(d, name)):
+                raise ValueError(f"columns.{name} code out of range (dicts.{name} has {len(getattr(d, name))})")
+
+        if c.ts and isinstance(c.ts[0], int):
+            ts_us = np.array(c.ts, dtype=np.int64) * 1000
+        else:
+            ts_us = np.array([_ts_to_us(t) for t in c.ts], dtype=np.int64)
+
+        # dicts.user_id에 같은 문자열이 두 번 있어도 같은 사용자로
+        codes: Dict[str, int] = {}
+        remap = np.array([codes.setdefault(u, len(codes)) for u in d.user_id], dtype=np.int64)
+        is_login = np.array([a.upper() == "LOGIN" for a in d.action], dtype=bool)
+        is_fail = np.array([r == "FAIL" for r in d.result], dtype=bool)
+        action = np.array(c.action, dtype=np.int64)
+        result = np.array(c.result, dtype=np.int64)
+        return cls(
+            ts_us=ts_us,
+            user=remap[np.array(c.user_id, dtype=np.int64)],
+            users=list(codes),
+            login_fail=is_login[action] & is_fail[result],
+            country=_decode(c.country, d.country, "country", len(ts_us)),
+            device_id=_decode(c.device_id, d.device_id, "device_id", len(ts_us)),
+        )
+
+
+# 코드 배열 -> 값 리스트 (컬럼이 없으면 전부 None)
+def _decode(codes: Optional[List[Optional[int]]], values: List[str], name: str, n: int) -> List[Optional[str]]:
+    if codes is None:
+        return [None] * n
+    try:
+        return [None if k is None else values[k] for k in codes]
+    except IndexError:
+        raise ValueError(f"columns.{name} code out of range (dicts.{name} has {len(values)})") from None
+
+
+
+def _compute_groups(
+        cols: LogColumns,
+        group: np.ndarray,
+        n_groups: int,
+        baselines: Sequence[Optional[Baseline]],
+        window_seconds: int,
+) -> List[ComputedFeatures]:
+    """
+    그룹(actor)별 피처를 한 번에 계산.
+    - (group, ts, 입력 순서)로 정렬해서 그룹의 마지막 행 = 최신 이벤트
+    - burst: 최신 시각 - window 이후의 LOGIN FAIL 개수 (bincount)
+    - night: 최신 시각의 UTC hour
+    """
+    n = len(cols)
+    order = np.lexsort((np.arange(n), cols.ts_us, group))
+    g_sorted = group[order]
+    ends = np.flatnonzero(np.r_[g_sorted[1:] != g_sorted[:-1], True])
+    latest_row = order[ends]
+    latest_gid = g_sorted[ends]
+
+    latest_us = np.zeros(n_groups, dtype=np.int64)
+    latest_us[latest_gid] = cols.ts_us[latest_row]
+
+    in_window = cols.login_fail & (latest_us[group] - cols.ts_us <= window_seconds * 1_000_000)
+    burst = np.bincount(group, weights=in_window, minlength=n_groups).astype(np.int64)
+    night = (latest_us // _HOUR_US) % 24 <= 5
+
+    out: List[ComputedFeatures] = [ComputedFeatures(0, False, False, False)] * n_groups
+    for g, row in zip(latest_gid.tolist(), latest_row.tolist()):
+        baseline = baselines[g]
+        country = cols.country[row]
+        device = cols.device_id[row]
+        out[g] = ComputedFeatures(
+            failed_login_burst_count=int(burst[g]),
+            night_access=bool(night[g]),
+            new_country=bool(baseline and country and country not in baseline.country_set()),
+            new_device=bool(baseline and device and device not in baseline.device_set()),
+        )
+    return out
+
+
+# LogEvent에 대해 위험 신호 피처 계산 (요청 전체를 한 actor로 취급)
 def extract_features(logs: List[LogEvent], baseline:Optional[Baseline]) -> ComputedFeatures:
-    if not logs: 
-        return  ComputedFeatures(0, False, False)
-    
-    logs_sorted = sorted(logs, key=lambda x: _parse_ts(x.ts))
-    latest = logs_sorted[-1] # 마지막 로그 가져오기
-    latest_dt = _parse_ts(latest.ts)
-
-    window_seconds = 5 * 60 # 5분
-    burst_fail = 0
-    for e in reversed(logs_sorted):
-        dt = _parse_ts(e.ts)
-        if (latest_dt - dt).total_seconds() > window_seconds:
-            break
+    if not logs:
+        return ComputedFeatures(0, False, False, False)
+    return extract_features_columns(LogColumns.from_events(logs), baseline)
+
+# 컬럼형 로그 전체를 한 actor로 보고 피처 계산
+def extract_features_columns(
+        cols: LogColumns, baseline: Optional[Baseline], window_seconds: int = 5 * 60
+) -> ComputedFeatures:
+    if not len(cols):
+        return ComputedFeatures(0, False, False, False)
+    group = np.zeros(len(cols), dtype=np.int64)
+    return _compute_groups(cols, group, 1, [baseline], window_seconds)[0]
+
+# actor.user_id별 피처를 한 번에 계산 -> {user_id: ComputedFeatures}
+def extract_features_by_actor(
+        logs: Union[Sequence[LogEvent], LogColumns],
+        baselines: Optional[Dict[str, Baseline]] = None,
+        default_baseline: Optional[Baseline] = None,
+        window_seconds: int = 5 * 60,
+) -> Dict[str, ComputedFeatures]:
+    """
+    baselines: user_id별 baseline (없는 user는 default_baseline 사용)
+    """
+    cols = logs if isinstance(logs, LogColumns) else LogColumns.from_events(logs)
+    if not len(cols):
+        return {}
+    baselines = baselines or {}
+    per_group = [baselines.get(u, default_baseline) for u in cols.users]
+    feats = _compute_groups(cols, cols.user, len(cols.users), per_group, window_seconds)
+    return dict(zip(cols.users, feats))
+
+
+class FeatureAccumulator:
+    """
+    이벤트를 하나씩 받아 extract_features와 같은 피처를 계산 (NDJSON 스트리밍용).
+    전체 로그를 들고 있지 않고, 가장 최근 이벤트와
+    최근 5분 윈도우 안의 LOGIN FAIL 시각(min-heap)만 유지한다.
+    """
+    def __init__(self, window_seconds: int = 5 * 60):
+        self.window_seconds = window_seconds
+        self.events = 0
+        self._latest: Optional[LogEvent] = None
+        self._latest_ts: Optional[float] = None
+        self._fails: List[float] = []
+
+    def add(self, e: LogEvent):
+        ts = _parse_ts(e.ts).timestamp()
+        self.events += 1
+
+        # 같은 시각이면 나중에 들어온 이벤트가 최신 (정렬 후 마지막과 동일)
+        if self._latest_ts is None or ts >= self._latest_ts:
+            self._latest = e
+            self._latest_ts = ts
+
         if e.action.upper() == "LOGIN" and e.result == "FAIL":
-            burst_fail += 1
+            if self._latest_ts - ts <= self.window_seconds:
+                heapq.heappush(self._fails, ts)
+
+        # 최신 시각 기준 윈도우 밖으로 밀려난 실패는 버림
+        while self._fails and self._latest_ts - self._fails[0] > self.window_seconds:
+            heapq.heappop(self._fails)
+
+    def result(self, baseline: Optional[Baseline]) -> ComputedFeatures:
+        latest = self._latest
+        if latest is None:
+            return ComputedFeatures(0, False, False, False)
 
-    hour = latest_dt.hour
-    night = 0 <= hour <= 5
+        hour = datetime.fromtimestamp(self._latest_ts, tz=timezone.utc).hour
+        night = 0 <= hour <= 5
 
-    new_country = False
-    if baseline and latest.source.country:
-        new_country = latest.source.country not in set(baseline.known_countries)
+        new_country = False
+        if baseline and latest.source.country:
+            new_country = latest.source.country not in baseline.country_set()
 
-    new_device = False
-    if baseline and latest.source.device_id:
-        new_device = latest.source.device_id not in set(baseline.known_devices)
+        new_device = False
+        if baseline and latest.source.device_id:
+            new_device = latest.source.device_id not in baseline.device_set()
 
-    return ComputedFeatures(
-        failed_login_burst_count=burst_fail,
-        night_access=night,
-        new_country=new_country,
-        new_device=new_device,
-    )
\ No newline at end of file
+        return ComputedFeatures(
+            failed_login_burst_count=len(self._fails),
+            night_access=night,
+            new_country=new_country,
+            new_device=new_device,
+        )
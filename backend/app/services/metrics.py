@@ -0,0 +1,225 @@
+from __future__ import annotations
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# 요청 단위 stage 타이밍 + Prometheus text format histogram (외부 의존성 없이 직접 구현)
+
+# latency histogram bucket (초)
+LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+# analyze 파이프라인 stage 이름 (debug/metrics 공통)
+STAGES = (
+    "validation", "cache", "features", "scoring", "query_build", "evidence_table",
+    "embedding", "vector_search", "bm25", "fusion", "dedupe", "serialization",
+)
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str], buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # labels -> [bucket별 count..., +Inf count], sum
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][i] += 1
+            series[1][0] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, (list(c), s[0])) for k, (c, s) in self._series.items())
+        for key, (counts, total) in items:
+            base = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(self.labelnames, key))
+            sep = "," if base else ""
+            cum = 0
+            for le, c in zip(self.buckets, counts):
+                cum += c
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="{le:g}"}} {cum}')
+            cum += counts[-1]
+            lines.append(f'{self.name}_bucket{{{base}{sep}le="+Inf"}} {cum}')
+            lines.append(f"{self.name}_sum{{{base}}} {total:.9g}")
+            lines.append(f"{self.name}_count{{{base}}} {cum}")
+        return lines
+
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+STAGE_SECONDS = Histogram(
+    "logwatch_stage_duration_seconds",
+    "analyze pipeline stage latency",
+    ("stage", "endpoint", "mode", "decision"),
+)
+REQUEST_SECONDS = Histogram(
+    "logwatch_request_duration_seconds",
+    "analyze request latency (middleware, includes body read and serialization)",
+    ("endpoint", "mode", "decision"),
+)
+REGISTRY: List[Histogram] = [STAGE_SECONDS, REQUEST_SECONDS]
+
+
+def render_prometheus() -> str:
+    lines: List[str] = []
+    for h in REGISTRY:
+        lines.extend(h.render())
+    return "\n".join(lines) + "\n"
+
+
+class StageTimings:
+    """
+    요청 하나의 stage별 소요 시간 (같은 stage가 여러 번이면 합산, 예: query별 embedding).
+    - validation: 요청 수신 ~ 핸들러 시작 (body 수신 + JSON 파싱 + pydantic 검증)
+    - serialization: 핸들러 반환 ~ 응답 시작 (response_model 직렬화)
+    """
+    def __init__(self, endpoint: str):
+        self.t0 = time.perf_counter()
+        self.endpoint = endpoint
+        self.mode = ""
+        self.decision = ""
+        self.seconds: Dict[str, float] = {}
+        self._handler_end: Optional[float] = None
+        # deadline 검색처럼 다른 스레드가 기록하는 중에 합산(merge)할 수 있으므로
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float):
+        with self._lock:
+            self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+
+    def snapshot(self) -> Dict[str, float]:
+        # 지금까지 기록된 stage 시간의 복사본 (기록 중인 스레드와 겹쳐도 일관된 값)
+        with self._lock:
+            return dict(self.seconds)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - t)
+
+    def merge(self, other: "StageTimings"):
+        # 다른 스레드에서 따로 잰 stage 시간을 합산 (그 시점의 snapshot만, 진행 중인 stage는 빠짐)
+        for name, sec in other.snapshot().items():
+            self.add(name, sec)
+
+    def begin_handler(self):
+        self.add("validation", time.perf_counter() - self.t0)
+
+    def end_handler(self, mode: str, decision: str):
+        self.mode = mode
+        self.decision = decision
+        self._handler_end = time.perf_counter()
+
+    def response_started(self):
+        if self._handler_end is not None:
+            self.add("serialization", time.perf_counter() - self._handler_end)
+
+    def as_ms(self) -> Dict[str, float]:
+        return {k: round(v * 1e3, 3) for k, v in self.seconds.items()}
+
+    def observe(self, status: int):
+        # 핸들러까지 못 간 요청(검증 실패 등)은 request histogram에만 기록
+        decision = self.decision or ("error" if status >= 400 else "")
+        labels = {"endpoint": self.endpoint, "mode": self.mode or "unknown", "decision": decision}
+        REQUEST_SECONDS.observe(time.perf_counter() - self.t0, **labels)
+        if self._handler_end is None:
+            return
+        for name, sec in self.seconds.items():
+            STAGE_SECONDS.observe(sec, stage=name, **labels)
+
+
+_current: ContextVar[Optional[StageTimings]] = ContextVar("logwatch_stage_timings", default=None)
+
+
+def current_timings() -> Optional[StageTimings]:
+    return _current.get()
+
+
+@contextmanager
+def use_timings(t: Optional[StageTimings]) -> Iterator[None]:
+    """이 블록 안의 stage()를 t에 기록 (요청과 분리된 스레드에서 잴 때)"""
+    token = _current.set(t)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """현재 요청의 StageTimings에 기록 (요청 밖이면 측정 없이 실행)"""
+    t = _current.get()
+    if t is None:
+        yield
+        return
+    with t.stage(name):
+        yield
+
+
+# route에 매칭되지 않은 요청의 endpoint label
+UNMATCHED_ENDPOINT = "unmatched"
+
+
+def _endpoint_label(scope) -> str:
+    """
+    라우팅 후 매칭된 route의 경로 템플릿.
+    include_router prefix가 route.path에 빠지는 FastAPI 버전이 있으므로,
+    path parameter가 없는 route면 매칭된 요청 경로(= 템플릿)를 그대로 쓴다.
+    """
+    path = getattr(scope.get("route"), "path", None)
+    if path is None:
+        return UNMATCHED_ENDPOINT
+    return scope["path"] if "{" not in path else path
+
+
+class StageTimingMiddleware:
+    """
+    prefix 아래 요청마다 StageTimings를 만들어 contextvar에 넣고,
+    응답이 끝나면 histogram에 기록 (pure ASGI middleware라 응답 스트리밍을 막지 않음).
+    endpoint label은 라우팅 후 scope["route"]의 경로 템플릿, 매칭되는 route가 없으면(404) "unmatched"
+    (요청 경로를 그대로 쓰면 임의 경로마다 series가 늘어남)
+    """
+    def __init__(self, app, prefix: str = "/api/analyze"):
+        self.app = app
+        self.prefix = prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefix):
+            await self.app(scope, receive, send)
+            return
+
+        timings = StageTimings(UNMATCHED_ENDPOINT)
+        token = _current.set(timings)
+        status = 500
+
+        async def _send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                timings.response_started()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            _current.reset(token)
+            timings.endpoint = _endpoint_label(scope)
+            timings.observe(status)
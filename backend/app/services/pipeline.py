@@ -0,0 +1,102 @@
+from __future__ import annotations
+from typing import Dict, List, Optional, Tuple, Union
+
+from app.models.schemas import AnalyzeResponse, AnalyzeSummary, Evidence
+from app.services.scoring import score_risk_batch
+from app.services.metrics import stage
+from app.rag.queries import build_retrieval_queries
+from app.rag.runtime import get_retriever
+
+# features 이후 공통 파이프라인 (scoring -> query 생성 -> 검색 -> guardrail)
+# /api/analyze* 라우트와 로그 tail worker가 같이 사용
+
+
+# evidence/debug를 붙이고 guardrail 적용해서 최종 응답 생성
+def build_response(
+        request_id: Optional[str],
+        mode: str,
+        summary: AnalyzeSummary,
+        signals, actions,
+        evidence: List[Evidence],
+        debug: Optional[dict],
+) -> AnalyzeResponse:
+    debug = debug or {}
+    debug["mode"] = mode
+
+    # guardrail : evidence 없으면 추측 기반 escalation 금지
+    if not evidence and summary.decision == "ESCALATE":
+        summary.decision = "REVIEW"
+    debug["guardrail_no_evidence"] = (not evidence)
+
+    return AnalyzeResponse(
+        request_id=request_id,
+        summary=summary,
+        signals=signals,
+        recommended_actions=actions,
+        evidence=evidence,
+        debug=debug,
+    )
+
+
+def score_and_retrieve_shared(
+        items, deadline_ms: Union[None, float, List[Optional[float]]] = None
+) -> List[Tuple]:
+    """
+    items: [(mode, features, tenant_id)] -> [(mode, summary, signals, actions, evidence, debug)]
+    deadline_ms: 검색 latency budget. 숫자면 모든 항목, 리스트면 항목별 (None이면 제한 없음)
+      - 검색 그룹의 budget은 그 그룹에 속한 항목들의 budget 중 가장 짧은 값
+      - 모든 그룹이 같은 시작 시각부터 동시에 검색 (그룹 수만큼 budget이 늘어나지 않음)
+    - 점수는 tenant별 rule set으로 한 번에 계산
+    - signal 조합이 같으면 query 생성은 한 번만
+    - (tenant, mode, queries)가 같은 항목끼리는 retrieve를 한 번만 수행하고 evidence 재사용
+    """
+    scored = []
+    queries_by_signals: Dict[Tuple[str, ...], List[str]] = {}
+    groups: Dict[Tuple[Optional[str], str, Tuple[str, ...]], List[int]] = {}
+
+    by_tenant: Dict[Optional[str], List[int]] = {}
+    for i, (_, _, tenant_id) in enumerate(items):
+        by_tenant.setdefault(tenant_id, []).append(i)
+    results: List[Optional[Tuple]] = [None] * len(items)
+    with stage("scoring"):
+        for tenant_id, idxs in by_tenant.items():
+            for i, r in zip(idxs, score_risk_batch([items[i][1] for i in idxs], tenant_id)):
+                results[i] = r
+
+    # 1) 점수 + signals -> queries (signal 조합 단위로 재사용)
+    with stage("query_build"):
+        for i, (mode, _, tenant_id) in enumerate(items):
+            summary, signals, actions = results[i]
+
+            sig_key = tuple(s.key for s in signals)
+            if sig_key not in queries_by_signals:
+                queries_by_signals[sig_key] = build_retrieval_queries(signals)
+            queries = queries_by_signals[sig_key]
+
+            scored.append((mode, summary, signals, actions))
+            groups.setdefault((tenant_id, mode, tuple(queries)), []).append(i)
+
+    # 2) 서로 다른 (tenant, mode, queries) 조합마다 한 번만 검색, 결과는 입력 순서대로 (debug는 항목마다 복사)
+    # retriever를 먼저 모두 만들어 두고 (처음 로딩 시간이 budget에 들어가지 않도록) 그룹 검색을 동시에 실행
+    if not isinstance(deadline_ms, list):
+        deadline_ms = [deadline_ms] * len(items)
+    retrievers = {(tenant_id, mode): get_retriever(mode, tenant_id) for tenant_id, mode, _ in groups}
+    jobs = []
+    for (tenant_id, mode, queries), idxs in groups.items():
+        budgets = [deadline_ms[i] for i in idxs if deadline_ms[i] is not None]
+        jobs.append((retrievers[(tenant_id, mode)], list(queries), min(budgets) if budgets else None))
+    # retriever 모듈은 무거우므로 get_retriever가 이미 불러온 뒤에 import
+    from app.rag.retriever import retrieve_concurrently
+    found = retrieve_concurrently(jobs)
+
+    out: List[Optional[Tuple]] = [None] * len(items)
+    for idxs, (evidence, debug) in zip(groups.values(), found):
+        for i in idxs:
+            req_debug = dict(debug or {})
+            req_debug["batch"] = {
+                "size": len(items),
+                "retrieval_groups": len(groups),
+                "shared_with": len(idxs),
+            }
+            out[i] = (*scored[i], list(evidence), req_debug)
+    return out
@@ -0,0 +1,144 @@
+from __future__ import annotations
+import hashlib
+import io
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+# 정책 문서 페이지 단위 서빙: 페이지 추출 결과를 파일 해시 기준으로 디스크에 캐시
+
+APP_DIR = Path(__file__).resolve().parents[1]
+POLICY_PAGE_CACHE_DIR = APP_DIR / "data" / "cache" / "policy_pages"
+
+# 캐시 디렉토리 최대 크기 -> 넘으면 오래 안 쓴(mtime) 파일부터 삭제
+POLICY_PAGE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+PAGE_FORMATS = ("pdf", "text")
+
+_HASH_READ_BYTES = 1024 * 1024
+
+
+class PageNotFound(Exception):
+    """요청한 페이지가 문서 범위 밖"""
+
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_READ_BYTES), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class PolicyPageCache:
+    """
+    - content_hash(path): 파일 내용 sha256 (mtime/size가 같으면 다시 읽지 않음) -> strong ETag
+    - page(path, n, fmt): n번째(1-based) 페이지의 단일 페이지 PDF 또는 추출 텍스트 (bytes)
+      캐시 키가 파일 해시라서 문서가 바뀌면 자연스럽게 새 키를 쓰고, 이전 항목은 용량 초과 시 정리된다.
+    여러 워커가 같은 디렉토리를 써도 되도록 임시 파일에 쓴 뒤 os.replace로 교체.
+    """
+    def __init__(self, cache_dir: Path = POLICY_PAGE_CACHE_DIR, max_bytes: int = POLICY_PAGE_CACHE_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # path -> (mtime_ns, size, sha256)
+        self._hashes: Dict[str, Tuple[int, int, str]] = {}
+        # 캐시 디렉토리 총 크기 (처음 쓸 때 한 번 스캔, 이후 쓰기/삭제로 갱신)
+        self._total: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+
+    def content_hash(self, path: Path, st: Optional[os.stat_result] = None) -> str:
+        st = st or path.stat()
+        key = str(path)
+        cached = self._hashes.get(key)
+        if cached is not None and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            return cached[2]
+        sha = file_sha256(path)
+        self._hashes[key] = (st.st_mtime_ns, st.st_size, sha)
+        return sha
+
+    def page(self, path: Path, n: int, fmt: str, sha: Optional[str] = None) -> bytes:
+        if fmt not in PAGE_FORMATS:
+            raise ValueError(f"unknown page format: {fmt}")
+        sha = sha or self.content_hash(path)
+        out = self.cache_dir / f"{sha}-{n}.{'pdf' if fmt == 'pdf' else 'txt'}"
+        try:
+            # LRU: 읽을 때 mtime 갱신 (다른 워커가 방금 지웠으면 miss로 처리)
+            data = out.read_bytes()
+            os.utime(out)
+            self.hits += 1
+            return data
+        except FileNotFoundError:
+            pass
+
+        self.misses += 1
+        data = _extract_page(path, n, fmt)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp = out.with_name(f"{out.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, out)
+        self._account(len(data))
+        return data
+
+    def _account(self, added: int):
+        with self._lock:
+            if self._total is None:
+                self._total = sum(p.stat().st_size for p in self.cache_dir.glob("*-*.*") if p.is_file())
+            else:
+                self._total += added
+            if self._total <= self.max_bytes:
+                return
+            # 다른 워커가 쓴 파일도 있으므로 초과 시에는 디렉토리를 다시 스캔
+            entries = []
+            for p in self.cache_dir.iterdir():
+                if p.suffix == ".tmp":
+                    continue
+                try:
+                    st = p.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime_ns, st.st_size, p))
+            entries.sort()
+            total = sum(size for _, size, _ in entries)
+            for _, size, p in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    p.unlink()
+                except FileNotFoundError:
+                    pass
+                total -= size
+            self._total = total
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "bytes": self._total or 0}
+
+
+def _extract_page(path: Path, n: int, fmt: str) -> bytes:
+    if path.suffix.lower() != ".pdf":
+        # 텍스트 문서는 페이지 구분이 없으므로 1페이지 = 전체
+        if n != 1 or fmt != "text":
+            raise PageNotFound(f"{path.name} has no page {n} ({fmt})")
+        return path.read_bytes()
+
+    from pypdf import PdfReader, PdfWriter
+
+    reader = PdfReader(str(path))
+    if not 1 <= n <= len(reader.pages):
+        raise PageNotFound(f"{path.name} has {len(reader.pages)} pages")
+    page = reader.pages[n - 1]
+    if fmt == "text":
+        return (page.extract_text() or "").encode("utf-8")
+    writer = PdfWriter()
+    writer.add_page(page)
+    buf = io.BytesIO()
+    writer.write(buf)
+    return buf.getvalue()
+
+
+_cache = PolicyPageCache()
+
+def get_policy_page_cache() -> PolicyPageCache:
+    return _cache
@@ -0,0 +1,186 @@
+from __future__ import annotations
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+from app.models.schemas import AnalyzeColumnsRequest, AnalyzeRequest
+
+# /analyze 응답 캐시 (같은 logs + context + tenant + 인덱스/규칙 버전이면 같은 응답)
+RESPONSE_CACHE_ENABLED = True
+RESPONSE_CACHE_TTL_SECONDS = 60.0
+RESPONSE_CACHE_MAX_ENTRIES = 10_000
+RESPONSE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# 같은 key를 계산 중인 요청을 기다리는 최대 시간 (넘으면 직접 계산)
+RESPONSE_CACHE_WAIT_SECONDS = 30.0
+
+
+def analyze_cache_key(
+        req: Union[AnalyzeRequest, AnalyzeColumnsRequest],
+        mode: str,
+        index_version: Optional[str],
+        rules_version: str,
+) -> str:
+    """
+    요청 내용의 canonical hash.
+    - request_id는 제외 (응답에서만 바꿔 끼움)
+    - logs(또는 columns)는 모델 필드 순서로 직렬화하므로 입력 JSON의 key 순서/공백과 무관
+    - context는 dict(baselines)가 있어서 key 정렬 후 직렬화
+    - 인덱스/규칙이 바뀌면 key도 바뀌어 이전 응답을 쓰지 않는다
+    - context.deadline_ms는 제외 (budget 안에 끝난 응답만 저장하므로 결과가 같음)
+    """
+    h = hashlib.sha256()
+    h.update(json.dumps(
+        [req.tenant_id, mode, index_version, rules_version], separators=(",", ":")
+    ).encode("utf-8"))
+    h.update(b"\0")
+    h.update(req.model_dump_json(include={"logs", "columns"}).encode("utf-8"))
+    h.update(b"\0")
+    if req.context is not None:
+        ctx = req.context.model_dump(mode="json", exclude_none=True, exclude={"deadline_ms"})
+        h.update(json.dumps(ctx, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8"))
+    return h.hexdigest()
+
+
+class _Flight:
+    __slots__ = ("event", "value", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class ResponseCache:
+    """
+    TTL + LRU + 메모리 상한 캐시, 같은 key 동시 요청은 single-flight로 합침.
+    get_or_compute(key, compute) -> (value, status)
+    - status: "hit" (캐시), "coalesced" (계산 중이던 요청의 결과를 기다려 받음), "miss" (직접 계산)
+    값은 응답 간에 공유되므로 호출 측에서 수정하지 않는다 (model_copy로 바꿔 끼움).
+    """
+    def __init__(
+            self,
+            *,
+            ttl_seconds: float = RESPONSE_CACHE_TTL_SECONDS,
+            max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+            max_bytes: int = RESPONSE_CACHE_MAX_BYTES,
+            wait_seconds: float = RESPONSE_CACHE_WAIT_SECONDS,
+            size_of: Callable[[Any], int] = lambda v: len(v.model_dump_json()),
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.wait_seconds = wait_seconds
+        self.size_of = size_of
+        self._lock = threading.Lock()
+        # key -> (value, size, 저장 시각)
+        self._entries: "OrderedDict[str, Tuple[Any, int, float]]" = OrderedDict()
+        self._inflight: Dict[str, _Flight] = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def _get(self, key: str, now: float) -> Optional[Tuple[Any, float]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, size, stored = entry
+        if now - stored > self.ttl_seconds:
+            del self._entries[key]
+            self.bytes -= size
+            return None
+        self._entries.move_to_end(key)
+        return value, stored
+
+    def _put(self, key: str, value: Any, now: float):
+        size = self.size_of(value)
+        if size > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.bytes -= old[1]
+        self._entries[key] = (value, size, now)
+        self.bytes += size
+        while self._entries and (len(self._entries) > self.max_entries or self.bytes > self.max_bytes):
+            _, (_, s, _) = self._entries.popitem(last=False)
+            self.bytes -= s
+            self.evictions += 1
+
+    def get_or_compute(
+            self,
+            key: str,
+            compute: Callable[[], Any],
+            should_store: Optional[Callable[[Any], bool]] = None,
+            wait_seconds: Optional[float] = None,
+    ) -> Tuple[Any, str, float]:
+        """
+        -> (value, status, 캐시된 지 몇 초)
+        should_store(value)가 False면 저장하지 않음 (기다리던 동시 요청에는 그대로 전달)
+        wait_seconds: 같은 key 계산을 기다리는 최대 시간 (호출자의 남은 budget, self.wait_seconds를 넘지 않음)
+        """
+        now = time.monotonic()
+        with self._lock:
+            found = self._get(key, now)
+            if found is not None:
+                self.hits += 1
+                return found[0], "hit", now - found[1]
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+                self.misses += 1
+
+        if not leader:
+            wait = self.wait_seconds if wait_seconds is None else min(self.wait_seconds, wait_seconds)
+            if flight.event.wait(wait):
+                if flight.error is not None:
+                    raise flight.error
+                with self._lock:
+                    self.coalesced += 1
+                return flight.value, "coalesced", 0.0
+            # 먼저 온 요청이 너무 오래 걸리면 직접 계산 (캐시에는 넣지 않음, compute가 남은 budget을 반영)
+            with self._lock:
+                self.misses += 1
+            return compute(), "miss", 0.0
+
+        try:
+            value = compute()
+        except BaseException as e:
+            flight.error = e
+            raise
+        else:
+            flight.value = value
+            if should_store is None or should_store(value):
+                with self._lock:
+                    self._put(key, value, time.monotonic())
+            return value, "miss", 0.0
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.event.set()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+
+_cache = ResponseCache()
+
+def get_response_cache() -> ResponseCache:
+    return _cache
@@ -0,0 +1,244 @@
+from __future__ import annotations
+import dataclasses
+import hashlib
+import operator
+import re
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import yaml
+
+from app.models.schemas import Signal, ActionItem, AnalyzeSummary
+from app.services.features import ComputedFeatures
+
+# 규칙 파일 위치: default.yaml + tenant별 <tenant_id>.yaml
+RULES_DIR = Path(__file__).resolve().parents[1] / "data" / "rules"
+DEFAULT_RULESET = "default"
+
+# 파일 변경 확인(stat) 간격 -> 요청마다 stat 하지 않음
+RULES_RELOAD_CHECK_SECONDS = 1.0
+
+FEATURE_NAMES: Tuple[str, ...] = tuple(f.name for f in dataclasses.fields(ComputedFeatures))
+_feature_row = operator.attrgetter(*FEATURE_NAMES)
+
+_OPS: Dict[str, Callable[[Any, Any], Any]] = {
+    ">=": operator.ge,
+    ">": operator.gt,
+    "<=": operator.le,
+    "<": operator.lt,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+_TENANT_RE = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+@dataclass(frozen=True)
+class CompiledRule:
+    key: str
+    col: int                                  # feature 행렬의 열 번호
+    conds: Tuple[Tuple[Callable, float], ...]  # (op, value), 비어 있으면 feature != 0
+    base: float
+    per_unit: float
+    w_min: Optional[float]
+    w_max: Optional[float]
+    value: Any                                # None이면 feature 값 그대로
+    reason: str
+    action: ActionItem                        # 응답 간에 공유 (읽기 전용)
+
+
+def _compile_rule(i: int, raw: Dict[str, Any]) -> CompiledRule:
+    where = f"rules[{i}]"
+    key = raw.get("key")
+    feature = raw.get("feature")
+    if not key or feature not in FEATURE_NAMES:
+        raise ValueError(f"{where}: key/feature required (feature must be one of {FEATURE_NAMES})")
+
+    conds = []
+    for c in raw.get("when") or []:
+        op = _OPS.get(str(c.get("op")))
+        if op is None:
+            raise ValueError(f"{where}: unknown op {c.get('op')!r}")
+        conds.append((op, float(c["value"])))
+
+    weight = raw.get("weight", 0)
+    if isinstance(weight, dict):
+        base = float(weight.get("base", 0))
+        per_unit = float(weight.get("per_unit", 0))
+        w_min, w_max = weight.get("min"), weight.get("max")
+    else:
+        base, per_unit, w_min, w_max = float(weight), 0.0, None, None
+
+    # pydantic 검증은 컴파일 시 한 번만
+    action = ActionItem(**raw["action"])
+    Signal(key=key, value=raw.get("value"), weight=0, reason=raw["reason"])
+
+    return CompiledRule(
+        key=key,
+        col=FEATURE_NAMES.index(feature),
+        conds=tuple(conds),
+        base=base,
+        per_unit=per_unit,
+        w_min=None if w_min is None else float(w_min),
+        w_max=None if w_max is None else float(w_max),
+        value=raw.get("value"),
+        reason=raw["reason"],
+        action=action,
+    )
+
+
+class RuleSet:
+    """
+    YAML 규칙을 컴파일한 평가기.
+    - evaluate(rows): feature 행렬 [n, n_features]에 대해 규칙별 발동 여부/가중치를 numpy로 한 번에 계산
+    - score(features_list): score_risk와 같은 (summary, signals, actions) 목록
+    """
+    def __init__(self, name: str, spec: Dict[str, Any], version: str):
+        self.name = name
+        self.version = version
+        self.rules: List[CompiledRule] = [_compile_rule(i, r) for i, r in enumerate(spec.get("rules") or [])]
+
+        levels = sorted(spec.get("levels") or [], key=lambda x: x["min_score"], reverse=True)
+        if not levels:
+            raise ValueError("levels required")
+        for lv in levels:
+            AnalyzeSummary(risk_score=0, risk_level=lv["level"], decision=lv["decision"])
+        # 오름차순 cut-off (searchsorted용)
+        self._cuts = np.array([lv["min_score"] for lv in reversed(levels)], dtype=np.float64)
+        self._levels = [(lv["level"], lv["decision"]) for lv in reversed(levels)]
+        # (rule, value, weight) -> Signal. 같은 결과는 행/요청 간에 같은 객체를 공유 (읽기 전용으로만 사용)
+        self._signal_cache: Dict[Tuple[int, type, Any, int], Signal] = {}
+
+    @classmethod
+    def from_yaml(cls, name: str, text: str) -> "RuleSet":
+        spec = yaml.safe_load(text) or {}
+        version = hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+        return cls(name, spec, version)
+
+    @staticmethod
+    def to_matrix(features: Sequence[ComputedFeatures]) -> np.ndarray:
+        return np.array([_feature_row(f) for f in features], dtype=np.float64).reshape(
+            len(features), len(FEATURE_NAMES)
+        )
+
+    def evaluate(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """X: [n, n_features] -> (fired [n, n_rules] bool, weights [n, n_rules] int)"""
+        n = X.shape[0]
+        fired = np.zeros((n, len(self.rules)), dtype=bool)
+        weights = np.zeros((n, len(self.rules)), dtype=np.int64)
+        for j, r in enumerate(self.rules):
+            x = X[:, r.col]
+            if r.conds:
+                m = np.ones(n, dtype=bool)
+                for op, v in r.conds:
+                    m &= op(x, v)
+            else:
+                m = x != 0
+            w = r.base + r.per_unit * x
+            if r.w_min is not None or r.w_max is not None:
+                w = np.clip(w, r.w_min, r.w_max)
+            fired[:, j] = m
+            weights[:, j] = np.where(m, np.rint(w), 0)
+        return fired, weights
+
+    def score(
+            self, features: Sequence[ComputedFeatures]
+    ) -> List[Tuple[AnalyzeSummary, List[Signal], List[ActionItem]]]:
+        if not features:
+            return []
+        fired, weights = self.evaluate(self.to_matrix(features))
+        scores = weights.sum(axis=1).tolist()
+        level_idx = np.maximum(np.searchsorted(self._cuts, scores, side="right") - 1, 0).tolist()
+
+        # 발동한 (row, rule) 조합만 순회. 컴파일 시 검증했으므로 model_construct (행마다 검증 생략)
+        signals: List[List[Signal]] = [[] for _ in features]
+        actions: List[List[ActionItem]] = [[] for _ in features]
+        cache = self._signal_cache
+        rows, cols = np.nonzero(fired)
+        for i, j, w in zip(rows.tolist(), cols.tolist(), weights[rows, cols].tolist()):
+            r = self.rules[j]
+            value = getattr(features[i], FEATURE_NAMES[r.col]) if r.value is None else r.value
+            key = (j, type(value), value, w)
+            sig = cache.get(key)
+            if sig is None:
+                sig = Signal.model_construct(key=r.key, value=value, weight=w, reason=r.reason)
+                if len(cache) < 4096:
+                    cache[key] = sig
+            signals[i].append(sig)
+            actions[i].append(r.action)
+
+        out = []
+        for i in range(len(features)):
+            level, decision = self._levels[level_idx[i]]
+            summary = AnalyzeSummary(risk_score=scores[i], risk_level=level, decision=decision)
+            out.append((summary, signals[i], actions[i]))
+        return out
+
+
+class RuleRegistry:
+    """
+    rule set 캐시 + hot reload.
+    - tenant_id.yaml이 있으면 그 규칙, 없으면 default.yaml
+    - RULES_RELOAD_CHECK_SECONDS마다 mtime/size를 확인해서 바뀌었으면 다시 컴파일
+    - 다시 읽은 파일이 잘못되었으면 이전 규칙을 계속 쓰고 error에 기록
+    """
+    def __init__(self, rules_dir: Path = RULES_DIR, check_seconds: float = RULES_RELOAD_CHECK_SECONDS):
+        self.rules_dir = Path(rules_dir)
+        self.check_seconds = check_seconds
+        self._lock = threading.Lock()
+        # name -> (RuleSet, (mtime_ns, size), 마지막 확인 시각)
+        self._cache: Dict[str, Tuple[RuleSet, Tuple[int, int], float]] = {}
+        self.errors: Dict[str, str] = {}
+
+    def _path(self, name: str) -> Path:
+        return self.rules_dir / f"{name}.yaml"
+
+    def _load(self, name: str) -> Optional[RuleSet]:
+        path = self._path(name)
+        now = time.monotonic()
+        cached = self._cache.get(name)
+        if cached is not None and now - cached[2] < self.check_seconds:
+            return cached[0]
+
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            self._cache.pop(name, None)
+            return None
+        stamp = (st.st_mtime_ns, st.st_size)
+        if cached is not None and cached[1] == stamp:
+            self._cache[name] = (cached[0], stamp, now)
+            return cached[0]
+
+        try:
+            ruleset = RuleSet.from_yaml(name, path.read_text(encoding="utf-8"))
+        except Exception as e:
+            self.errors[name] = f"{type(e).__name__}: {e}"
+            if cached is None:
+                raise
+            self._cache[name] = (cached[0], stamp, now)
+            return cached[0]
+        self.errors.pop(name, None)
+        self._cache[name] = (ruleset, stamp, now)
+        return ruleset
+
+    def get(self, tenant_id: Optional[str] = None) -> RuleSet:
+        with self._lock:
+            if tenant_id and _TENANT_RE.match(tenant_id) and tenant_id != DEFAULT_RULESET:
+                ruleset = self._load(tenant_id)
+                if ruleset is not None:
+                    return ruleset
+            ruleset = self._load(DEFAULT_RULESET)
+            if ruleset is None:
+                raise FileNotFoundError(f"rules file not found: {self._path(DEFAULT_RULESET)}")
+            return ruleset
+
+
+_registry = RuleRegistry()
+
+def get_rule_registry() -> RuleRegistry:
+    return _registry
@@ -0,0 +1,19 @@
+from __future__ import annotations
+from typing import List, Optional, Sequence, Tuple
+from app.models.schemas import Signal, ActionItem, AnalyzeSummary
+from app.services.features import ComputedFeatures
+from app.services.rules import get_rule_registry
+
+# 규칙/가중치/구간/조치 문구는 app/data/rules/*.yaml 에 정의 (services/rules.py가 컴파일)
+
+# 피처를 기반으로 위험 점수/등급/결정과 signals, recommended_actions 생성
+def score_risk(
+        features: ComputedFeatures, tenant_id: Optional[str] = None
+) -> Tuple[AnalyzeSummary, List[Signal], List[ActionItem]]:
+    return score_risk_batch([features], tenant_id)[0]
+
+# 여러 피처 행을 한 번에 점수화 (규칙은 행렬 단위로 평가)
+def score_risk_batch(
+        features: Sequence[ComputedFeatures], tenant_id: Optional[str] = None
+) -> List[Tuple[AnalyzeSummary, List[Signal], List[ActionItem]]]:
+    return get_rule_registry().get(tenant_id).score(features)
@@ -0,0 +1,328 @@
+from __future__ import annotations
+import argparse
+import json
+import os
+import signal
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from pydantic import TypeAdapter, ValidationError
+
+from app.models.schemas import ActorAnalyzeResponse, LogEvent
+from app.services.features import extract_features_by_actor
+from app.services.feature_store import get_feature_store
+from app.services.pipeline import build_response, score_and_retrieve_shared
+
+# 로컬 JSONL 접근 로그를 tail 해서 HTTP 없이 분석하는 worker
+# python -m app.services.tail_worker --out decisions.jsonl /var/log/auth/*.jsonl
+
+# 한 번에 읽는 최대 바이트 (완성된 줄까지만 처리, 나머지는 다음 read에서)
+TAIL_READ_BYTES = 8 * 1024 * 1024
+
+# 새 데이터가 없을 때 다음 확인까지 대기
+TAIL_POLL_SECONDS = 1.0
+
+_EVENTS = TypeAdapter(List[LogEvent])
+
+
+class TailedFile:
+    """
+    파일 하나의 읽기 위치.
+    - (dev, ino)로 파일을 식별 -> 경로의 inode가 바뀌면 rotation(rename)으로 보고
+      이전 파일을 끝까지 읽은 뒤 새 파일을 처음부터 읽는다
+    - 같은 inode인데 크기가 offset보다 작아지면 truncate(copytruncate)로 보고 처음부터
+    - offset은 항상 줄 경계 (마지막 줄이 아직 다 안 써졌으면 다음 read에서 다시 읽음)
+    """
+    def __init__(self, path: Path, dev: Optional[int] = None, ino: Optional[int] = None, offset: int = 0):
+        self.path = path
+        self.dev = dev
+        self.ino = ino
+        self.offset = offset
+        self._f = None
+        # rotation 직후 아직 다 못 읽은 이전 파일 [handle, dev, ino, offset]
+        self._rotated: Optional[list] = None
+        # 마지막 read 결과 (이전 파일 여부, 끝 offset) -> commit()에서 반영
+        self._pending: Optional[Tuple[bool, int]] = None
+        self.rotations = 0
+
+    def checkpoint(self) -> Dict[str, int]:
+        # 이전 파일을 읽는 중이면 그 위치를 저장 -> 재시작 시 형제 파일에서 찾아 이어서 읽음
+        if self._rotated is not None:
+            _, dev, ino, offset = self._rotated
+            return {"dev": dev, "ino": ino, "offset": offset}
+        return {"dev": self.dev, "ino": self.ino, "offset": self.offset}
+
+    def _open(self) -> bool:
+        try:
+            f = open(self.path, "rb", buffering=0)
+        except FileNotFoundError:
+            return False
+        st = os.fstat(f.fileno())
+        if self.ino is not None and (st.st_dev, st.st_ino) != (self.dev, self.ino):
+            # 중단된 사이에 rotation -> checkpoint의 파일을 형제 파일(app.jsonl.1 등)에서 찾아 남은 부분부터
+            old = _find_rotated(self.path, self.dev, self.ino)
+            if old is not None:
+                self._rotated = [old, self.dev, self.ino, self.offset]
+            self.offset = 0
+            self.rotations += 1
+        self.dev, self.ino = st.st_dev, st.st_ino
+        self._f = f
+        return True
+
+    def _check_rotation(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        if (st.st_dev, st.st_ino) != (self.dev, self.ino):
+            self._rotated = [self._f, self.dev, self.ino, self.offset]
+            self._f = None
+            self.offset = 0
+            self.ino = None
+            self.rotations += 1
+            self._open()
+        elif st.st_size < self.offset:
+            self.offset = 0
+
+    def read(self, max_bytes: int = TAIL_READ_BYTES) -> Tuple[bytes, int]:
+        """
+        -> (완성된 줄들, 시작 offset). commit()을 호출해야 읽은 위치가 확정된다.
+        rotation된 이전 파일이 남아 있으면 그것부터 끝까지 읽는다.
+        """
+        self._pending = None
+        if self._rotated is None:
+            if self._f is None and not self._open():
+                return b"", self.offset
+            if self._rotated is None:
+                self._check_rotation()
+
+        if self._rotated is not None:
+            f, _, _, off = self._rotated
+            data, end = _read_lines(f, off, max_bytes)
+            if data:
+                self._pending = (True, end)
+                return data, off
+            # 이전 파일을 다 읽음 -> 새 파일로
+            f.close()
+            self._rotated = None
+            return self.read(max_bytes)
+
+        data, end = _read_lines(self._f, self.offset, max_bytes)
+        if data:
+            self._pending = (False, end)
+        return data, self.offset
+
+    def commit(self):
+        if self._pending is None:
+            return
+        rotated, end = self._pending
+        self._pending = None
+        if rotated:
+            self._rotated[3] = end
+        else:
+            self.offset = end
+
+    def close(self):
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+        if self._rotated is not None:
+            self._rotated[0].close()
+            self._rotated = None
+
+
+def _read_lines(f, offset: int, max_bytes: int) -> Tuple[bytes, int]:
+    # 큰 버퍼로 한 번에 읽고 마지막 개행까지만 사용 (한 줄이 버퍼보다 길면 버퍼를 키워서 다시)
+    while True:
+        data = os.pread(f.fileno(), max_bytes, offset)
+        cut = data.rfind(b"\n")
+        if cut >= 0:
+            return data[:cut + 1], offset + cut + 1
+        if len(data) < max_bytes:
+            return b"", offset
+        max_bytes *= 2
+
+
+def _find_rotated(path: Path, dev: Optional[int], ino: Optional[int]):
+    for p in sorted(path.parent.glob(path.name + ".*")):
+        try:
+            st = p.stat()
+        except FileNotFoundError:
+            continue
+        if (st.st_dev, st.st_ino) == (dev, ino):
+            return open(p, "rb", buffering=0)
+    return None
+
+
+def parse_lines(data: bytes) -> Tuple[List[LogEvent], int]:
+    """
+    JSONL -> (LogEvent 리스트, 파싱 실패 줄 수).
+    전체를 JSON 배열 하나로 묶어 한 번에 검증하고, 잘못된 줄이 있으면 줄 단위로 다시 검증해서 건너뛴다.
+    """
+    lines = [line for line in data.split(b"\n") if line.strip()]
+    if not lines:
+        return [], 0
+    try:
+        return _EVENTS.validate_json(b"[" + b",".join(lines) + b"]"), 0
+    except ValidationError:
+        pass
+    events, bad = [], 0
+    for line in lines:
+        try:
+            events.append(LogEvent.model_validate_json(line))
+        except ValidationError:
+            bad += 1
+    return events, bad
+
+
+class Checkpoint:
+    """파일별 (dev, ino, offset)을 JSON으로 저장. 임시 파일에 쓴 뒤 os.replace로 교체 (중간에 죽어도 이전 값 유지)"""
+    def __init__(self, path: Path):
+        self.path = path
+
+    def load(self) -> Dict[str, Dict[str, int]]:
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8")).get("files", {})
+        except FileNotFoundError:
+            return {}
+
+    def save(self, files: Dict[str, Dict[str, int]]):
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "files": files}, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+
+class TailWorker:
+    """
+    - 파일들을 돌아가며 bulk read -> LogEvent 파싱 -> 사용자별 피처 -> scoring/검색 -> 결정 JSONL
+    - stateful(기본): 서버 feature store에 누적 (read 경계와 무관하게 5분 실패 window / 학습 baseline 유지)
+      stateless: read 한 번에 들어온 이벤트만으로 사용자별 피처 계산
+    - 결과를 out에 쓰고 fsync한 다음 checkpoint 저장 -> 재시작 시 checkpoint offset부터 이어서 읽음
+      (결과 기록 후 checkpoint 전에 죽으면 해당 read 구간은 다시 처리됨: at-least-once)
+    """
+    def __init__(
+            self,
+            paths: List[Path],
+            out_path: Path,
+            checkpoint_path: Optional[Path] = None,
+            *,
+            tenant_id: Optional[str] = None,
+            mode: str = "hybrid",
+            stateful: bool = True,
+            read_bytes: int = TAIL_READ_BYTES,
+    ):
+        self.out_path = Path(out_path)
+        self.checkpoint = Checkpoint(Path(checkpoint_path or str(out_path) + ".offsets.json"))
+        self.tenant_id = tenant_id
+        self.mode = mode
+        self.stateful = stateful
+        self.read_bytes = read_bytes
+
+        saved = self.checkpoint.load()
+        self.files: List[TailedFile] = []
+        for p in paths:
+            p = Path(p).resolve()
+            c = saved.get(str(p), {})
+            self.files.append(TailedFile(p, c.get("dev"), c.get("ino"), c.get("offset", 0)))
+
+        self.events = 0
+        self.bad_lines = 0
+        self.decisions = 0
+        self._stop = False
+
+    def stop(self, *_):
+        self._stop = True
+
+    def _save_checkpoint(self):
+        self.checkpoint.save({str(t.path): t.checkpoint() for t in self.files})
+
+    def _analyze(self, tf: TailedFile, start: int, end: int, events: List[LogEvent]) -> List[str]:
+        if self.stateful:
+            by_actor = get_feature_store().update(self.tenant_id, events)
+        else:
+            by_actor = extract_features_by_actor(events)
+        user_ids = list(by_actor)
+        results = score_and_retrieve_shared([(self.mode, by_actor[u], self.tenant_id) for u in user_ids])
+
+        counts: Dict[str, int] = {}
+        for e in events:
+            counts[e.actor.user_id] = counts.get(e.actor.user_id, 0) + 1
+        # request_id: 어느 파일의 어느 바이트 구간에서 나온 결정인지
+        rid = f"{tf.path.name}:{start}-{end}"
+        out = []
+        for user_id, result in zip(user_ids, results):
+            resp = build_response(rid, *result)
+            resp.debug["tail"] = {"file": str(tf.path), "events": counts[user_id]}
+            out.append(ActorAnalyzeResponse(user_id=user_id, **resp.model_dump()).model_dump_json())
+        return out
+
+    def poll(self) -> int:
+        """모든 파일에서 한 번씩 읽어 처리 -> 처리한 바이트 수 (0이면 새 데이터 없음)"""
+        total = 0
+        for tf in self.files:
+            if self._stop:
+                break
+            data, start = tf.read(self.read_bytes)
+            if not data:
+                continue
+            events, bad = parse_lines(data)
+            lines = self._analyze(tf, start, start + len(data), events) if events else []
+            if lines:
+                with open(self.out_path, "a", encoding="utf-8") as f:
+                    f.write("\n".join(lines) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+            tf.commit()
+            self._save_checkpoint()
+            self.events += len(events)
+            self.bad_lines += bad
+            self.decisions += len(lines)
+            total += len(data)
+        return total
+
+    def run(self, once: bool = False, poll_seconds: float = TAIL_POLL_SECONDS):
+        """once=True: 지금 있는 데이터를 끝까지 처리하고 종료"""
+        try:
+            while not self._stop:
+                if self.poll():
+                    continue
+                if once:
+                    break
+                time.sleep(poll_seconds)
+        finally:
+            for tf in self.files:
+                tf.close()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "events": self.events,
+            "bad_lines": self.bad_lines,
+            "decisions": self.decisions,
+            "rotations": sum(t.rotations for t in self.files),
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="JSONL 접근 로그 tail -> 결정 JSONL")
+    parser.add_argument("files", nargs="+", type=Path, help="tail할 JSONL 로그 파일")
+    parser.add_argument("--out", type=Path, required=True, help="결정(ActorAnalyzeResponse) JSONL 출력 파일")
+    parser.add_argument("--checkpoint", type=Path, default=None, help="offset checkpoint 파일 (기본: <out>.offsets.json)")
+    parser.add_argument("--tenant", default=None, help="rule set / 정책 인덱스 tenant")
+    parser.add_argument("--mode", choices=["vector", "hybrid"], default="hybrid")
+    parser.add_argument("--stateless", action="store_true", help="feature store 없이 read 단위로만 피처 계산")
+    parser.add_argument("--once", action="store_true", help="현재 파일 끝까지 처리하고 종료")
+    args = parser.parse_args()
+
+    worker = TailWorker(
+        args.files, args.out, args.checkpoint,
+        tenant_id=args.tenant, mode=args.mode, stateful=not args.stateless,
+    )
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    print(f"[tail_worker] files={len(worker.files)} out={worker.out_path} checkpoint={worker.checkpoint.path}")
+    worker.run(once=args.once)
+    print(f"[tail_worker] done {worker.stats()}")
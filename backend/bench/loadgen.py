@@ -0,0 +1,497 @@
+from __future__ import annotations
+import argparse
+import asyncio
+import copy
+import json
+import math
+import platform
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from bench.run_bench import RESULTS_DIR, _git_rev
+from bench.synth import SAMPLES_DIR
+
+# /api/analyze open-loop 부하 생성기
+# - 요청 i는 시작 시각 + i / rate에 보낸다 (응답을 기다리지 않음 -> 서버가 느려져도 도착률 유지)
+# - latency는 "보내기로 한 시각"부터 재서 클라이언트 쪽 대기도 포함 (coordinated omission 방지)
+# python -m bench.loadgen --rate 50 --duration 30                        # in-process (ASGI, 네트워크 없음)
+# python -m bench.loadgen --url http://127.0.0.1:8000 --rate 200 --duration 60
+
+DEFAULT_OUT = RESULTS_DIR / "load_latest.json"
+DEFAULT_BASELINE = RESULTS_DIR / "load_baseline.json"
+
+# 기본 regression 판정: percentile이 baseline보다 20% 이상 (그리고 1ms 이상) 느려지면 실패
+DEFAULT_THRESHOLD = 0.20
+DEFAULT_MIN_DELTA_MS = 1.0
+GATE_PERCENTILES = ("p50", "p90", "p99")
+
+PERCENTILES = (("p50", 50.0), ("p90", 90.0), ("p99", 99.0), ("p999", 99.9))
+
+ANALYZE_PATH = "/api/analyze"
+
+
+class LatencyHistogram:
+    """
+    HdrHistogram과 같은 log-linear bucket (us 정수, 상대 오차 1/2^SUB_BITS 이하).
+    - 2^SUB_BITS us 미만은 1us 단위, 그 이상은 2의 거듭제곱 구간마다 2^SUB_BITS개 bucket
+    - percentile은 해당 bucket의 가장 큰 값 (max를 넘지 않게)
+    """
+    SUB_BITS = 7
+    SUB_COUNT = 1 << SUB_BITS
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total_us = 0
+        self.min_us: Optional[int] = None
+        self.max_us = 0
+
+    @classmethod
+    def _index(cls, us: int) -> int:
+        if us < cls.SUB_COUNT:
+            return us
+        shift = us.bit_length() - 1 - cls.SUB_BITS
+        return (shift + 1) * cls.SUB_COUNT + (us >> shift) - cls.SUB_COUNT
+
+    @classmethod
+    def _upper(cls, index: int) -> int:
+        if index < cls.SUB_COUNT:
+            return index
+        shift = index // cls.SUB_COUNT - 1
+        top = index % cls.SUB_COUNT + cls.SUB_COUNT
+        return ((top + 1) << shift) - 1
+
+    def record(self, seconds: float):
+        us = max(0, int(round(seconds * 1e6)))
+        i = self._index(us)
+        self.counts[i] = self.counts.get(i, 0) + 1
+        self.count += 1
+        self.total_us += us
+        self.min_us = us if self.min_us is None else min(self.min_us, us)
+        self.max_us = max(self.max_us, us)
+
+    def percentile_us(self, p: float) -> int:
+        if not self.count:
+            return 0
+        target = max(1, math.ceil(p / 100.0 * self.count))
+        seen = 0
+        for i in sorted(self.counts):
+            seen += self.counts[i]
+            if seen >= target:
+                return min(self._upper(i), self.max_us)
+        return self.max_us
+
+    def summary(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"count": self.count}
+        if not self.count:
+            return out
+        out["min_ms"] = round(self.min_us / 1e3, 3)
+        out["mean_ms"] = round(self.total_us / self.count / 1e3, 3)
+        for name, p in PERCENTILES:
+            out[f"{name}_ms"] = round(self.percentile_us(p) / 1e3, 3)
+        out["max_ms"] = round(self.max_us / 1e3, 3)
+        # 다시 그리거나 다른 결과와 합칠 수 있도록 bucket 상한(ms) -> count
+        out["histogram"] = [[round(self._upper(i) / 1e3, 3), self.counts[i]] for i in sorted(self.counts)]
+        return out
+
+
+# ---------------------------------
+# 요청 shape (샘플 + 합성 변형)
+# ---------------------------------
+class Shape:
+    """
+    샘플 하나 = 위험도(low/med/high) x mode
+    body(i): i번째로 보낼 요청 본문
+    - variants < 0: 요청마다 새 합성 변형 (응답 캐시에 걸리지 않음)
+    - variants = 0: 샘플 그대로 반복 (응답 캐시 hit 경로)
+    - variants > 0: 변형 N개를 돌아가며 (N번째 요청부터 캐시 hit)
+    """
+    def __init__(self, name: str, mode: str, body: Dict[str, Any], variants: int, seed: int):
+        self.name = name
+        self.mode = mode
+        self.base = body
+        self.variants = variants
+        self.seed = seed
+        self._raw = json.dumps(body, ensure_ascii=False).encode("utf-8")
+
+    def body(self, i: int) -> bytes:
+        if self.variants == 0:
+            return self._raw
+        if self.variants > 0:
+            i %= self.variants
+        v = make_variant(self.base, i, random.Random(f"{self.seed}:{self.name}:{i}"))
+        return json.dumps(v, ensure_ascii=False).encode("utf-8")
+
+
+def _shift_ts(ts: str, days: int) -> str:
+    # 날짜만 옮겨서 시간대(night_access 등) signal은 그대로 유지
+    dt = datetime.strptime(ts, "%Y-%m-%dT%H:%M:%SZ")
+    return (dt + timedelta(days=days)).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def make_variant(body: Dict[str, Any], i: int, rnd: random.Random) -> Dict[str, Any]:
+    """
+    같은 signal 조합을 내는 합성 변형: user_id/event_id/날짜만 바꿈
+    (logs가 달라져 응답 캐시에 걸리지 않으므로 매 요청이 실제로 분석/검색됨)
+    """
+    out = copy.deepcopy(body)
+    days = rnd.randrange(1, 3650)
+    user = f"load-{i:06d}"
+    for j, e in enumerate(out["logs"]):
+        e["event_id"] = f"{user}-{j}"
+        e["actor"]["user_id"] = user
+        e["ts"] = _shift_ts(e["ts"], days)
+    out["request_id"] = f"{body.get('request_id') or 'load'}-{i}"
+    return out
+
+
+def load_shapes(
+        samples_dir: Path = SAMPLES_DIR,
+        *,
+        variants: int = -1,
+        seed: int = 0,
+        tenant: Optional[str] = None,
+        deadline_ms: Optional[float] = None,
+        only: Optional[List[str]] = None,
+) -> List[Shape]:
+    """
+    app/data/samples/*.json -> Shape 목록 (이름: 파일명 앞부분의 위험도 + mode, 예: high-hybrid)
+    샘플의 최상위 retrieval_mode는 API가 읽지 않으므로 context.retrieval_mode로 옮긴다.
+    """
+    shapes: List[Shape] = []
+    for p in sorted(samples_dir.glob("*.json")):
+        body = json.loads(p.read_text(encoding="utf-8"))
+        mode = body.pop("retrieval_mode", None) or (body.get("context") or {}).get("retrieval_mode") or "hybrid"
+        name = f"{p.stem.split('-')[0]}-{mode}"
+        if only and name not in only:
+            continue
+        ctx = body.get("context") or {}
+        ctx["retrieval_mode"] = mode
+        if deadline_ms is not None:
+            ctx["deadline_ms"] = deadline_ms
+        body["context"] = ctx
+        if tenant is not None:
+            body["tenant_id"] = tenant
+        shapes.append(Shape(name, mode, body, variants, seed))
+    if not shapes:
+        raise FileNotFoundError(f"no sample requests in {samples_dir}")
+    return shapes
+
+
+def schedule(shapes: List[Shape], n: int, seed: int) -> List[Tuple[Shape, int]]:
+    """n개 요청 순서 -> [(shape, shape 안에서 몇 번째 요청)] (shape는 섞어서 고르게)"""
+    rnd = random.Random(seed)
+    order = list(shapes)
+    out: List[Tuple[Shape, int]] = []
+    pos = {s.name: 0 for s in shapes}
+    while len(out) < n:
+        rnd.shuffle(order)
+        for s in order:
+            out.append((s, pos[s.name]))
+            pos[s.name] += 1
+    return out[:n]
+
+
+# ---------------------------------
+# 실행
+# ---------------------------------
+class Stats:
+    """그룹(mode, shape)별 histogram + 상태 코드/검색 경로/캐시 상태/deadline 초과·포화 수"""
+    def __init__(self):
+        self.hist = LatencyHistogram()
+        self.service = LatencyHistogram()
+        self.errors = 0
+        self.status: Dict[str, int] = {}
+        self.retrieval_path: Dict[str, int] = {}
+        self.cache: Dict[str, int] = {}
+        self.deadline: Dict[str, int] = {}
+
+    def add(self, latency: float, service: float, status: str, debug: Optional[Dict[str, Any]]):
+        self.hist.record(latency)
+        self.service.record(service)
+        self.status[status] = self.status.get(status, 0) + 1
+        if status != "200":
+            self.errors += 1
+        if debug:
+            path = debug.get("retrieval_path")
+            if path:
+                self.retrieval_path[path] = self.retrieval_path.get(path, 0) + 1
+            cache = (debug.get("cache") or {}).get("status")
+            if cache:
+                self.cache[cache] = self.cache.get(cache, 0) + 1
+            for flag, on in (debug.get("deadline") or {}).items():
+                if on is True:
+                    self.deadline[flag] = self.deadline.get(flag, 0) + 1
+
+    def summary(self) -> Dict[str, Any]:
+        out = self.hist.summary()
+        out["service_p99_ms"] = round(self.service.percentile_us(99.0) / 1e3, 3)
+        out["errors"] = self.errors
+        out["status"] = self.status
+        out["retrieval_path"] = self.retrieval_path
+        out["cache"] = self.cache
+        out["deadline"] = self.deadline
+        return out
+
+
+async def _send(client: httpx.AsyncClient, body: bytes, timeout: float) -> Tuple[str, Optional[Dict[str, Any]]]:
+    try:
+        r = await client.post(
+            ANALYZE_PATH, content=body, headers={"content-type": "application/json"}, timeout=timeout
+        )
+    except httpx.TimeoutException:
+        return "timeout", None
+    except httpx.HTTPError as e:
+        return type(e).__name__, None
+    debug = None
+    if r.status_code == 200:
+        try:
+            debug = r.json().get("debug")
+        except ValueError:
+            pass
+    return str(r.status_code), debug
+
+
+async def run_open_loop(
+        client: httpx.AsyncClient,
+        plan: List[Tuple[Shape, int]],
+        rate: float,
+        timeout: float,
+) -> Tuple[Dict[str, Stats], Dict[str, Any]]:
+    """
+    고정 도착률로 plan을 보냄 -> ({"all" | mode | shape 이름: Stats}, 실행 정보)
+    - latency: 예정 시각 -> 응답 완료, service: 실제 전송 -> 응답 완료
+    - 생성기 자체가 밀리면(send_lag) latency에 그대로 포함된다
+    """
+    groups: Dict[str, Stats] = {}
+    max_lag = 0.0
+    loop = asyncio.get_running_loop()
+
+    async def one(shape: Shape, body: bytes, intended: float):
+        # 본문은 예정 시각에 만들어 넘김 (생성 시간이 밀리면 send_lag/latency에 포함)
+        sent = loop.time()
+        status, debug = await _send(client, body, timeout)
+        done = loop.time()
+        for key in ("all", shape.mode, shape.name):
+            groups.setdefault(key, Stats()).add(done - intended, done - sent, status, debug)
+
+    tasks = []
+    start = loop.time() + 0.05
+    for i, (shape, j) in enumerate(plan):
+        intended = start + i / rate
+        delay = intended - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        else:
+            max_lag = max(max_lag, -delay)
+        tasks.append(asyncio.create_task(one(shape, shape.body(j), intended)))
+    await asyncio.gather(*tasks)
+    elapsed = loop.time() - start
+    info = {
+        "requests": len(plan),
+        "target_rate": rate,
+        "achieved_rate": round(len(plan) / elapsed, 2) if elapsed > 0 else None,
+        "elapsed_s": round(elapsed, 3),
+        "max_send_lag_ms": round(max_lag * 1e3, 3),
+    }
+    return groups, info
+
+
+def set_server_deadline(deadline_ms: Optional[float]):
+    # in-process app의 기본 검색 budget (context.deadline_ms가 없는 요청에 적용, None이면 제한 없음)
+    from app.api import routes_analyze
+    routes_analyze.RETRIEVAL_DEADLINE_MS = deadline_ms
+
+
+def disable_evidence_table():
+    # in-process runtime이 tenant 인덱스를 로딩할 때 evidence table을 읽지 않도록 (첫 요청 전에 호출)
+    from app.rag import runtime
+    runtime.EVIDENCE_TABLE_ENABLED = False
+
+
+def _client(url: Optional[str]) -> httpx.AsyncClient:
+    if url:
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=256)
+        return httpx.AsyncClient(base_url=url.rstrip("/"), limits=limits)
+    # in-process: 같은 프로세스의 ASGI app을 직접 호출 (네트워크/직렬화 외 서버 경로는 동일)
+    from app.main import app
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadgen")
+
+
+async def run(args, shapes: List[Shape]) -> Tuple[Dict[str, Stats], Dict[str, Any]]:
+    async with _client(args.url) as client:
+        if args.warmup > 0:
+            # 모델/인덱스 lazy 로딩이 측정에 섞이지 않도록 shape마다 몇 번씩 먼저 보냄 (closed-loop)
+            print(f"[loadgen] warmup {args.warmup} request(s) per shape")
+            for s in shapes:
+                for j in range(args.warmup):
+                    # 측정에 쓰는 변형과 겹치지 않도록 음수 번호 (variants=0이면 같은 본문)
+                    await _send(client, s.body(-1 - j), args.timeout)
+        n = max(1, int(args.rate * args.duration))
+        print(f"[loadgen] {n} requests at {args.rate:g}/s over {args.duration:g}s "
+              f"({'url=' + args.url if args.url else 'in-process ASGI'}, shapes={len(shapes)})")
+        return await run_open_loop(client, schedule(shapes, n, args.seed), args.rate, args.timeout)
+
+
+# ---------------------------------
+# 결과 출력 / 비교
+# ---------------------------------
+def _group_order(groups: Dict[str, Any], shapes: List[Shape]) -> List[str]:
+    modes = sorted({s.mode for s in shapes})
+    names = [s.name for s in shapes]
+    return [k for k in ["all"] + modes + names if k in groups]
+
+
+def print_table(groups: Dict[str, Dict[str, Any]], order: List[str]):
+    cols = [name for name, _ in PERCENTILES]
+    print(f"[loadgen] {'group':<14}{'count':>8}{'err':>6}" + "".join(f"{c + '_ms':>11}" for c in cols) + f"{'max_ms':>11}")
+    for k in order:
+        g = groups[k]
+        if not g.get("count"):
+            continue
+        row = "".join(f"{g[c + '_ms']:>11.2f}" for c in cols)
+        print(f"[loadgen] {k:<14}{g['count']:>8}{g['errors']:>6}{row}{g['max_ms']:>11.2f}")
+
+
+def compare(
+        groups: Dict[str, Dict[str, Any]],
+        baseline: Dict[str, Dict[str, Any]],
+        threshold: float,
+        min_delta_ms: float,
+        percentiles: List[str],
+) -> List[str]:
+    """percentile이 baseline * (1 + threshold)와 baseline + min_delta_ms를 모두 넘으면 regression"""
+    regressions = []
+    for k, cur in groups.items():
+        base = baseline.get(k)
+        if not base:
+            continue
+        for p in percentiles:
+            key = f"{p}_ms"
+            if key not in cur or key not in base:
+                continue
+            b, c = base[key], cur[key]
+            ratio = c / max(b, 1e-9)
+            flag = ""
+            if ratio > 1 + threshold and c - b > min_delta_ms:
+                regressions.append(f"{k}.{p}")
+                flag = "  <-- REGRESSION"
+            print(f"[loadgen] {k + '.' + p:<22} {b:10.2f}ms -> {c:10.2f}ms  x{ratio:.2f}{flag}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="/api/analyze open-loop 부하 생성기 (mode별 latency histogram)")
+    parser.add_argument("--url", default=None, help="대상 서버 (예: http://127.0.0.1:8000), 없으면 in-process ASGI")
+    parser.add_argument("--rate", type=float, default=20.0, help="초당 요청 수 (고정 도착률)")
+    parser.add_argument("--duration", type=float, default=10.0, help="측정 시간(초)")
+    parser.add_argument("--warmup", type=int, default=3, help="측정 전 shape마다 보낼 요청 수")
+    parser.add_argument("--variants", type=int, default=-1,
+                        help="shape마다 합성 변형 수 (-1: 요청마다 새 변형, 0: 샘플 그대로 반복 -> 응답 캐시 hit)")
+    parser.add_argument("--shapes", default=None, help="사용할 shape (예: high-hybrid,low-vector)")
+    parser.add_argument("--tenant", default=None)
+    parser.add_argument("--deadline-ms", type=float, default=None, help="요청 context.deadline_ms")
+    parser.add_argument("--server-deadline", default=None,
+                        help="in-process 전용: 서버 기본 검색 budget(RETRIEVAL_DEADLINE_MS) 덮어쓰기, ms 또는 off (deadline on/off 비교용)")
+    parser.add_argument("--no-evidence-table", action="store_true",
+                        help="in-process 전용: evidence table을 끄고 모든 요청을 live 검색 (검색 경로 부하 측정용)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="요청 timeout(초)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", type=Path, default=DEFAULT_OUT, help="결과 JSON 경로")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="비교할 baseline JSON 경로")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--min-delta-ms", type=float, default=DEFAULT_MIN_DELTA_MS,
+                        help="이보다 작은 증가는 regression으로 보지 않음")
+    parser.add_argument("--gate", default=",".join(GATE_PERCENTILES), help="비교할 percentile (p50,p90,p99,p999)")
+    parser.add_argument("--max-error-rate", type=float, default=0.0, help="허용 오류 비율 (넘으면 실패)")
+    parser.add_argument("--save-baseline", action="store_true", help="이번 결과를 baseline으로 저장")
+    args = parser.parse_args(argv)
+
+    if args.rate <= 0 or args.duration <= 0:
+        parser.error("--rate and --duration must be positive")
+    server_deadline_ms = None
+    if args.server_deadline is not None:
+        if args.url:
+            parser.error("--server-deadline only applies to the in-process app (no --url)")
+        try:
+            server_deadline_ms = None if args.server_deadline == "off" else float(args.server_deadline)
+        except ValueError:
+            parser.error("--server-deadline must be a number (ms) or 'off'")
+        set_server_deadline(server_deadline_ms)
+    if args.no_evidence_table:
+        if args.url:
+            parser.error("--no-evidence-table only applies to the in-process app (no --url)")
+        disable_evidence_table()
+    gate = [p for p in args.gate.split(",") if p]
+    unknown = [p for p in gate if p not in dict(PERCENTILES)]
+    if unknown:
+        parser.error(f"unknown percentiles: {unknown}")
+
+    shapes = load_shapes(
+        variants=args.variants,
+        seed=args.seed,
+        tenant=args.tenant,
+        deadline_ms=args.deadline_ms,
+        only=[s for s in args.shapes.split(",") if s] if args.shapes else None,
+    )
+    stats, info = asyncio.run(run(args, shapes))
+    groups = {k: s.summary() for k, s in stats.items()}
+    order = _group_order(groups, shapes)
+    print(f"[loadgen] achieved {info['achieved_rate']}/s (target {args.rate:g}/s), "
+          f"max send lag {info['max_send_lag_ms']}ms")
+    print_table(groups, order)
+
+    report = {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "git_rev": _git_rev(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "target": args.url or "in-process",
+            "shapes": [s.name for s in shapes],
+            "variants": args.variants,
+            "deadline_ms": args.deadline_ms,
+            "server_deadline_ms": server_deadline_ms if args.server_deadline is not None else "default",
+            "evidence_table": not args.no_evidence_table,
+            **info,
+        },
+        "groups": {k: groups[k] for k in order},
+    }
+
+    failures: List[str] = []
+    total = groups.get("all", {})
+    if total.get("count"):
+        error_rate = total["errors"] / total["count"]
+        report["error_rate"] = round(error_rate, 6)
+        if error_rate > args.max_error_rate:
+            failures.append(f"error rate {error_rate:.2%} > {args.max_error_rate:.2%}")
+            print(f"[loadgen] error rate {error_rate:.2%} (status {total['status']})")
+
+    if args.baseline.exists() and not args.save_baseline:
+        print(f"[loadgen] compare with baseline {args.baseline} "
+              f"(threshold={args.threshold:.0%}, min delta={args.min_delta_ms:g}ms)")
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        regressions = compare(groups, baseline.get("groups", {}), args.threshold, args.min_delta_ms, gate)
+        report["baseline"] = {"path": str(args.baseline), "git_rev": baseline.get("meta", {}).get("git_rev")}
+        report["regressions"] = regressions
+        failures.extend(regressions)
+
+    for path in [args.out] + ([args.baseline] if args.save_baseline else []):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"[loadgen] wrote {path}")
+
+    if failures:
+        print(f"[loadgen] FAILED: {', '.join(failures)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,282 @@
+from __future__ import annotations
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from bench.synth import generate_events
+
+BENCH_DIR = Path(__file__).resolve().parent
+RESULTS_DIR = BENCH_DIR / "results"
+DEFAULT_OUT = RESULTS_DIR / "latest.json"
+DEFAULT_BASELINE = RESULTS_DIR / "baseline.json"
+
+# 기본 regression 판정: median이 baseline보다 15% 이상 느려지면 실패
+DEFAULT_THRESHOLD = 0.15
+
+BENCH_QUERIES = [
+    "authentication failure monitoring, failed login burst threshold, rate limiting, temporary lockout, escalation guidance",
+    "new country login, geo-velocity, step-up authentication (MFA challenge), verification policy, escalation criteria",
+    "night access 00:00-06:00, after-hours access review, exception list, escalation conditions",
+]
+
+
+class SkipStage(Exception):
+    """의존성/인덱스가 없어서 측정할 수 없는 단계"""
+
+
+class Recorder:
+    def __init__(self, repeat: int):
+        self.repeat = repeat
+        self.results: Dict[str, Dict[str, Any]] = {}
+
+    def time(self, name: str, fn: Callable[[], Any], *, items: int = 1, repeat: Optional[int] = None):
+        """warmup 1회 후 repeat회 측정 -> median/min ms, item당 us"""
+        fn()
+        runs = []
+        for _ in range(repeat or self.repeat):
+            t0 = time.perf_counter()
+            fn()
+            runs.append(time.perf_counter() - t0)
+        median = statistics.median(runs)
+        self.results[name] = {
+            "median_ms": round(median * 1e3, 4),
+            "min_ms": round(min(runs) * 1e3, 4),
+            "repeat": len(runs),
+            "items": items,
+            "per_item_us": round(median * 1e6 / items, 4),
+        }
+        print(f"[bench] {name:<48} median={median * 1e3:10.3f}ms  per_item={median * 1e6 / items:10.3f}us")
+
+    def skip(self, name: str, reason: str):
+        self.results[name] = {"skipped": reason}
+        print(f"[bench] {name:<48} skipped: {reason}")
+
+
+# ---------------------------------
+# stages
+# ---------------------------------
+def bench_features(rec: Recorder, sizes: List[int]):
+    from app.services.features import LogColumns, extract_features, extract_features_by_actor
+
+    for n in sizes:
+        logs = generate_events(n, n_users=max(1, n // 100))
+        # 큰 입력은 반복 횟수를 줄임
+        repeat = rec.repeat if n < 100_000 else min(rec.repeat, 3)
+        rec.time(f"features.extract_features[n={n}]", lambda: extract_features(logs, None), items=n, repeat=repeat)
+        rec.time(f"features.to_columns[n={n}]", lambda: LogColumns.from_events(logs), items=n, repeat=repeat)
+        cols = LogColumns.from_events(logs)
+        rec.time(
+            f"features.by_actor_columns[n={n}]",
+            lambda: extract_features_by_actor(cols),
+            items=n, repeat=repeat,
+        )
+
+
+def bench_scoring(rec: Recorder, sizes: List[int]):
+    import itertools
+    from app.services.features import ComputedFeatures
+    from app.services.scoring import score_risk, score_risk_batch
+
+    combos = [ComputedFeatures(n, a, b, c) for n in (0, 3, 6) for a, b, c in itertools.product((False, True), repeat=3)]
+    rec.time("scoring.score_risk[n=1]", lambda: [score_risk(f) for f in combos], items=len(combos))
+    for n in sizes:
+        rows = (combos * (n // len(combos) + 1))[:n]
+        repeat = rec.repeat if n < 100_000 else min(rec.repeat, 3)
+        rec.time(f"scoring.score_risk_batch[n={n}]", lambda: score_risk_batch(rows), items=n, repeat=repeat)
+
+
+def bench_chunking(rec: Recorder, sizes: List[int]):
+    try:
+        from app.rag.config import POLICY_DIR
+        from app.rag.loaders import load_policies
+        from app.rag.chunking import chunk_text, make_chunks
+    except ImportError as e:
+        raise SkipStage(f"{type(e).__name__}: {e}")
+
+    # 문서 로딩(PDF 파싱)은 제외하고 청킹만 측정
+    sections = load_policies(POLICY_DIR)
+    if not sections:
+        raise SkipStage(f"no policy documents in {POLICY_DIR}")
+    n_chars = sum(len(s.text) for s in sections)
+    rec.time("chunking.chunk_text", lambda: [chunk_text(s.text) for s in sections], items=n_chars)
+    rec.time("chunking.make_chunks", lambda: make_chunks(sections), items=n_chars)
+
+
+def bench_bm25(rec: Recorder, sizes: List[int]):
+    import random
+    from app.rag.bm25 import BM25IndexBuilder, get_tokenizer
+    from app.rag.config import BM25_TOKENIZER, RETRIEVAL_TOP_K
+
+    # 합성 청크: query 단어 + 무작위 단어 (코퍼스 크기에 따른 query 비용 측정, 청크 수 = size)
+    tokenize = get_tokenizer(BM25_TOKENIZER)
+    rnd = random.Random(0)
+    query_words = sorted({w for q in BENCH_QUERIES for w in tokenize(q)})
+    filler = [f"term{i}" for i in range(5000)]
+    query_tokens = [tokenize(q) for q in BENCH_QUERIES]
+    for n in sizes:
+        builder = BM25IndexBuilder()
+        for _ in range(n):
+            builder.add([rnd.choice(query_words) for _ in range(3)] + rnd.choices(filler, k=60))
+        index = builder.build()
+        rec.time(
+            f"bm25.top_k[chunks={n}]",
+            lambda: [index.top_k(toks, RETRIEVAL_TOP_K) for toks in query_tokens],
+            items=len(query_tokens),
+        )
+
+
+def bench_retrieval(rec: Recorder, sizes: List[int]):
+    from app.rag.config import RETRIEVAL_TOP_K
+    from app.rag.runtime import RetrievalRuntime
+
+    runtime = RetrievalRuntime()
+    n_q = len(BENCH_QUERIES)
+
+    corpus = runtime.corpus()
+    if corpus is None:
+        rec.skip("retrieval.bm25", "no corpus snapshot (run build_index)")
+    else:
+        rec.time(
+            "retrieval.bm25",
+            lambda: [corpus.bm25_search(q, RETRIEVAL_TOP_K) for q in BENCH_QUERIES],
+            items=n_q,
+        )
+
+    try:
+        vs = runtime.vectorstore()
+        empty = len(vs) == 0 if runtime.vector_backend == "numpy" else not vs.get(limit=1)["ids"]
+        if empty:
+            raise SkipStage("empty vector index (run build_index)")
+        emb = runtime.embeddings()
+        emb.embed_query(BENCH_QUERIES[0])
+    except SkipStage as e:
+        for name in ("retrieval.embed_query", "retrieval.vector"):
+            rec.skip(name, str(e))
+        return
+    except (ImportError, OSError) as e:
+        for name in ("retrieval.embed_query", "retrieval.vector"):
+            rec.skip(name, f"{type(e).__name__}: {str(e).splitlines()[0] if str(e) else e}")
+        return
+
+    rec.time("retrieval.embed_query", lambda: [emb.embed_query(q) for q in BENCH_QUERIES], items=n_q)
+    rec.time(
+        "retrieval.vector",
+        lambda: [vs.similarity_search_with_score(q, k=RETRIEVAL_TOP_K) for q in BENCH_QUERIES],
+        items=n_q,
+    )
+    if runtime.vector_backend == "numpy":
+        # 여러 query를 행렬곱 한 번으로 검색
+        qvs = [emb.embed_query(q) for q in BENCH_QUERIES]
+        rec.time("retrieval.vector_search_batch[numpy]", lambda: vs.search_by_vectors(qvs, RETRIEVAL_TOP_K), items=n_q)
+    for mode in ("vector", "hybrid"):
+        retriever = runtime.get_retriever(mode)
+        rec.time(f"retrieval.retrieve[{mode}]", lambda: retriever.retrieve(BENCH_QUERIES), items=n_q)
+
+
+STAGES: Dict[str, Callable[[Recorder, List[int]], None]] = {
+    "features": bench_features,
+    "scoring": bench_scoring,
+    "chunking": bench_chunking,
+    "bm25": bench_bm25,
+    "retrieval": bench_retrieval,
+}
+
+
+# ---------------------------------
+# 결과 저장 / 비교
+# ---------------------------------
+def _git_rev() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, capture_output=True, text=True, timeout=5
+        )
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float) -> List[str]:
+    """median_ms가 baseline * (1 + threshold)보다 크면 regression"""
+    regressions = []
+    for name, cur in results.items():
+        base = baseline.get(name)
+        if not base or "median_ms" not in cur or "median_ms" not in base:
+            continue
+        ratio = cur["median_ms"] / max(base["median_ms"], 1e-9)
+        cur["baseline_median_ms"] = base["median_ms"]
+        cur["ratio"] = round(ratio, 3)
+        flag = ""
+        if ratio > 1 + threshold:
+            regressions.append(name)
+            flag = "  <-- REGRESSION"
+        print(f"[bench] {name:<48} {base['median_ms']:10.3f}ms -> {cur['median_ms']:10.3f}ms  x{ratio:.2f}{flag}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="analyze 파이프라인 단계별 마이크로벤치마크")
+    parser.add_argument("--stages", default=",".join(STAGES), help=f"실행할 단계 (기본: {','.join(STAGES)})")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="합성 이벤트 수 목록 (최대 1000000 권장)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--out", type=Path, default=DEFAULT_OUT, help="결과 JSON 경로")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="비교할 baseline JSON 경로")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--save-baseline", action="store_true", help="이번 결과를 baseline으로 저장")
+    args = parser.parse_args(argv)
+
+    sizes = [int(float(s)) for s in args.sizes.split(",") if s]
+    stages = [s for s in args.stages.split(",") if s]
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        parser.error(f"unknown stages: {unknown}")
+
+    rec = Recorder(args.repeat)
+    skipped: Dict[str, str] = {}
+    for stage in stages:
+        print(f"[bench] --- {stage} ---")
+        try:
+            STAGES[stage](rec, sizes)
+        except SkipStage as e:
+            skipped[stage] = str(e)
+            print(f"[bench] stage {stage} skipped: {e}")
+
+    report = {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "git_rev": _git_rev(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "sizes": sizes,
+            "repeat": args.repeat,
+        },
+        "skipped_stages": skipped,
+        "results": rec.results,
+    }
+
+    regressions: List[str] = []
+    if args.baseline.exists() and not args.save_baseline:
+        print(f"[bench] compare with baseline {args.baseline} (threshold={args.threshold:.0%})")
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        regressions = compare(rec.results, baseline.get("results", {}), args.threshold)
+        report["baseline"] = {"path": str(args.baseline), "git_rev": baseline.get("meta", {}).get("git_rev")}
+        report["regressions"] = regressions
+
+    for path in [args.out] + ([args.baseline] if args.save_baseline else []):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"[bench] wrote {path}")
+
+    if regressions:
+        print(f"[bench] {len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
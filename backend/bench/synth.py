@@ -0,0 +1,72 @@
+from __future__ import annotations
+import json
+import random
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from app.models.schemas import Actor, LogEvent, Source, Target
+
+SAMPLES_DIR = Path(__file__).resolve().parents[1] / "app" / "data" / "samples"
+
+
+# 샘플 요청(app/data/samples/*.json)에서 이벤트 템플릿 수집
+def load_templates(samples_dir: Path = SAMPLES_DIR) -> List[Dict]:
+    templates = []
+    for p in sorted(samples_dir.glob("*.json")):
+        templates.extend(json.loads(p.read_text(encoding="utf-8")).get("logs", []))
+    if not templates:
+        raise FileNotFoundError(f"no sample logs in {samples_dir}")
+    return templates
+
+
+def _ts(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def generate_events(
+        n: int,
+        *,
+        n_users: int = 100,
+        seed: int = 0,
+        start: Optional[datetime] = None,
+        templates: Optional[List[Dict]] = None,
+) -> List[LogEvent]:
+    """
+    샘플 로그를 템플릿으로 n개의 LogEvent 생성 (seed 고정이면 항상 같은 결과).
+    - 사용자/시각/결과만 바꾸고 source/target은 샘플 값을 재사용
+    - 대량 생성이 목적이므로 nested 모델은 공유하고 model_construct로 검증 생략
+    """
+    rnd = random.Random(seed)
+    templates = templates or load_templates()
+    t = start or datetime(2026, 2, 3, tzinfo=timezone.utc)
+
+    actors = [Actor(user_id=f"u{i:06d}") for i in range(n_users)]
+    sources: Dict[Tuple, Source] = {}
+    targets: Dict[Tuple, Target] = {}
+    pool = []
+    for tpl in templates:
+        s, g = tpl["source"], tpl["target"]
+        src = sources.setdefault(tuple(sorted(s.items())), Source(**s))
+        tgt = targets.setdefault(tuple(sorted(g.items())), Target(**g))
+        pool.append((tpl["action"], tpl["result"], src, tgt))
+
+    out: List[LogEvent] = []
+    for i in range(n):
+        action, result, src, tgt = pool[rnd.randrange(len(pool))]
+        if action.upper() == "LOGIN" and rnd.random() < 0.3:
+            result = "FAIL" if result == "SUCCESS" else "SUCCESS"
+        t += timedelta(seconds=rnd.choice((0, 1, 2, 5, 10, 30, 60)))
+        out.append(
+            LogEvent.model_construct(
+                event_id=f"e{i}",
+                ts=_ts(t),
+                actor=actors[rnd.randrange(n_users)],
+                action=action,
+                result=result,
+                source=src,
+                target=tgt,
+                meta=None,
+            )
+        )
+    return out